@@ -4,9 +4,12 @@ Django settings for backend project.
 Generated by 'django-admin startproject' using Django 4.2.17.
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -34,13 +37,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "books.middleware.RequestMetricsMiddleware",
+    "books.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "books.middleware.PermissionContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "books.middleware.CacheControlMiddleware",
 ]
 
 ROOT_URLCONF = "backend.urls"
@@ -65,14 +72,141 @@ WSGI_APPLICATION = "backend.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# DB_ENGINE=postgres switches to PostgreSQL (needs psycopg) with persistent,
+# health-checked connections. The default stays on the local SQLite file,
+# tuned by SQLITE_PRAGMAS below.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "bibliopolis"),
+            "USER": os.environ.get("DB_USER", ""),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", ""),
+            "PORT": os.environ.get("DB_PORT", ""),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", "5")),
+            },
+        }
+    }
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            # Seconds the sqlite3 module waits for a lock before raising
+            # "database is locked".
+            "OPTIONS": {"timeout": 20},
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE {DB_ENGINE!r}.")
+
+# Applied to every new SQLite connection (books.database). WAL lets readers
+# run alongside the single writer; set DB_SQLITE_TUNING=0 to skip them.
+SQLITE_PRAGMAS = (
+    {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 20000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    }
+    if os.environ.get("DB_SQLITE_TUNING", "1") != "0"
+    else {}
+)
 
-DATABASES = {
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
+# Read-through cache for catalog, category, theme and slider endpoints.
+# "lru" keeps entries in process; "django" uses the CACHES alias below. The
+# versions that invalidate entries and build ETags are database rows, so
+# every worker sees a change as soon as it commits whichever store is used.
+BOOKS_VIEW_CACHE = {
+    "BACKEND": "lru",
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+    "MAX_ENTRIES": 1024,
+}
+
+# Serve the hot catalog reads (books, categories, comments, theme, default
+# slider) from native async views. Opt-in (ASYNC_CATALOG=1): on SQLite the
+# async path benchmarked slower than the sync views.
+ASYNC_CATALOG = os.environ.get("ASYNC_CATALOG", "0") == "1"
+
+# Moderation and order events are written by a background thread in batches.
+# "sync" writes each event inside the request instead.
+EVENT_BUS = {
+    "MODE": "async",
+    "MAX_QUEUE": 10000,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 0.5,
+    "BLOCK_TIMEOUT": 0.05,
+}
+
+# Per-request wall/DB/serializer timings: Server-Timing headers, JSON lines on
+# the "books.requests" logger and histograms at /api/_metrics. A statement
+# repeated DUPLICATE_QUERY_THRESHOLD times in one request is reported as a
+# likely N+1 ("log", "raise" or "off").
+REQUEST_METRICS = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "LOG": True,
+    "SLOW_MS": 500,
+    "DUPLICATE_QUERY_THRESHOLD": 10,
+    "DUPLICATE_QUERY_ACTION": os.environ.get("DUPLICATE_QUERY_ACTION", "log"),
+}
+
+# Responses of at least MIN_SIZE bytes are sent brotli (with the optional
+# brotli package) or gzip compressed, as the client prefers.
+HTTP_COMPRESSION = {"MIN_SIZE": 1024, "GZIP_LEVEL": 6, "BROTLI_QUALITY": 5}
+
+# Cache-Control of successful GET responses by URL name; requests carrying
+# credentials get the "authenticated" value. ETags make "no-cache" cheap:
+# clients revalidate and usually get a 304.
+PUBLIC_CATALOG = {
+    "anonymous": "public, max-age=60",
+    "authenticated": "private, no-cache",
+}
+HTTP_CACHE_CONTROL = {
+    "default": {"anonymous": "no-cache", "authenticated": "private, no-cache"},
+    "book-list": PUBLIC_CATALOG,
+    "book-browse": PUBLIC_CATALOG,
+    "category-list": PUBLIC_CATALOG,
+    "theme": PUBLIC_CATALOG,
+    "image-list": PUBLIC_CATALOG,
+    "slider-list": PUBLIC_CATALOG,
+    "slider-default": PUBLIC_CATALOG,
+    "order-list": {"authenticated": "private, no-cache"},
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {"message": {"format": "%(message)s"}},
+    "handlers": {
+        "requests": {"class": "logging.StreamHandler", "formatter": "message"},
+    },
+    "loggers": {
+        "books.requests": {
+            "handlers": ["requests"],
+            "level": os.environ.get("REQUEST_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -110,6 +244,24 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Thumbnail/card/hero derivatives of uploaded images are rendered in a process
+# pool of this size after upload (0 renders synchronously in the request).
+IMAGE_DERIVATIVE_WORKERS = 2
+IMAGE_DERIVATIVE_MAX_PENDING = 16
+
+# Parts of chunked uploads (/api/uploads/) are kept here until they complete;
+# `manage.py reap_uploads` removes uploads idle for EXPIRE_AFTER seconds.
+CHUNKED_UPLOADS = {
+    "DIRECTORY": BASE_DIR / "var" / "uploads",
+    "MAX_SIZE": 50 * 1024 * 1024,
+    "MAX_PART_SIZE": 8 * 1024 * 1024,
+    "EXPIRE_AFTER": 24 * 60 * 60,
+}
+
+# Prebuilt /api/sliders/default/ documents are also written here so other
+# workers and restarts reuse them (None keeps them in memory only).
+SLIDER_SNAPSHOT = {"DIRECTORY": BASE_DIR / "var" / "snapshots"}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -121,10 +273,21 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "books.authentication.JWTAuthentication",
     ],
 }
 
+# Seconds a user's admin/moderator flags and moderated categories are cached
+# per process; 0 (the default) disables the cache. Local changes invalidate
+# the entry immediately, but with several workers a demoted admin or
+# moderator keeps their rights in the other processes for up to this long.
+PERMISSION_CACHE_TTL = 0
+
+# Catalog search: "auto" uses SQLite FTS5 when the index table exists and
+# falls back to the in-process inverted index otherwise ("fts5" / "python").
+BOOK_SEARCH_BACKEND = "auto"
+BOOK_SEARCH_MAX_RESULTS = 1000
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -0,0 +1,199 @@
+"""
+Compares the hot catalog reads served by the sync DRF views through the
+WSGI handler (a pool of worker threads, like gunicorn --threads) with the
+async views through the ASGI handler. Both are driven in process with all
+requests queued at once, at most --concurrency in flight on the ASGI side.
+
+    python -m benchmarks.asgi --books 2000 --requests 5000 --concurrency 500
+"""
+
+import argparse
+import asyncio
+import importlib
+import io
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.common import make_books, print_table, summarize, test_database
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+from books.cache import view_cache
+from books.models import Book, Comment, Slider, Theme
+
+
+def use_catalog_views(asynchronous):
+    """Re-imports the URLconf with ASYNC_CATALOG set as requested."""
+    import backend.urls
+    import books.urls
+
+    with override_settings(ASYNC_CATALOG=asynchronous):
+        importlib.reload(books.urls)
+        importlib.reload(backend.urls)
+    clear_url_caches()
+
+
+def seed(books):
+    make_books(books)
+    book_ids = list(Book.objects.filter(approved=True).values_list("id", flat=True))
+    user = Book.objects.first().user
+    Comment.objects.bulk_create(
+        Comment(
+            book_id=random.choice(book_ids), user=user, content="Bench", approved=True
+        )
+        for _ in range(books * 2)
+    )
+    Theme.objects.create(
+        name="Bench", primary_color="#fff", secondary_color="#000", accent_color="#f00"
+    )
+    Slider.objects.create(title="Bench", is_default=True)
+    return book_ids
+
+
+def paths(book_ids, count, seed=0):
+    rng = random.Random(seed)
+    templates = [
+        lambda: "/api/books/?page_size=24",
+        lambda: f"/api/books/{rng.choice(book_ids)}/",
+        lambda: f"/api/books/{rng.choice(book_ids)}/comments/",
+        lambda: "/api/categories/",
+        lambda: "/api/theme/default/",
+        lambda: "/api/sliders/default/",
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+def wsgi_get(app, path):
+    url, _, query = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": url,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+    }
+    status = []
+    body = b"".join(app(environ, lambda s, headers: status.append(s)))
+    return int(status[0].split()[0]), len(body)
+
+
+async def asgi_get(app, path):
+    url, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url,
+        "raw_path": url.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"localhost")],
+        "server": ("localhost", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    status, size = [], 0
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status[0], size
+
+
+def run_wsgi(requests, workers):
+    use_catalog_views(False)
+    app = get_wsgi_application()
+
+    # Every request is queued at once; latency includes the wait for a free
+    # worker, as it would behind a real server.
+    started = time.perf_counter()
+
+    def timed(path):
+        status, _ = wsgi_get(app, path)
+        return status, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(timed, requests))
+    return results, time.perf_counter() - started
+
+
+def run_asgi(requests, concurrency):
+    use_catalog_views(True)
+    app = get_asgi_application()
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def timed(path, queued_at):
+            async with slots:
+                status, _ = await asgi_get(app, path)
+            return status, (time.perf_counter() - queued_at) * 1000
+
+        queued_at = time.perf_counter()
+        return await asyncio.gather(*(timed(path, queued_at) for path in requests))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    return results, time.perf_counter() - started
+
+
+def row(name, results, elapsed):
+    return {
+        "server": name,
+        "requests": len(results),
+        "errors": sum(1 for status, _ in results if status >= 400),
+        "req_per_s": round(len(results) / elapsed),
+        **summarize([ms for _, ms in results]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument(
+        "--wsgi-workers", type=int, default=32, help="Worker threads of the WSGI side."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, test_database(
+        Path(directory) / "asgi.sqlite3"
+    ):
+        book_ids = seed(args.books)
+        requests = paths(book_ids, args.requests)
+        rows = []
+        view_cache.clear()
+        rows.append(row("wsgi", *run_wsgi(requests, args.wsgi_workers)))
+        view_cache.clear()
+        rows.append(row("asgi", *run_asgi(requests, args.concurrency)))
+        use_catalog_views(False)
+
+    print_table(
+        rows,
+        ["server", "requests", "errors", "req_per_s", "p50_ms", "p95_ms", "p99_ms"],
+    )
+
+
+if __name__ == "__main__":
+    main()
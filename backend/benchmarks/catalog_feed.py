@@ -0,0 +1,103 @@
+"""
+Generates a synthetic supplier feed and times import_books (insert, then
+upsert of the same feed) and export_books on it.
+
+    python -m benchmarks.catalog_feed --rows 200000 --format jsonl
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import (
+    AUTHORS,
+    print_table,
+    sentence,
+    test_database,
+    vocabulary,
+    zipf_weights,
+)
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from books.feeds import BOOK_FEED_FIELDS, RowWriter
+
+
+def write_feed(path, fmt, rows, seed):
+    rng = random.Random(seed)
+    vocab = vocabulary(seed=seed)
+    weights = zipf_weights(len(vocab))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = RowWriter(f, fmt, BOOK_FEED_FIELDS)
+        writer.write_header()
+        for i in range(rows):
+            writer.write(
+                {
+                    "external_id": f"SUP-{i:08d}",
+                    "title": sentence(rng, rng.randint(2, 5), vocab, weights),
+                    "author": rng.choice(AUTHORS),
+                    "description": sentence(rng, rng.randint(20, 60), vocab, weights),
+                    "price": f"{rng.randint(500, 15000) / 100:.2f}",
+                    "category": f"Category {rng.randint(0, 49)}",
+                    "user": "supplier",
+                    "approved": "true",
+                }
+            )
+
+
+def timed(rows, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 2), "rows_per_s": round(rows / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    feed = os.path.join(workdir, f"feed.{args.format}")
+    export = os.path.join(workdir, f"export.{args.format}")
+    write_feed(feed, args.format, args.rows, args.seed)
+    print(f"feed: {os.path.getsize(feed) / 1e6:.1f} MB, {args.rows} rows")
+
+    def run_import():
+        call_command(
+            "import_books",
+            feed,
+            chunk_size=args.chunk_size,
+            create_categories=True,
+            skip_search_index=True,
+            stdout=io.StringIO(),
+        )
+
+    with test_database():
+        User.objects.create(username="supplier")
+        results = [
+            {"step": "import (insert)", **timed(args.rows, run_import)},
+            {"step": "import (upsert)", **timed(args.rows, run_import)},
+            {
+                "step": "export",
+                **timed(
+                    args.rows,
+                    lambda: call_command("export_books", export, stdout=io.StringIO()),
+                ),
+            },
+        ]
+
+    print_table(results, ["step", "seconds", "rows_per_s"])
+    for path in (feed, export):
+        os.remove(path)
+    os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Shared helpers for the benchmark scripts. Run them from the ``backend``
+directory, e.g. ``python -m benchmarks.search --books 100000``; each script
+works on a throwaway test database and never touches ``db.sqlite3``.
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+WORDS = (
+    "księga wiedźmin zamek smok król miasto morze las noc dzień wojna pokój "
+    "miłość śmierć źródło łódź żółw gęś ćma historia podróż tajemnica ogień "
+    "woda kamień cień światło słońce księżyc gwiazda droga dom ogród szkoła "
+    "dragon castle river winter summer shadow empire garden secret journey"
+).split()
+SYLLABLES = "ka ro mi sza wie dź ło ny ta pa rzę gó sło we li ść ma do".split()
+AUTHORS = [
+    "Sienkiewicz",
+    "Prus",
+    "Mickiewicz",
+    "Orzeszkowa",
+    "Lem",
+    "Sapkowski",
+    "Szymborska",
+    "Miłosz",
+    "Tokarczuk",
+    "Żeromski",
+    "Reymont",
+    "Gombrowicz",
+]
+
+
+@contextmanager
+def test_database(name=None):
+    """
+    Creates the test database for the duration of the block. SQLite test
+    databases live in memory unless ``name`` gives a file path, which is
+    what benchmarks with several connections need.
+    """
+    if name is not None:
+        connection.settings_dict["TEST"]["NAME"] = str(name)
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def vocabulary(size=5000, seed=0):
+    """WORDS followed by synthetic words; pick from it with zipf_weights()."""
+    rng = random.Random(seed)
+    words = list(WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def zipf_weights(size):
+    return [1 / (rank + 1) for rank in range(size)]
+
+
+def sentence(rng, words, vocab, weights):
+    return " ".join(rng.choices(vocab, weights, k=words)).capitalize()
+
+
+def make_books(count, seed=0, batch_size=5000):
+    from books.models import Book, Category
+
+    rng = random.Random(seed)
+    vocab = vocabulary(seed=seed)
+    weights = zipf_weights(len(vocab))
+    user, _ = User.objects.get_or_create(username="bench")
+    categories = [Category.objects.create(name=f"Category {i}") for i in range(20)]
+    for start in range(0, count, batch_size):
+        Book.objects.bulk_create(
+            Book(
+                user=user,
+                title=sentence(rng, rng.randint(2, 5), vocab, weights),
+                author=rng.choice(AUTHORS),
+                description=sentence(rng, rng.randint(20, 60), vocab, weights),
+                price=rng.randint(500, 15000) / 100,
+                category=rng.choice(categories),
+                approved=rng.random() < 0.9,
+            )
+            for _ in range(start, min(start + batch_size, count))
+        )
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "runs": len(ordered),
+    }
+
+
+def print_table(rows, columns):
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
@@ -0,0 +1,154 @@
+"""
+Hammers CreateOrderView and approve_comment from many threads against a
+file-backed SQLite database, once with the stock settings (rollback
+journal, 5 s lock timeout) and once with the tuned SQLITE_PRAGMAS, and
+counts "database is locked" failures.
+
+    python -m benchmarks.concurrency --threads 32 --requests 2000
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.common import make_books, print_table, summarize, test_database
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from books.events import event_bus
+from books.models import Book, Comment, UserProfile
+from django.contrib.auth.models import User
+
+MODES = {
+    "stock": ({"journal_mode": "DELETE"}, 5),
+    "tuned": (settings.SQLITE_PRAGMAS, 20),
+}
+ADDRESS = {
+    "shipping_address": "Piotrkowska 1",
+    "city": "Łódź",
+    "postal_code": "90-001",
+    "phone_number": "123456789",
+}
+
+
+def seed(books, comments):
+    make_books(books)
+    admin = User.objects.create_user("bench-admin")
+    UserProfile.objects.create(user=admin, is_admin=True)
+    buyer = User.objects.create_user("bench-buyer")
+    UserProfile.objects.create(user=buyer)
+    book_ids = list(Book.objects.values_list("id", flat=True))
+    Comment.objects.bulk_create(
+        Comment(book_id=random.choice(book_ids), user=buyer, content="Bench")
+        for _ in range(comments)
+    )
+    comment_ids = list(Comment.objects.values_list("id", flat=True))
+    return admin, buyer, book_ids, comment_ids
+
+
+def worker(jobs, admin, buyer, book_ids, results, lock):
+    client = APIClient()
+    rng = random.Random(threading.get_ident())
+    while True:
+        with lock:
+            if not jobs:
+                break
+            kind, comment_id = jobs.pop()
+        if kind == "order":
+            client.force_authenticate(buyer)
+            items = [
+                {"book": book_id, "quantity": rng.randint(1, 3)}
+                for book_id in rng.sample(book_ids, 3)
+            ]
+            call = lambda: client.post(  # noqa: E731
+                "/api/order/", {**ADDRESS, "items": items}, format="json"
+            )
+        else:
+            client.force_authenticate(admin)
+            call = lambda: client.post(  # noqa: E731
+                f"/api/comments/{comment_id}/approve/"
+            )
+
+        started = time.perf_counter()
+        try:
+            outcome = "ok" if call().status_code < 400 else "error"
+        except OperationalError as e:
+            outcome = "locked" if "locked" in str(e) else "error"
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            results.append((outcome, elapsed))
+    connection.close()
+
+
+def run(mode, args, directory):
+    pragmas, timeout = MODES[mode]
+    connection.settings_dict["OPTIONS"]["timeout"] = timeout
+    with override_settings(SQLITE_PRAGMAS=pragmas), test_database(
+        Path(directory) / f"{mode}.sqlite3"
+    ):
+        admin, buyer, book_ids, comment_ids = seed(args.books, args.requests)
+        jobs = [
+            ("order", None) if i % 2 else ("approve", comment_ids[i])
+            for i in range(args.requests)
+        ]
+        results, lock = [], threading.Lock()
+        threads = [
+            threading.Thread(
+                target=worker, args=(jobs, admin, buyer, book_ids, results, lock)
+            )
+            for _ in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        event_bus.flush()
+
+    outcomes = [outcome for outcome, _ in results]
+    return {
+        "mode": mode,
+        "requests": len(results),
+        "ok": outcomes.count("ok"),
+        "locked": outcomes.count("locked"),
+        "errors": outcomes.count("error"),
+        "req_per_s": round(len(results) / elapsed),
+        **summarize([ms for _, ms in results]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    if connection.vendor != "sqlite":
+        parser.error("this benchmark targets the SQLite configuration")
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [run(mode, args, directory) for mode in args.modes]
+    print_table(
+        rows,
+        [
+            "mode",
+            "requests",
+            "ok",
+            "locked",
+            "errors",
+            "req_per_s",
+            "p50_ms",
+            "p99_ms",
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
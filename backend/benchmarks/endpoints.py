@@ -0,0 +1,570 @@
+"""
+Drives every route of ``books/urls.py`` through the Django test client on
+databases filled by ``seed_perf_data`` at several sizes (N books, N orders,
+2N comments) and records latency percentiles, SQL queries and the peak
+memory allocated per request. The view cache is cleared before every
+request unless --warm is given, so reads show how the queries scale.
+
+    python -m benchmarks.endpoints --sizes 1000 10000 100000 --output out.json
+    python -m benchmarks.endpoints --sizes 1000 --update-baseline
+    python -m benchmarks.endpoints --sizes 1000
+
+With a baseline file (default ``benchmarks/endpoints_baseline.json``) every
+result is compared against it and the script exits with status 1 when an
+endpoint got slower than --tolerance, runs more queries, allocates much
+more memory or answers with another status. Latencies only compare well on
+the machine that wrote the baseline; query counts compare anywhere.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import platform
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Optional
+
+from benchmarks.common import print_table, summarize, test_database
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from books import urls
+from books.cache import view_cache
+from books.models import Book, Comment, GalleryImage, Order, Slider, Theme
+from books.seeding import USERNAME_PREFIX
+from books.uploads import start_upload, write_part
+
+DEFAULT_BASELINE = Path(__file__).with_name("endpoints_baseline.json")
+ROUTE_PARAM = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+@dataclass
+class Case:
+    route: str
+    method: str = "get"
+    user: Optional[str] = None
+    query: str = ""
+    data: object = None
+    params: dict = field(default_factory=dict)
+    # Called before every request (untimed) for cases that use up their
+    # target, e.g. deletes; returns extra route params.
+    prepare: Optional[Callable] = None
+    multipart: bool = False
+    # Sends ``data`` as a raw body of this type instead of encoding it.
+    content_type: Optional[str] = None
+
+    @property
+    def key(self):
+        return f"{self.method.upper()} {self.route}{self.query}"
+
+
+def png():
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (640, 400), "navy").save(buffer, "PNG")
+    return SimpleUploadedFile("cover.png", buffer.getvalue(), "image/png")
+
+
+def order_payload(ctx):
+    return {
+        "shipping_address": "ul. Długa 1",
+        "city": "Gdańsk",
+        "postal_code": "80-001",
+        "phone_number": "500600700",
+        "items": [{"book": ctx["book"], "quantity": 2}, {"book": ctx["book2"]}],
+    }
+
+
+def new_theme(case):
+    theme = Theme.objects.create(
+        name="Tymczasowy",
+        primary_color="#000000",
+        secondary_color="#111111",
+        accent_color="#222222",
+    )
+    return {"theme_id": theme.id}
+
+
+def new_slider(case):
+    return {"slider_id": Slider.objects.create(title="Tymczasowy").id}
+
+
+def png_bytes():
+    return png().read()
+
+
+def new_upload(ctx, received=False):
+    content = png_bytes()
+
+    def prepare(case):
+        upload = start_upload(ctx["users"]["admin"], "cover.png", len(content))
+        if received:
+            write_part(upload, BytesIO(content), len(content))
+        return {"upload_id": upload.pk}
+
+    return prepare
+
+
+def slider_orders(ctx):
+    # Alternates two orders so every request moves all of the images.
+    orders = itertools.cycle([ctx["images"][::-1], ctx["images"]])
+    return lambda: {"images": next(orders)}
+
+
+def cases(ctx):
+    order = order_payload(ctx)
+    return [
+        Case("user_status/", user="customer"),
+        Case("profile/", user="customer"),
+        Case("books/"),
+        Case("books/", query="?page_size=24"),
+        Case("books/", user="admin"),
+        Case("books/browse/", query="?sort=popular"),
+        Case(
+            "books/browse/",
+            query=f"?category={ctx['category']}&min_price=20&max_price=80&sort=price",
+        ),
+        Case("books/top/"),
+        Case("books/top/", query="?category=" + str(ctx["category"])),
+        Case("books/search/", query="?q=smok"),
+        Case("books/<int:pk>/", params={"pk": ctx["book"]}),
+        Case("moderation/queue/", user="moderator"),
+        Case("moderation/queue/", user="admin", query="?type=comments"),
+        Case("categories/"),
+        Case("books/<int:book_id>/comments/", params={"book_id": ctx["book"]}),
+        Case(
+            "books/<int:book_id>/comments/",
+            query="?page_size=50",
+            params={"book_id": ctx["book"]},
+        ),
+        Case("events/", user="customer"),
+        Case("events/export/", user="admin", query="?output=csv"),
+        Case("events/bus/stats/", user="admin"),
+        Case("theme/default/"),
+        Case("themes/"),
+        Case("themes/select/", user="customer"),
+        Case("images/"),
+        Case("sliders/"),
+        Case("sliders/default/"),
+        Case("sliders/<int:slider_id>/", params={"slider_id": ctx["slider"]}),
+        Case("cache/stats/", user="admin"),
+        Case("_metrics", user="admin"),
+        Case("orders/", user="customer"),
+        Case("orders/", user="admin", query="?page_size=50"),
+        Case("orders/export/", user="admin", query="?output=csv"),
+        Case(
+            "orders/<int:order_id>/", user="customer", params={"order_id": ctx["order"]}
+        ),
+        Case("reports/sales/", user="admin"),
+        Case("reports/sales/", user="admin", query="?bucket=month&group=category"),
+        # Writes last, so the reads above see the seeded data only.
+        Case("user/update/", "put", "customer", data={"city": "Gdańsk"}),
+        Case(
+            "books/create/",
+            "post",
+            "customer",
+            data={"title": "Nowa", "price": "19.99", "category": ctx["category"]},
+            multipart=True,  # as the frontend sends it
+        ),
+        Case(
+            "books/<int:pk>/",
+            "put",
+            "admin",
+            data={"description": "Opis"},
+            params={"pk": ctx["book"]},
+        ),
+        Case(
+            "books/<int:book_id>/approve/",
+            "patch",
+            "admin",
+            params={"book_id": ctx["pending"][0]},
+        ),
+        Case(
+            "books/<int:book_id>/reject/",
+            "patch",
+            "admin",
+            params={"book_id": ctx["pending"][1]},
+        ),
+        Case(
+            "books/moderate/",
+            "post",
+            "admin",
+            data={"ids": ctx["pending"][2:], "decision": "approve"},
+        ),
+        Case(
+            "comments/moderate/",
+            "post",
+            "admin",
+            data={"ids": ctx["comments"][2:], "decision": "approve"},
+        ),
+        Case(
+            "books/<int:book_id>/comments/",
+            "post",
+            "customer",
+            data={"content": "Polecam"},
+            params={"book_id": ctx["book"]},
+        ),
+        Case(
+            "comments/<int:comment_id>/approve/",
+            "post",
+            "admin",
+            params={"comment_id": ctx["comments"][0]},
+        ),
+        Case(
+            "comments/<int:comment_id>/reject/",
+            "post",
+            "admin",
+            params={"comment_id": ctx["comments"][1]},
+        ),
+        Case(
+            "themes/select/",
+            "post",
+            "customer",
+            data={"theme_id": ctx["theme"]},
+        ),
+        Case(
+            "themes/manage/",
+            "post",
+            "admin",
+            data={
+                "name": "Ciemny",
+                "primary_color": "#000000",
+                "secondary_color": "#333333",
+                "accent_color": "#ff0000",
+            },
+        ),
+        Case("themes/manage/<int:theme_id>/", "delete", "admin", prepare=new_theme),
+        Case(
+            "upload/",
+            "post",
+            "admin",
+            data=lambda: {"title": "Okładka", "description": "", "file": png()},
+            multipart=True,
+        ),
+        Case(
+            "uploads/",
+            "post",
+            "admin",
+            data={"filename": "cover.png", "size": len(png_bytes())},
+        ),
+        Case("uploads/<uuid:upload_id>/", "get", "admin", prepare=new_upload(ctx)),
+        Case(
+            "uploads/<uuid:upload_id>/",
+            "put",
+            "admin",
+            query="?offset=0",
+            data=png_bytes,
+            prepare=new_upload(ctx),
+            content_type="application/octet-stream",
+        ),
+        Case(
+            "uploads/<uuid:upload_id>/complete/",
+            "post",
+            "admin",
+            data={"title": "Okładka"},
+            prepare=new_upload(ctx, received=True),
+        ),
+        Case("sliders/", "post", "admin", data={"title": "Nowy"}),
+        Case(
+            "sliders/<int:slider_id>/",
+            "patch",
+            "admin",
+            data={"title": "Start"},
+            params={"slider_id": ctx["slider"]},
+        ),
+        Case("sliders/<int:slider_id>/", "delete", "admin", prepare=new_slider),
+        Case(
+            "sliders/<int:slider_id>/add_image/",
+            "post",
+            "admin",
+            data={"image_id": ctx["image"]},
+            params={"slider_id": ctx["slider"]},
+        ),
+        Case(
+            "sliders/<int:slider_id>/images/",
+            "put",
+            "admin",
+            data=slider_orders(ctx),
+            params={"slider_id": ctx["slider"]},
+        ),
+        Case(
+            "sliders/<int:slider_id>/update_order/",
+            "patch",
+            "admin",
+            data={"image_id": ctx["image"], "new_order": 2},
+            params={"slider_id": ctx["slider"]},
+        ),
+        Case(
+            "sliders/<int:slider_id>/set_default/",
+            "put",
+            "admin",
+            params={"slider_id": ctx["slider"]},
+        ),
+        Case("order/", "post", "customer", data=order),
+        Case("orders/batch/", "post", "admin", data={"orders": [order] * 20}),
+        Case(
+            "orders/<int:pk>/update-status/",
+            "post",
+            "admin",
+            data={"status": "shipped"},
+            params={"pk": ctx["order"]},
+        ),
+    ]
+
+
+def context():
+    customer = (
+        User.objects.filter(username__startswith=USERNAME_PREFIX, order__isnull=False)
+        .order_by("id")
+        .first()
+    )
+    books = list(
+        Book.objects.filter(approved=True)
+        .order_by("id")
+        .values_list("id", flat=True)[:2]
+    )
+    return {
+        "users": {
+            "customer": customer,
+            "admin": User.objects.get(username=f"{USERNAME_PREFIX}-admin"),
+            "moderator": User.objects.get(username=f"{USERNAME_PREFIX}-mod0"),
+        },
+        "book": books[0],
+        "book2": books[1],
+        "category": Book.objects.get(pk=books[0]).category_id,
+        "pending": list(
+            Book.objects.filter(approved__isnull=True).values_list("id", flat=True)[:22]
+        ),
+        "comments": list(
+            Comment.objects.filter(approved__isnull=True).values_list("id", flat=True)[
+                :22
+            ]
+        ),
+        "order": Order.objects.filter(user=customer)
+        .values_list("id", flat=True)
+        .first(),
+        "slider": Slider.objects.get(is_default=True).id,
+        "image": GalleryImage.objects.values_list("id", flat=True).first(),
+        "images": list(GalleryImage.objects.values_list("id", flat=True)),
+        "theme": Theme.objects.values_list("id", flat=True).first(),
+    }
+
+
+def check_coverage(all_cases):
+    routes = {str(pattern.pattern) for pattern in urls.urlpatterns}
+    missing = routes - {case.route for case in all_cases}
+    if missing:
+        sys.exit(f"No benchmark case for: {', '.join(sorted(missing))}")
+
+
+def make_clients(users):
+    clients = {None: APIClient(raise_request_exception=False)}
+    for role, user in users.items():
+        client = APIClient(raise_request_exception=False)
+        token = RefreshToken.for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        clients[role] = client
+    return clients
+
+
+def send(client, case, warm):
+    params = dict(case.params)
+    if case.prepare is not None:
+        params.update(case.prepare(case))
+    path = "/api/" + ROUTE_PARAM.sub(lambda m: str(params[m.group(1)]), case.route)
+    data = case.data() if callable(case.data) else case.data
+    if case.content_type:
+        kwargs = {"content_type": case.content_type}
+    else:
+        kwargs = {"format": "multipart" if case.multipart else "json"}
+    if not warm:
+        view_cache.clear()
+
+    started = time.perf_counter()
+    response = getattr(client, case.method)(path + case.query, data, **kwargs)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    else:
+        response.content
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+
+def run_case(client, case, repeat, warm, budget):
+    send(client, case, warm)  # warm-up: imports, prepared statements
+
+    samples = []
+    statuses = set()
+    queries = []
+    deadline = time.perf_counter() + budget
+    for run in range(repeat):
+        # Slow endpoints on large datasets stop after 3 runs past the budget.
+        if run >= 3 and time.perf_counter() > deadline:
+            break
+        with CaptureQueriesContext(connection) as captured:
+            status, elapsed = send(client, case, warm)
+        statuses.add(status)
+        samples.append(elapsed)
+        queries.append(len(captured))
+
+    tracemalloc.start()
+    send(client, case, warm)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        **summarize(samples),
+        "queries": max(queries),
+        "peak_kib": round(peak / 1024, 1),
+        "status": sorted(statuses)[-1],
+    }
+
+
+def run_size(size, repeat, warm, seed, budget):
+    call_command(
+        "seed_perf_data",
+        books=size,
+        orders=size,
+        comments=size * 2,
+        seed=seed,
+        stdout=open("/dev/null", "w"),
+    )
+    ctx = context()
+    all_cases = cases(ctx)
+    check_coverage(all_cases)
+    clients = make_clients(ctx["users"])
+
+    results = {}
+    for case in all_cases:
+        results[case.key] = run_case(clients[case.user], case, repeat, warm, budget)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for size, by_case in results.items():
+        for key, result in by_case.items():
+            base = baseline.get(size, {}).get(key)
+            if base is None:
+                continue
+            problems = []
+            if result["status"] != base["status"]:
+                problems.append(f"status {base['status']} -> {result['status']}")
+            if result["queries"] > base["queries"]:
+                problems.append(f"queries {base['queries']} -> {result['queries']}")
+            # p50: with ~20 runs p95 is the slowest sample and too noisy.
+            slower = result["p50_ms"] - base["p50_ms"]
+            if slower > min_delta_ms and result["p50_ms"] > base["p50_ms"] * (
+                1 + tolerance
+            ):
+                problems.append(f"p50 {base['p50_ms']} -> {result['p50_ms']} ms")
+            grown = result["peak_kib"] - base["peak_kib"]
+            if grown > 256 and result["peak_kib"] > base["peak_kib"] * (1 + tolerance):
+                problems.append(f"peak {base['peak_kib']} -> {result['peak_kib']} KiB")
+            if problems:
+                regressions.append(
+                    {"size": size, "endpoint": key, "regression": "; ".join(problems)}
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--budget", type=float, default=10, help="seconds per endpoint and size"
+    )
+    parser.add_argument("--warm", action="store_true", help="keep the view cache")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    for logger in ("books.requests", "django.request"):
+        logging.getLogger(logger).setLevel(logging.ERROR)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, override_settings(
+        MEDIA_ROOT=workdir,
+        IMAGE_DERIVATIVE_WORKERS=0,
+        CHUNKED_UPLOADS={"DIRECTORY": Path(workdir) / "uploads"},
+        EVENT_BUS={"MODE": "sync"},
+        ALLOWED_HOSTS=["testserver"],
+    ):
+        for size in args.sizes:
+            started = time.perf_counter()
+            # A fresh database file per size, as in-memory SQLite outlives
+            # destroy_test_db while the connection stays open.
+            with test_database(Path(workdir) / f"endpoints-{size}.sqlite3"):
+                results[str(size)] = run_size(
+                    size, args.repeat, args.warm, args.seed, args.budget
+                )
+            rows = [
+                {"endpoint": key, **{k: v for k, v in r.items() if k != "runs"}}
+                for key, r in results[str(size)].items()
+            ]
+            print(f"\n{size} books ({time.perf_counter() - started:.0f}s)")
+            print_table(
+                rows,
+                [
+                    "endpoint",
+                    "status",
+                    "queries",
+                    "p50_ms",
+                    "p95_ms",
+                    "p99_ms",
+                    "peak_kib",
+                ],
+            )
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "warm_cache": args.warm,
+            "seed": args.seed,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.update_baseline:
+        stored = {}
+        if args.baseline.exists():
+            stored = json.loads(args.baseline.read_text())["results"]
+        report["results"] = {**stored, **results}
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions against", args.baseline)
+            print_table(regressions, ["size", "endpoint", "regression"])
+            sys.exit(1)
+        print("\nNo regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares catalog search latency of the FTS5 index, the in-process inverted
+index and the ``icontains`` scan used by the admin. Every variant answers the
+same question the search endpoint does: the first page plus the total hit
+count (the index backends rank up to BOOK_SEARCH_MAX_RESULTS ids).
+
+    python -m benchmarks.search --books 100000 --repeat 50
+"""
+
+import argparse
+import random
+
+from benchmarks.common import (
+    make_books,
+    measure,
+    print_table,
+    test_database,
+    vocabulary,
+    zipf_weights,
+)
+from django.conf import settings
+from django.db.models import Q
+
+from books.models import Book
+from books.search import InvertedIndexBackend, SQLiteFTSBackend
+
+
+def icontains(term, page_size):
+    lookup = (
+        Q(title__icontains=term)
+        | Q(author__icontains=term)
+        | Q(description__icontains=term)
+    )
+    books = Book.objects.filter(lookup)
+    return books.count(), list(books.values_list("id", flat=True)[:page_size])
+
+
+def indexed(backend):
+    def run(term, page_size):
+        ids = backend.search(term, settings.BOOK_SEARCH_MAX_RESULTS)
+        return len(ids), ids[:page_size]
+
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed + 1)
+    vocab = vocabulary(seed=args.seed)
+    queries = rng.choices(vocab, zipf_weights(len(vocab)), k=args.repeat)
+    prefixes = [q[:3] for q in queries]
+
+    with test_database():
+        make_books(args.books, seed=args.seed)
+        fts, python = SQLiteFTSBackend(), InvertedIndexBackend()
+        fts.rebuild()
+        python.rebuild()
+
+        rows = []
+        for name, run in (
+            ("icontains", icontains),
+            ("fts5", indexed(fts)),
+            ("python", indexed(python)),
+        ):
+            for label, terms in (("word", queries), ("prefix", prefixes)):
+                terms_iter = iter(terms)
+                stats = measure(
+                    lambda: run(next(terms_iter), args.page_size), args.repeat
+                )
+                rows.append({"backend": name, "query": label, **stats})
+
+    print(f"{args.books} books, {args.repeat} queries per row")
+    print_table(rows, ["backend", "query", "mean_ms", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compares list serialization of books through DRF and the fast read-only
+path (``books.fieldsets.dump``), with the full representation and a
+sparse fieldset as used by list pages. Reports JSON payload bytes, CPU time
+of serialization alone and wall time of load + serialize, per 1,000 rows.
+
+    python -m benchmarks.serialization --books 1000 --repeat 20
+"""
+
+import argparse
+import time
+
+from benchmarks.common import make_books, print_table, summarize, test_database
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from books.fieldsets import dump, narrow_queryset
+from books.models import Book, Category
+from books.serializers import BookSerializer
+
+MANIFEST = {
+    "sizes": {
+        size: {
+            "width": width,
+            "height": width * 3 // 2,
+            "webp": f"derivatives/cover-{size}.webp",
+            "jpeg": f"derivatives/cover-{size}.jpg",
+        }
+        for size, width in (("thumb", 200), ("card", 480), ("hero", 1600))
+    }
+}
+FIELDSETS = {"full": "", "list": "?fields=id,title,price,derivatives"}
+
+
+def decorate_catalog():
+    moderator = User.objects.create(username="bench-mod")
+    for category in Category.objects.all():
+        category.moderators.add(moderator)
+    Book.objects.update(image="books/cover.jpg", image_derivatives=MANIFEST)
+
+
+def run(fieldset, path, rows):
+    request = RequestFactory().get(f"/api/books/{FIELDSETS[fieldset]}")
+    serializer = BookSerializer(context={"request": request})
+    books = narrow_queryset(
+        Book.objects.select_related("category").prefetch_related(
+            "category__moderators"
+        ),
+        serializer,
+    ).order_by("id")[:rows]
+
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        instances = list(books)
+    cpu = time.process_time()
+    if path == "fast":
+        data = dump(serializer, instances)
+    else:
+        data = BookSerializer(instances, many=True, context=serializer.context).data
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - started
+    return len(JSONRenderer().render(data)), len(ctx), cpu * 1000, wall * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with test_database():
+        make_books(args.books)
+        decorate_catalog()
+        scale = 1000 / args.books
+        results = []
+        for fieldset in FIELDSETS:
+            for path in ("drf", "fast"):
+                run(fieldset, path, args.books)  # warm-up
+                samples = [run(fieldset, path, args.books) for _ in range(args.repeat)]
+                payload, queries = samples[0][:2]
+                cpu = summarize([s[2] * scale for s in samples])
+                wall = summarize([s[3] * scale for s in samples])
+                results.append(
+                    {
+                        "fieldset": fieldset,
+                        "path": path,
+                        "bytes/1k": round(payload * scale),
+                        "queries": queries,
+                        "cpu_ms/1k": cpu["p50_ms"],
+                        "total_ms/1k": wall["p50_ms"],
+                    }
+                )
+
+    print(f"{args.books} books, median of {args.repeat} runs\n")
+    print_table(
+        results,
+        ["fieldset", "path", "bytes/1k", "queries", "cpu_ms/1k", "total_ms/1k"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ from .models import (
     Theme,
     GalleryImage,
     Slider,
+    SliderImage,
     UserProfile,
     Order,
     OrderItem,
@@ -61,7 +62,18 @@ class OrderItemAdmin(admin.ModelAdmin):
     search_fields = ("order__id", "book__title")
 
 
+class SliderImageInline(admin.TabularInline):
+    model = SliderImage
+    extra = 0
+    ordering = ("position",)
+
+
+@admin.register(Slider)
+class SliderAdmin(admin.ModelAdmin):
+    list_display = ("title", "is_default")
+    inlines = [SliderImageInline]
+
+
 admin.site.register(Theme)
 admin.site.register(GalleryImage)
-admin.site.register(Slider)
 admin.site.register(Event)
@@ -0,0 +1,189 @@
+"""
+Async versions of the hot catalog read endpoints, routed instead of the DRF
+views when ``ASYNC_CATALOG`` is on (opt-in: ``ASYNC_CATALOG=1``).
+
+They serve anonymous GET requests on the event loop with the async ORM and
+reuse the DRF serializers on the loaded objects, so the payloads are the
+same. Anything that needs authentication or writes (an Authorization
+header, another method) is handed to the sync view in a worker thread.
+"""
+
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+
+from . import views
+from .cache import view_cache
+from .fieldsets import dump, narrow_queryset
+from .models import Book, Category, Comment, Theme
+from .pagination import BookCursorPagination, CommentCursorPagination
+from .sliders import default_slider_snapshot
+from .serializers import (
+    BookSerializer,
+    CategorySerializer,
+    CommentSerializer,
+)
+
+
+class DataResponse(HttpResponse):
+    """JSON response that keeps its data around, like DRF's Response."""
+
+    def __init__(self, data, status=200):
+        content = b""
+        if data is not None:
+            content = json.dumps(
+                data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")
+            ).encode()
+        super().__init__(content, status=status, content_type="application/json")
+        self.data = data
+
+
+def async_read(sync_view):
+    """Serves anonymous GETs with the coroutine, everything else with ``sync_view``."""
+    fallback = sync_to_async(sync_view)
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method != "GET" or "HTTP_AUTHORIZATION" in request.META:
+                return await fallback(request, *args, **kwargs)
+            try:
+                return await handler(request, *args, **kwargs)
+            except APIException as e:
+                return DataResponse({"detail": e.detail}, status=e.status_code)
+
+        return view
+
+    return decorator
+
+
+def cached(*namespaces):
+    def decorator(handler):
+        name = f"async.{handler.__name__}"
+
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            return await view_cache.arespond(
+                name,
+                namespaces,
+                request,
+                lambda: handler(request, *args, **kwargs),
+                DataResponse,
+            )
+
+        return view
+
+    return decorator
+
+
+def conditional(*namespaces):
+    def decorator(handler):
+        name = f"async.{handler.__name__}"
+
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            return await view_cache.aconditional(
+                name,
+                namespaces,
+                request,
+                lambda: handler(request, *args, **kwargs),
+                DataResponse,
+            )
+
+        return view
+
+    return decorator
+
+
+def _books():
+    return Book.objects.select_related("category").prefetch_related(
+        "category__moderators"
+    )
+
+
+@async_read(views.BookListAPIView.as_view())
+@conditional("books", "categories")
+async def book_list(request):
+    paginator = BookCursorPagination()
+    serializer = BookSerializer(context={"request": request})
+    books = narrow_queryset(
+        _books().filter(approved=True), serializer, keep=paginator.cursor_fields
+    )
+    category_id = request.GET.get("category")
+    if category_id:
+        books = books.filter(category_id=category_id)
+
+    if paginator.is_requested(request):
+        page = await paginator.apaginate_queryset(books, request)
+        return DataResponse(paginator.get_paginated_data(dump(serializer, page)))
+
+    # prefetch_related rules out aiterator() on Django 4.2; async iteration
+    # fetches the rows and the prefetch in one worker-thread hop.
+    books = [book async for book in books]
+    return DataResponse(dump(serializer, books))
+
+
+@async_read(views.BookDetailAPIView.as_view())
+async def book_detail(request, pk):
+    try:
+        book = await _books().aget(pk=pk)
+    except Book.DoesNotExist:
+        return DataResponse({"detail": "Book not found"}, status=404)
+    return DataResponse(BookSerializer(book, context={"request": request}).data)
+
+
+@async_read(views.CategoryListAPIView.as_view())
+@cached("categories")
+async def category_list(request):
+    serializer = CategorySerializer(context={"request": request})
+    categories = narrow_queryset(
+        Category.objects.prefetch_related("moderators"), serializer
+    )
+    return DataResponse(dump(serializer, [category async for category in categories]))
+
+
+@async_read(views.product_comments)
+async def product_comments(request, book_id):
+    try:
+        book = await Book.objects.only("approved_comment_count").aget(id=book_id)
+    except Book.DoesNotExist:
+        return DataResponse({"detail": "Not found."}, status=404)
+    comments = Comment.objects.filter(book_id=book_id, approved=True).select_related(
+        "user"
+    )
+
+    paginator = CommentCursorPagination()
+    if paginator.is_requested(request):
+        page = await paginator.apaginate_queryset(comments, request)
+        data = CommentSerializer(page, many=True).data
+        return DataResponse(
+            paginator.get_paginated_data(data, count=book.approved_comment_count)
+        )
+
+    comments = comments.order_by(*paginator.ordering)
+    data = [CommentSerializer(c).data async for c in comments.aiterator()]
+    return DataResponse(data)
+
+
+@async_read(views.ThemeView.as_view())
+@cached("themes")
+async def theme(request):
+    theme = await Theme.objects.afirst()
+    if theme is None:
+        return DataResponse({"error": "No themes available."}, status=404)
+    return DataResponse(
+        {
+            "primary_color": theme.primary_color,
+            "secondary_color": theme.secondary_color,
+            "accent_color": theme.accent_color,
+        }
+    )
+
+
+@async_read(views.DefaultSliderView.as_view())
+async def default_slider(request):
+    return await sync_to_async(default_slider_snapshot.respond)(request)
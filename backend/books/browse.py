@@ -0,0 +1,123 @@
+from django.db.models import Count, F, Q
+from rest_framework.exceptions import ValidationError
+
+from .orders import parse_decimal
+
+BROWSE_SORTS = {
+    "newest": ("-created_at", "-id"),
+    "oldest": ("created_at", "id"),
+    "price": (F("price").asc(nulls_last=True), "id"),
+    "-price": (F("price").desc(nulls_last=True), "-id"),
+    "popular": (F("stats__sales_count").desc(nulls_last=True), "-id"),
+    "title": ("title", "id"),
+}
+# Upper bounds of the price facet buckets; the last bucket is open-ended.
+PRICE_BUCKETS = (20, 50, 100, 200)
+AUTHOR_FACET_LIMIT = 20
+# Ids outside a signed 64-bit integer overflow the database driver.
+ID_RANGE = range(-(2**63), 2**63)
+
+
+def parse_browse_filters(params):
+    """
+    ``category`` (comma separated ids), ``author`` (repeatable) and
+    ``min_price``/``max_price``, normalised so equal filters compare equal.
+    """
+    try:
+        categories = sorted(
+            {int(c) for c in params.get("category", "").split(",") if c}
+        )
+    except ValueError:
+        categories = None
+    if categories is None or any(c not in ID_RANGE for c in categories):
+        raise ValidationError({"category": "Nieprawidłowa kategoria."})
+    return {
+        "category": categories,
+        "author": sorted({a.strip() for a in params.getlist("author") if a.strip()}),
+        "min_price": (
+            parse_decimal(params["min_price"], "min_price")
+            if params.get("min_price")
+            else None
+        ),
+        "max_price": (
+            parse_decimal(params["max_price"], "max_price")
+            if params.get("max_price")
+            else None
+        ),
+    }
+
+
+def filter_books(queryset, filters, exclude=None):
+    """Applies ``filters``, leaving out the facet named by ``exclude``."""
+    if filters["category"] and exclude != "category":
+        queryset = queryset.filter(category_id__in=filters["category"])
+    if filters["author"] and exclude != "author":
+        queryset = queryset.filter(author__in=filters["author"])
+    if exclude != "price":
+        if filters["min_price"] is not None:
+            queryset = queryset.filter(price__gte=filters["min_price"])
+        if filters["max_price"] is not None:
+            queryset = queryset.filter(price__lte=filters["max_price"])
+    return queryset
+
+
+def filter_signature(filters):
+    return "&".join(
+        f"{name}={','.join(map(str, value)) if isinstance(value, list) else value}"
+        for name, value in sorted(filters.items())
+    )
+
+
+def price_buckets():
+    bounds = (0, *PRICE_BUCKETS, None)
+    return list(zip(bounds, bounds[1:]))
+
+
+def book_facets(queryset, filters):
+    """
+    Category, author and price bucket counts with one GROUP BY or aggregate
+    query each. Every facet is counted with the other facets' filters only,
+    so the counts show what choosing another value would return.
+    """
+    categories = (
+        filter_books(queryset, filters, exclude="category")
+        .values("category_id", "category__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "category__name")
+    )
+    authors = (
+        filter_books(queryset, filters, exclude="author")
+        .values("author")
+        .annotate(count=Count("id"))
+        .order_by("-count", "author")[:AUTHOR_FACET_LIMIT]
+    )
+
+    buckets = price_buckets()
+    conditions = []
+    for low, high in buckets:
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        conditions.append(condition)
+    prices = filter_books(queryset, filters, exclude="price").aggregate(
+        **{
+            f"bucket{i}": Count("id", filter=condition)
+            for i, condition in enumerate(conditions)
+        }
+    )
+
+    return {
+        "category": [
+            {
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "count": row["count"],
+            }
+            for row in categories
+        ],
+        "author": [{"name": row["author"], "count": row["count"]} for row in authors],
+        "price": [
+            {"min": low, "max": high, "count": prices[f"bucket{i}"]}
+            for i, (low, high) in enumerate(buckets)
+        ],
+    }
@@ -0,0 +1,339 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CacheVersion
+from .permissions import permissions_for
+
+DEFAULTS = {"BACKEND": "lru", "ALIAS": "default", "TIMEOUT": 300, "MAX_ENTRIES": 1024}
+
+# Suffixes CompressionMiddleware appends to the ETag of an encoded response,
+# so each representation keeps a strong validator of its own.
+ETAG_ENCODINGS = ("br", "gzip")
+
+
+def strip_etag_encoding(tag):
+    for encoding in ETAG_ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def last_modified(version):
+    """The HTTP date of a nanosecond version, rounded up to the second."""
+    return -(-version // 1_000_000_000)
+
+
+def _settled(entry):
+    # Until its second has passed, a Last-Modified would also cover changes
+    # made later in that second, and If-Modified-Since would 304 them.
+    return entry["last_modified"] <= time.time()
+
+
+def not_modified(request, entry):
+    """Whether the request's validators match ``{"etag", "last_modified"}``."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [strip_etag_encoding(tag.strip()) for tag in if_none_match.split(",")]
+        return "*" in tags or entry["etag"] in tags
+    since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return since is not None and _settled(entry) and entry["last_modified"] <= since
+
+
+def set_validators(response, entry):
+    response["ETag"] = entry["etag"]
+    if _settled(entry):
+        response["Last-Modified"] = http_date(entry["last_modified"])
+    return response
+
+
+class LRUCache:
+    """Thread-safe in-process cache with LRU eviction and per-entry TTL."""
+
+    def __init__(self, max_entries=1024, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ViewCache:
+    """
+    Read-through cache for API responses. Entries are keyed by the versions
+    of the namespaces a view depends on, so bumping a namespace from a model
+    signal makes every dependent entry unreachable at once.
+
+    Namespace versions are nanosecond timestamps of the last change, kept in
+    ``CacheVersion`` rows so every worker validates against the same ones
+    whatever the store. They double as Last-Modified, and because a lost
+    version is re-created from the clock it can never collide with a version
+    used by older entries.
+    """
+
+    def __init__(self, config):
+        self.timeout = config["TIMEOUT"]
+        if config["BACKEND"] == "django":
+            self.store = caches[config["ALIAS"]]
+        else:
+            self.store = LRUCache(config["MAX_ENTRIES"], config["TIMEOUT"])
+        self._lock = threading.Lock()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    def versions(self, namespaces):
+        """The versions of ``namespaces``, read in one query."""
+        found = dict(
+            CacheVersion.objects.filter(namespace__in=namespaces).values_list(
+                "namespace", "version"
+            )
+        )
+        missing = [namespace for namespace in namespaces if namespace not in found]
+        if missing:
+            now = time.time_ns()
+            CacheVersion.objects.bulk_create(
+                [
+                    CacheVersion(namespace=namespace, version=now)
+                    for namespace in missing
+                ],
+                ignore_conflicts=True,
+            )
+            # Another worker may have created some of them first.
+            found.update(
+                CacheVersion.objects.filter(namespace__in=missing).values_list(
+                    "namespace", "version"
+                )
+            )
+        return [found[namespace] for namespace in namespaces]
+
+    def version(self, namespace):
+        return self.versions([namespace])[0]
+
+    def bump(self, *namespaces):
+        # Part of the caller's transaction: until it commits, other requests
+        # keep validating (and caching) the rows they can see under the old
+        # version.
+        version = time.time_ns()
+        updated = CacheVersion.objects.filter(namespace__in=namespaces).update(
+            version=Greatest(F("version") + 1, Value(version))
+        )
+        if updated < len(set(namespaces)):
+            CacheVersion.objects.bulk_create(
+                [
+                    CacheVersion(namespace=namespace, version=version)
+                    for namespace in namespaces
+                ],
+                ignore_conflicts=True,
+            )
+
+    def clear(self):
+        self.store.clear()
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self):
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            return {
+                name: {"hits": self.hits[name], "misses": self.misses[name]}
+                for name in names
+            }
+
+    def _count(self, counter, name):
+        with self._lock:
+            counter[name] += 1
+
+    def validators(self, name, namespaces, request, variant=""):
+        """
+        ``{"etag", "last_modified"}`` of a response, derived from the request
+        and the namespace versions only, so they are known before the view
+        runs. ``variant`` separates responses that differ per user.
+        """
+        versions = self.versions(namespaces)
+        fingerprint = "|".join(
+            [name, request.scheme, request.get_host(), request.get_full_path()]
+            + [str(v) for v in versions]
+            + ([variant] if variant else [])
+        )
+        return {
+            "etag": quote_etag(hashlib.md5(fingerprint.encode()).hexdigest()),
+            "last_modified": last_modified(max(versions)),
+        }
+
+    def memoize(self, name, namespaces, signature, compute):
+        """
+        Caches ``compute()`` under ``signature`` until one of ``namespaces``
+        changes, for derived data (e.g. facet counts) shared by many requests.
+        """
+        versions = "|".join(str(version) for version in self.versions(namespaces))
+        digest = hashlib.md5(f"{name}|{signature}|{versions}".encode()).hexdigest()
+        key = f"books:memo:{digest}"
+        value = self.store.get(key)
+        self._count(self.misses if value is None else self.hits, name)
+        if value is None:
+            value = compute()
+            self.store.set(key, value, self.timeout)
+        return value
+
+    def _lookup(self, name, namespaces, request):
+        entry = self.validators(name, namespaces, request)
+        if not_modified(request, entry):
+            return None, entry
+        key = f"books:view:{entry['etag'][1:-1]}"
+        cached = self.store.get(key)
+        self._count(self.misses if cached is None else self.hits, name)
+        return key, cached or entry
+
+    def _store(self, key, entry, data):
+        entry = {**entry, "data": data}
+        self.store.set(key, entry, self.timeout)
+        return entry
+
+    def _finish(self, request, entry, response_class):
+        if "data" not in entry or not_modified(request, entry):
+            response = response_class(None, status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = response_class(entry["data"])
+        return set_validators(response, entry)
+
+    def respond(self, name, namespaces, request, render):
+        key, entry = self._lookup(name, namespaces, request)
+        if key is not None and "data" not in entry:
+            response = render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self._store(key, entry, response.data)
+        return self._finish(request, entry, Response)
+
+    def conditional(self, name, namespaces, request, render, variant):
+        """
+        Validators without caching the body, for responses that differ per
+        user. A matching If-None-Match is answered before ``render`` runs.
+        """
+        entry = self.validators(name, namespaces, request, variant)
+        if not_modified(request, entry):
+            response = Response(None, status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        patch_vary_headers(response, ("Authorization",))
+        return set_validators(response, entry)
+
+    async def arespond(self, name, namespaces, request, render, response_class):
+        """
+        ``respond`` for async views: ``render`` is a coroutine function
+        returning a response with ``.data``. Version and store lookups run in
+        a worker thread.
+        """
+        key, entry = await sync_to_async(self._lookup)(name, namespaces, request)
+        if key is not None and "data" not in entry:
+            response = await render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = await sync_to_async(self._store)(key, entry, response.data)
+        return self._finish(request, entry, response_class)
+
+    async def aconditional(self, name, namespaces, request, render, response_class):
+        """``conditional`` for anonymous async views."""
+        entry = await sync_to_async(self.validators)(
+            name, namespaces, request, "anonymous"
+        )
+        if not_modified(request, entry):
+            response = response_class(None, status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = await render()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        patch_vary_headers(response, ("Authorization",))
+        return set_validators(response, entry)
+
+
+view_cache = ViewCache({**DEFAULTS, **getattr(settings, "BOOKS_VIEW_CACHE", {})})
+
+
+def cached_view(*namespaces):
+    """Caches a GET handler; invalidated whenever one of ``namespaces`` changes."""
+
+    def decorator(method):
+        name = method.__qualname__
+
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            return view_cache.respond(
+                name,
+                namespaces,
+                request,
+                lambda: method(view, request, *args, **kwargs),
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_view(*namespaces):
+    """
+    Gives a per-user GET handler an ETag built from ``namespaces`` and the
+    user's visibility, and answers a matching If-None-Match with 304 before
+    the handler queries or serializes anything.
+    """
+
+    def decorator(method):
+        name = method.__qualname__
+
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            return view_cache.conditional(
+                name,
+                namespaces,
+                request,
+                lambda: method(view, request, *args, **kwargs),
+                permissions_for(request).visibility_key(),
+            )
+
+        return wrapper
+
+    return decorator
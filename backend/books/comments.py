@@ -0,0 +1,29 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .cache import view_cache
+from .models import Book, Comment
+from .stats import sync_comment_counts
+
+
+def refresh_comment_counts(book_ids):
+    """
+    Recomputes ``Book.approved_comment_count`` for ``book_ids`` in a single
+    UPDATE, using the (book, approved, created_at) index. Recounting instead
+    of incrementing keeps the value right under concurrent moderation.
+    """
+    book_ids = {book_id for book_id in book_ids if book_id is not None}
+    if not book_ids:
+        return
+    approved = (
+        Comment.objects.filter(book=OuterRef("pk"), approved=True)
+        .order_by()
+        .values("book")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Book.objects.filter(id__in=book_ids).update(
+        approved_comment_count=Coalesce(Subquery(approved), 0)
+    )
+    sync_comment_counts(book_ids)
+    view_cache.bump("books")
@@ -0,0 +1,177 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "MODE": "async",
+    "MAX_QUEUE": 10000,
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 0.5,
+    "BLOCK_TIMEOUT": 0.05,
+}
+
+_STOP = object()
+
+
+class EventBus:
+    """
+    Moves ``Event`` writes off the request path. Published events are queued
+    once the surrounding transaction commits, and a single writer thread
+    inserts them with ``bulk_create`` whenever BATCH_SIZE events are waiting
+    or FLUSH_INTERVAL seconds have passed since the first one.
+
+    A full queue first blocks the publisher for up to BLOCK_TIMEOUT seconds
+    (counted as backpressure) and then drops the event (counted as dropped).
+    In "sync" mode events are written immediately; tests that assert events
+    switch to it with override_settings.
+    ``created_at`` is set when the batch is written, so it may trail the
+    action by up to FLUSH_INTERVAL.
+    """
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.written = 0
+        self.dropped = 0
+        self.backpressure = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def config(self):
+        return {**DEFAULTS, **getattr(settings, "EVENT_BUS", {})}
+
+    def publish(self, user, action, description):
+        event = Event(user=user, action=action, description=description)
+        if self.config["MODE"] == "sync":
+            event.save()
+            self._count(published=1, written=1)
+            return
+        transaction.on_commit(lambda: self._enqueue(event))
+
+    def publish_many(self, events):
+        if self.config["MODE"] == "sync":
+            Event.objects.bulk_create(events)
+            self._count(published=len(events), written=len(events))
+            return
+        transaction.on_commit(lambda: [self._enqueue(event) for event in events])
+
+    def _enqueue(self, event):
+        config = self.config
+        self._ensure_started(config)
+        self._count(published=1)
+        try:
+            self._queue.put_nowait(event)
+            return
+        except queue.Full:
+            self._count(backpressure=1)
+        try:
+            self._queue.put(event, timeout=config["BLOCK_TIMEOUT"])
+        except queue.Full:
+            self._count(dropped=1)
+            logger.warning("Event queue full, dropped %s event", event.action)
+
+    def _ensure_started(self, config):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._queue is None:
+                    self._queue = queue.Queue(maxsize=config["MAX_QUEUE"])
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(config["BATCH_SIZE"], config["FLUSH_INTERVAL"]),
+                    name="event-bus-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self, batch_size, flush_interval):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+                self._queue.task_done()
+            elif item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + flush_interval
+
+            if batch and (
+                stopping or len(batch) >= batch_size or time.monotonic() >= deadline
+            ):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch, deadline = [], None
+        close_old_connections()
+
+    def _write(self, batch):
+        try:
+            close_old_connections()
+            Event.objects.bulk_create(batch)
+            self._count(written=len(batch), batches=1)
+        except Exception:
+            self._count(failed=len(batch))
+            logger.exception("Writing %d events failed", len(batch))
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def flush(self, timeout=5.0):
+        """Waits until every queued event has been written (or has failed)."""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self, timeout=5.0):
+        """Drains the queue and stops the writer thread."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Event queue still full at shutdown")
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.config["MODE"],
+                "queue_depth": self._queue.qsize() if self._queue else 0,
+                "published": self.published,
+                "written": self.written,
+                "dropped": self.dropped,
+                "backpressure": self.backpressure,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+
+event_bus = EventBus()
+atexit.register(event_bus.stop)
@@ -0,0 +1,114 @@
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+
+from .feeds import iter_rows
+from .orders import filter_created_at
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+ORDER_EXPORT_FIELDS = {
+    "id": "id",
+    "username": "user__username",
+    "status": "status",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "total_price": "total_price",
+    "shipping_address": "shipping_address",
+    "city": "city",
+    "postal_code": "postal_code",
+    "phone_number": "phone_number",
+}
+ORDER_ITEM_EXPORT_FIELDS = {
+    "order_id": "order_id",
+    "created_at": "order__created_at",
+    "status": "order__status",
+    "username": "order__user__username",
+    "book_id": "book_id",
+    "book_title": "book__title",
+    "quantity": "quantity",
+    "total_price": "total_price",
+}
+EVENT_EXPORT_FIELDS = {
+    "id": "id",
+    "username": "user__username",
+    "action": "action",
+    "description": "description",
+    "created_at": "created_at",
+}
+
+
+def filter_events(queryset, params):
+    """``action`` (comma separated), ``user`` (id or username) and dates."""
+    actions = [a for a in params.get("action", "").split(",") if a]
+    if actions:
+        queryset = queryset.filter(action__in=actions)
+
+    user = params.get("user")
+    if user:
+        queryset = (
+            queryset.filter(user_id=int(user))
+            if user.isdigit()
+            else queryset.filter(user__username=user)
+        )
+    return filter_created_at(queryset, params)
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def iter_values(queryset, fields, chunk_size=CHUNK_SIZE):
+    """
+    Streams ``queryset`` as dicts keyed by the export column names. Uses a
+    ``.values()`` projection over a server-side iterator, so only one chunk
+    of rows is held in memory at a time.
+    """
+    lookups = list(fields.values())
+    for row in queryset.order_by("pk").values_list(*lookups).iterator(chunk_size):
+        yield {name: _plain(value) for name, value in zip(fields, row)}
+
+
+def _buffered(chunks, size=BUFFER_SIZE):
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer).encode()
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(rows, fields, fmt, filename, compress=False):
+    """Wraps a row iterator in a CSV/NDJSON StreamingHttpResponse."""
+    content = _buffered(
+        iter_rows(rows, "csv" if fmt == "csv" else "jsonl", list(fields))
+    )
+    content_type = EXPORT_FORMATS[fmt]
+    filename = f"{filename}.{fmt}"
+    if compress:
+        content = _gzipped(content)
+        content_type = "application/gzip"
+        filename += ".gz"
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,148 @@
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from .orders import fits_amount, to_decimal
+
+BOOK_FEED_FIELDS = [
+    "external_id",
+    "title",
+    "author",
+    "description",
+    "price",
+    "category",
+    "user",
+    "approved",
+]
+
+FORMATS = ("csv", "jsonl")
+
+
+class FeedError(ValueError):
+    pass
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+@contextmanager
+def open_feed(path, mode):
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+        return
+    with open(path, mode, encoding="utf-8", newline="") as f:
+        yield f
+
+
+def read_rows(stream, fmt):
+    """Yields one dict per CSV row / JSON line without loading the file."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise FeedError(f"line {line_number}: {e}")
+
+
+class RowWriter:
+    """
+    Writes dict rows as CSV or JSON lines to any object with ``write()`` and
+    returns whatever that ``write()`` returns.
+    """
+
+    def __init__(self, stream, fmt, fields):
+        self.fmt = fmt
+        self.fields = fields
+        self.stream = stream
+        if fmt == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=fields, extrasaction="ignore")
+
+    def write_header(self):
+        if self.fmt == "csv":
+            return self._csv.writeheader()
+        return ""
+
+    def write(self, row):
+        if self.fmt == "csv":
+            return self._csv.writerow(row)
+        return self.stream.write(
+            json.dumps(row, ensure_ascii=False, default=str) + "\n"
+        )
+
+
+class Echo:
+    """A file-like object whose ``write()`` hands the text back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(rows, fmt, fields):
+    """Yields the header and every row of ``rows`` as encoded text chunks."""
+    writer = RowWriter(Echo(), fmt, fields)
+    header = writer.write_header()
+    if header:
+        yield header
+    for row in rows:
+        yield writer.write(row)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_price(value):
+    if value in (None, ""):
+        return None
+    price = to_decimal(str(value))
+    if price is None or not fits_amount(price):
+        raise FeedError(f"invalid price {value!r}")
+    return price
+
+
+def parse_approved(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "tak"):
+        return True
+    if text in ("0", "false", "no", "nie"):
+        return False
+    raise FeedError(f"invalid approved value {value!r}")
+
+
+class Throughput:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+
+    def add(self, count):
+        self.rows += count
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return f"{self.rows} rows in {self.elapsed:.1f}s ({self.rate:,.0f} rows/s)"
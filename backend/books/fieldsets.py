@@ -0,0 +1,280 @@
+"""
+Sparse fieldsets for the API serializers.
+
+``?fields=id,title,price`` keeps only the listed fields of the top-level
+serializer; dotted names narrow nested ones (``category.name``). With
+``fields`` given, nested objects that are not listed with sub-fields are
+collapsed to their primary keys unless named in ``?expand=``. Without
+``fields`` the output is unchanged.
+
+``narrow_queryset`` limits the SQL to the columns and relations the chosen
+fields read, and ``dump`` is a read-only serialization path for lists that
+calls each field's converter directly instead of going through DRF's
+per-row field machinery.
+"""
+
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Manager, Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+from .metrics import serializing
+
+# Converters equal to DRF's to_representation for values that are not None.
+FAST_CONVERTERS = {
+    serializers.CharField: str,
+    serializers.IntegerField: int,
+    serializers.BooleanField: bool,
+}
+
+
+def parse_fieldset(value):
+    """``"id,category.name"`` -> ``{"id": {}, "category": {"name": {}}}``."""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def _is_nested(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def _collapse(name, field):
+    kwargs = {"read_only": True}
+    if field.source and field.source != name:
+        kwargs["source"] = field.source
+    if isinstance(field, serializers.ListSerializer):
+        return PrimaryKeyRelatedField(many=True, **kwargs)
+    return PrimaryKeyRelatedField(**kwargs)
+
+
+class SparseFieldsMixin:
+    """
+    Applies ``?fields=``/``?expand=`` from the request in the serializer
+    context to GET responses. Method fields name the model fields they read
+    in ``Meta.method_sources`` so ``narrow_queryset`` can keep them loaded.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        wanted, expand = self.sparse_spec
+        if wanted is None:
+            return fields
+
+        unknown = sorted(set(wanted) - set(fields))
+        if unknown:
+            raise ValidationError({"fields": f"Nieznane pole: {', '.join(unknown)}."})
+        narrowed = {}
+        for name, field in fields.items():
+            if name not in wanted:
+                continue
+            if _is_nested(field):
+                if wanted[name] or name in expand:
+                    target = getattr(field, "child", field)
+                    target._sparse_spec = (wanted[name] or None, expand.get(name, {}))
+                else:
+                    field = _collapse(name, field)
+            narrowed[name] = field
+        return narrowed
+
+    @property
+    def sparse_spec(self):
+        """``(fields tree or None, expand tree)`` for this serializer."""
+        spec = getattr(self, "_sparse_spec", None)
+        if spec is not None:
+            return spec
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        request = self.context.get("request")
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return None, {}
+        params = getattr(request, "query_params", request.GET)
+        if "fields" not in params:
+            return None, {}
+        return parse_fieldset(params["fields"]), parse_fieldset(
+            params.get("expand", "")
+        )
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _requirements(serializer, model, prefix=""):
+    """
+    ``(columns, relations)`` read by ``serializer``'s fields, as ``only()``
+    paths and select/prefetch paths, or None when a field's needs are unknown.
+    """
+    columns, relations = [], set()
+    method_sources = getattr(getattr(serializer, "Meta", None), "method_sources", {})
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in method_sources:
+                return None
+            columns += [prefix + source for source in method_sources[name]]
+            continue
+        if field.source == "*":
+            return None
+        attrs = field.source_attrs
+        model_field = _model_field(model, attrs[0])
+        if model_field is None:
+            return None
+        path = prefix + attrs[0]
+        if not model_field.is_relation:
+            columns.append(path)
+        elif model_field.concrete:
+            columns.append(path)
+            if len(attrs) > 1:
+                relations.add(path)
+            elif _is_nested(field):
+                relations.add(path)
+                nested = _requirements(field, model_field.related_model, path + "__")
+                if nested is None:
+                    return None
+                columns += nested[0]
+                relations |= nested[1]
+        else:
+            # Many-to-many and reverse relations are prefetched; the related
+            # rows are loaded in full.
+            relations.add(path)
+    return columns, relations
+
+
+def _lookups(select_related, prefix=""):
+    for name, nested in select_related.items():
+        yield prefix + name
+        yield from _lookups(nested, f"{prefix}{name}__")
+
+
+def narrow_queryset(queryset, serializer, keep=()):
+    """
+    Restricts ``queryset`` to the columns ``serializer`` outputs under a
+    sparse fieldset (plus ``keep``, e.g. pagination cursor fields) and drops
+    joins and prefetches it no longer needs.
+    """
+    if serializer.sparse_spec[0] is None:
+        return queryset
+    needs = _requirements(serializer, queryset.model)
+    if needs is None:
+        return queryset
+    columns, relations = needs
+
+    prefetches = [
+        lookup
+        for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup)
+        in relations
+    ]
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        joins = [path for path in _lookups(select_related) if path in relations]
+        queryset = queryset.select_related(None)
+        if joins:
+            queryset = queryset.select_related(*joins)
+    return queryset.only(*columns, *keep)
+
+
+def _getter(field):
+    attrs = field.source_attrs
+    if len(attrs) == 1:
+        return attrgetter(attrs[0])
+
+    def get(instance):
+        for attr in attrs:
+            instance = getattr(instance, attr)
+            if instance is None:
+                return None
+        return instance
+
+    return get
+
+
+def _related(value):
+    return value.all() if isinstance(value, Manager) else value
+
+
+def _reader(serializer, field):
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+    if field.source == "*":
+        return field.to_representation
+    get = _getter(field)
+
+    if isinstance(field, serializers.ListSerializer):
+        plan = compile_plan(field.child)
+        return lambda obj: [render(plan, item) for item in _related(get(obj))]
+    if _is_nested(field):
+        plan = compile_plan(field)
+        # Rows often share the related object (e.g. a book's category), so
+        # each one is rendered once per dump and the result reused.
+        rendered = {}
+
+        def read(obj):
+            value = get(obj)
+            if value is None:
+                return None
+            if value.pk not in rendered:
+                rendered[value.pk] = render(plan, value)
+            return rendered[value.pk]
+
+        return read
+    if isinstance(field, ManyRelatedField):
+        child = field.child_relation
+        convert = (
+            attrgetter("pk")
+            if isinstance(child, PrimaryKeyRelatedField)
+            else child.to_representation
+        )
+        return lambda obj: [convert(item) for item in _related(get(obj))]
+    if isinstance(field, PrimaryKeyRelatedField) and len(field.source_attrs) == 1:
+        # The foreign key column; the related row is never loaded.
+        model_field = _model_field(field.parent.Meta.model, field.source)
+        if model_field is not None and model_field.many_to_one:
+            return attrgetter(model_field.attname)
+
+    convert = FAST_CONVERTERS.get(type(field), field.to_representation)
+    if isinstance(field, PrimaryKeyRelatedField):
+        convert = attrgetter("pk")
+
+    def read(obj):
+        value = get(obj)
+        return None if value is None else convert(value)
+
+    return read
+
+
+def compile_plan(serializer):
+    """``(name, reader)`` pairs producing the serializer's representation."""
+    return [
+        (name, _reader(serializer, field))
+        for name, field in serializer.fields.items()
+        if not field.write_only
+    ]
+
+
+def render(plan, instance):
+    return {name: read(instance) for name, read in plan}
+
+
+def dump(serializer, instances):
+    """
+    ``serializer.__class__(instances, many=True).data`` for read-only
+    output, without DRF's per-row attribute lookup and field dispatch.
+    Nested objects shared by several rows are the same dict in the result.
+    """
+    plan = compile_plan(serializer)
+    with serializing():
+        return [render(plan, instance) for instance in instances]
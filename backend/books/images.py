@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes; images are scaled down to fit, never up.
+DERIVATIVE_SIZES = {"thumb": (200, 200), "card": (480, 480), "hero": (1600, 1600)}
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+DERIVATIVES_DIR = "derivatives"
+MANIFEST = "manifest.json"
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _save_atomic(image, path, fmt, options):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(tmp, fmt, **options)
+    os.replace(tmp, path)
+
+
+def render_derivatives(source_path, media_root):
+    """
+    Renders every size/format of ``source_path`` into
+    ``<media_root>/derivatives/<sha[:2]>/<sha>/`` and returns the manifest.
+    A directory that already has a manifest is reused as is, so identical
+    uploads share one set of derivatives. Runs in worker processes, so it
+    must not touch the ORM.
+    """
+    sha = file_sha256(source_path)
+    relative_dir = os.path.join(DERIVATIVES_DIR, sha[:2], sha)
+    target_dir = os.path.join(media_root, relative_dir)
+    manifest_path = os.path.join(target_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    os.makedirs(target_dir, exist_ok=True)
+    sizes = {}
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        for size, box in DERIVATIVE_SIZES.items():
+            image = original.copy()
+            image.thumbnail(box, Image.LANCZOS)
+            entry = {"width": image.width, "height": image.height}
+            for ext, (fmt, options) in DERIVATIVE_FORMATS.items():
+                frame = image
+                if fmt == "JPEG" and image.mode != "RGB":
+                    frame = Image.new("RGB", image.size, "white")
+                    rgba = image.convert("RGBA")
+                    frame.paste(rgba, mask=rgba.getchannel("A"))
+                elif image.mode not in ("RGB", "RGBA"):
+                    frame = image.convert("RGBA")
+                filename = f"{size}.{ext}"
+                _save_atomic(frame, os.path.join(target_dir, filename), fmt, options)
+                entry[ext] = f"{relative_dir}/{filename}".replace(os.sep, "/")
+            sizes[size] = entry
+
+    manifest = {"sha256": sha, "sizes": sizes}
+    tmp = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+    return manifest
+
+
+class DerivativePool:
+    """
+    Bounded ProcessPoolExecutor for rendering derivatives after upload.
+    With ``IMAGE_DERIVATIVE_WORKERS = 0``, or when ``max_pending`` jobs are
+    already queued, the work runs synchronously in the caller instead.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        workers = getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2)
+        if workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                self._slots = threading.BoundedSemaphore(
+                    getattr(settings, "IMAGE_DERIVATIVE_MAX_PENDING", workers * 8)
+                )
+        return self._executor
+
+    def submit(self, source_path, callback):
+        executor = self._get_executor()
+        if executor is None or not self._slots.acquire(blocking=False):
+            callback(render_derivatives(source_path, str(settings.MEDIA_ROOT)))
+            return
+
+        future = executor.submit(
+            render_derivatives, source_path, str(settings.MEDIA_ROOT)
+        )
+
+        def done(future):
+            self._slots.release()
+            try:
+                callback(future.result())
+            except Exception:
+                logger.exception("Rendering derivatives of %s failed", source_path)
+            finally:
+                close_old_connections()
+
+        future.add_done_callback(done)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+derivative_pool = DerivativePool()
+
+
+def store_manifest(model, pk, manifest):
+    from .cache import view_cache
+    from .models import GalleryImage
+
+    model.objects.filter(pk=pk).update(image_derivatives=manifest)
+    # update() sends no signals.
+    if model is GalleryImage:
+        view_cache.bump("images", "sliders")
+    else:
+        view_cache.bump("books")
+
+
+def schedule_derivatives(instance):
+    """Renders derivatives for ``instance.image`` once the upload is committed."""
+    if not instance.image:
+        return
+    model, pk, path = type(instance), instance.pk, instance.image.path
+
+    def run():
+        try:
+            derivative_pool.submit(
+                path, lambda manifest: store_manifest(model, pk, manifest)
+            )
+        except Exception:
+            logger.exception("Rendering derivatives of %s failed", path)
+
+    transaction.on_commit(run)
+
+
+def derivative_urls(manifest, request=None):
+    """Maps a stored manifest to ``(derivatives, srcset)`` for serializers."""
+    if not manifest:
+        return None, None
+
+    def url(path):
+        path = settings.MEDIA_URL + path
+        return request.build_absolute_uri(path) if request else path
+
+    derivatives = {}
+    srcset = {ext: [] for ext in DERIVATIVE_FORMATS}
+    for size, entry in manifest["sizes"].items():
+        derivatives[size] = {"width": entry["width"], "height": entry["height"]}
+        for ext in DERIVATIVE_FORMATS:
+            derivatives[size][ext] = url(entry[ext])
+            srcset[ext].append(f"{derivatives[size][ext]} {entry['width']}w")
+    return derivatives, {ext: ", ".join(items) for ext, items in srcset.items()}
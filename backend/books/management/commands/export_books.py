@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from books.feeds import (
+    BOOK_FEED_FIELDS,
+    FORMATS,
+    RowWriter,
+    Throughput,
+    detect_format,
+    open_feed,
+)
+from books.models import Book
+
+# Feed column -> values() lookup; joins are resolved in SQL, not per row.
+COLUMNS = {
+    "external_id": "external_id",
+    "title": "title",
+    "author": "author",
+    "description": "description",
+    "price": "price",
+    "category": "category__name",
+    "user": "user__username",
+    "approved": "approved",
+}
+
+
+class Command(BaseCommand):
+    help = "Streams the catalog to a CSV or JSONL feed readable by import_books."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Output file, or - for stdout.")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--category", help="Only export this category name.")
+        parser.add_argument(
+            "--approved-only", action="store_true", help="Skip unapproved books."
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.order_by("id")
+        if options["category"]:
+            books = books.filter(category__name=options["category"])
+        if options["approved_only"]:
+            books = books.filter(approved=True)
+
+        lookups = [COLUMNS[field] for field in BOOK_FEED_FIELDS]
+        rows = books.values_list(*lookups).iterator(chunk_size=options["chunk_size"])
+        progress = Throughput()
+        with open_feed(options["path"], "w") as stream:
+            writer = RowWriter(
+                stream,
+                detect_format(options["path"], options["format"]),
+                BOOK_FEED_FIELDS,
+            )
+            writer.write_header()
+            for values in rows:
+                writer.write(dict(zip(BOOK_FEED_FIELDS, values)))
+                progress.add(1)
+
+        if options["path"] != "-":
+            self.stdout.write(self.style.SUCCESS(f"Exported {progress}."))
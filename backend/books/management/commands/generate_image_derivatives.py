@@ -0,0 +1,101 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from books.cache import view_cache
+from books.images import render_derivatives
+from books.models import Book, GalleryImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders thumb/card/hero derivatives for existing Book and GalleryImage files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render images that already have derivatives.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2),
+            help="Worker processes (0 renders in this process).",
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        executor = None
+        if options["workers"] > 0:
+            executor = ProcessPoolExecutor(max_workers=options["workers"])
+        try:
+            rendered = {
+                model: self.backfill(model, executor, options)
+                for model in (Book, GalleryImage)
+            }
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        # bulk_update sends no signals.
+        if rendered[Book]:
+            view_cache.bump("books")
+        if rendered[GalleryImage]:
+            view_cache.bump("images", "sliders")
+
+    def backfill(self, model, executor, options):
+        queryset = model.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["force"]:
+            queryset = queryset.filter(image_derivatives={})
+        queryset = queryset.only("id", "image").order_by("id")
+
+        started = time.perf_counter()
+        done = failed = 0
+        batch = []
+        for instance in queryset.iterator(chunk_size=options["batch_size"]):
+            batch.append(instance)
+            if len(batch) >= options["batch_size"]:
+                ok, bad = self.render_batch(model, batch, executor)
+                done, failed, batch = done + ok, failed + bad, []
+        ok, bad = self.render_batch(model, batch, executor)
+        done, failed = done + ok, failed + bad
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{model.__name__}: {done} rendered, {failed} failed in {elapsed:.1f}s."
+            )
+        )
+        return done
+
+    def render_batch(self, model, batch, executor):
+        if not batch:
+            return 0, 0
+        media_root = str(settings.MEDIA_ROOT)
+        paths = [instance.image.path for instance in batch]
+        if executor is None:
+            futures = None
+        else:
+            futures = [
+                executor.submit(render_derivatives, p, media_root) for p in paths
+            ]
+
+        updated = []
+        failed = 0
+        for index, instance in enumerate(batch):
+            try:
+                if futures is None:
+                    manifest = render_derivatives(paths[index], media_root)
+                else:
+                    manifest = futures[index].result()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{model.__name__} {instance.pk}: {e}")
+                continue
+            instance.image_derivatives = manifest
+            updated.append(instance)
+        model.objects.bulk_update(updated, ["image_derivatives"])
+        return len(updated), failed
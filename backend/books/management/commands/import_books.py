@@ -0,0 +1,177 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from books.cache import view_cache
+from books.feeds import (
+    FORMATS,
+    FeedError,
+    Throughput,
+    chunked,
+    detect_format,
+    open_feed,
+    parse_approved,
+    parse_price,
+    read_rows,
+)
+from books.models import Book, Category
+from books.search import get_search_backend
+
+# Feed column -> Book field written on update.
+UPDATABLE = {
+    "title": "title",
+    "author": "author",
+    "description": "description",
+    "price": "price",
+    "category": "category",
+    "user": "user",
+    "approved": "approved",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams books from a CSV or JSONL feed into the catalog. Rows with an "
+        "external_id update the existing book with that id (upsert)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or - for stdin.")
+        parser.add_argument("--format", choices=FORMATS)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--user", help="Username owning rows that have no user column."
+        )
+        parser.add_argument(
+            "--create-categories",
+            action="store_true",
+            help="Create categories that do not exist yet instead of failing the row.",
+        )
+        parser.add_argument(
+            "--strict", action="store_true", help="Abort on the first invalid row."
+        )
+        parser.add_argument(
+            "--skip-search-index",
+            action="store_true",
+            help="Do not rebuild the search index after the import.",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.categories = dict(Category.objects.values_list("name", "id"))
+        self.users = {}
+        self.default_user_id = None
+        if options["user"]:
+            self.default_user_id = self.user_ids([options["user"]]).get(options["user"])
+            if self.default_user_id is None:
+                raise CommandError(f"User {options['user']!r} does not exist.")
+
+        fmt = detect_format(options["path"], options["format"])
+        progress = Throughput()
+        created = updated = failed = 0
+        with open_feed(options["path"], "r") as stream:
+            rows = enumerate(read_rows(stream, fmt), 1)
+            try:
+                for chunk in chunked(rows, options["chunk_size"]):
+                    c, u, f = self.import_chunk(chunk)
+                    created, updated, failed = created + c, updated + u, failed + f
+                    progress.add(len(chunk))
+                    self.stdout.write(f"{progress}", ending="\r")
+                    self.stdout.flush()
+            except FeedError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write("")
+        if created or updated:
+            view_cache.bump("books")
+        if not options["skip_search_index"] and (created or updated):
+            get_search_backend().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{created} created, {updated} updated, {failed} failed; {progress}."
+            )
+        )
+
+    def user_ids(self, usernames):
+        missing = {name for name in usernames if name not in self.users}
+        if missing:
+            self.users.update(
+                User.objects.filter(username__in=missing).values_list("username", "id")
+            )
+        return self.users
+
+    def category_id(self, name):
+        if name not in self.categories:
+            if not self.options["create_categories"]:
+                raise FeedError(f"unknown category {name!r}")
+            self.categories[name] = Category.objects.create(name=name).id
+        return self.categories[name]
+
+    def build(self, row):
+        title = (row.get("title") or "").strip()
+        if not title:
+            raise FeedError("title is required")
+
+        values = {"title": title}
+        for field in ("external_id", "author", "description"):
+            if row.get(field) not in (None, ""):
+                values[field] = str(row[field])
+        if row.get("price") not in (None, ""):
+            values["price"] = parse_price(row["price"])
+        values["approved"] = parse_approved(row.get("approved"))
+        if row.get("category"):
+            values["category_id"] = self.category_id(row["category"])
+
+        username = row.get("user")
+        user_id = self.users.get(username) if username else self.default_user_id
+        if user_id is None:
+            raise FeedError(
+                f"unknown user {username!r}" if username else "user is required"
+            )
+        values["user_id"] = user_id
+        return Book(**values)
+
+    def fail(self, number, error):
+        if self.options["strict"]:
+            raise CommandError(f"row {number}: {error}")
+        self.stderr.write(f"row {number}: {error}")
+
+    def import_chunk(self, chunk):
+        self.user_ids({row.get("user") for _, row in chunk if row.get("user")})
+
+        books = {}
+        anonymous = []
+        failed = 0
+        fields = set()
+        for number, row in chunk:
+            try:
+                book = self.build(row)
+            except FeedError as e:
+                self.fail(number, e)
+                failed += 1
+                continue
+            fields.update(UPDATABLE[key] for key in row if key in UPDATABLE)
+            if book.external_id:
+                books[book.external_id] = book
+            else:
+                anonymous.append(book)
+
+        existing = set(
+            Book.objects.filter(external_id__in=list(books)).values_list(
+                "external_id", flat=True
+            )
+        )
+        updated = len(existing)
+
+        # Keyed rows are upserted with INSERT ... ON CONFLICT DO UPDATE, which
+        # is far cheaper than bulk_update's per-row CASE expressions.
+        with transaction.atomic():
+            Book.objects.bulk_create(anonymous)
+            if books:
+                Book.objects.bulk_create(
+                    books.values(),
+                    update_conflicts=True,
+                    unique_fields=["external_id"],
+                    update_fields=sorted(fields),
+                )
+        return len(anonymous) + len(books) - updated, updated, failed
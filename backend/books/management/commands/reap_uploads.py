@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from books.uploads import reap_uploads
+
+
+class Command(BaseCommand):
+    help = "Deletes chunked uploads that stopped receiving parts, with their files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=None,
+            help="Idle seconds before an upload is reaped (CHUNKED_UPLOADS).",
+        )
+
+    def handle(self, *args, **options):
+        reaped = reap_uploads(options["older_than"])
+        self.stdout.write(self.style.SUCCESS(f"Reaped {reaped} uploads."))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.stats import rebuild_book_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes sales, revenue and comment counts of every book from the "
+        "OrderItem and Comment tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            total = rebuild_book_stats(batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt statistics of {total} books in {elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the catalog full-text search index from the Book table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        with transaction.atomic():
+            total = backend.rebuild(chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {total} books with the {backend.name} backend "
+                f"in {elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from books.models import Book
+from books.seeding import USERNAME_PREFIX, seed_perf_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills an empty database with reproducible synthetic users, books, "
+        "orders and comments for benchmarks (bulk inserts, fixed seed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=1000)
+        parser.add_argument("--comments", type=int, default=2000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options["orders"] or options["comments"]:
+            if options["books"] < 1:
+                raise CommandError("Orders and comments need at least one book.")
+        if options["users"] < 1 or options["categories"] < 1:
+            raise CommandError("--users and --categories must be positive.")
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError(
+                "The database already holds generated data; use an empty one."
+            )
+        if Book.objects.exists():
+            self.stderr.write("Adding generated data to a non-empty catalog.")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            counts = seed_perf_data(
+                options["books"],
+                options["orders"],
+                options["comments"],
+                users=options["users"],
+                categories=options["categories"],
+                days=options["days"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {elapsed:.2f}s."))
@@ -0,0 +1,344 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger("books.requests")
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "LOG": True,
+    "SLOW_MS": 500,
+    # A statement run this many times in one request is reported as a likely
+    # N+1; "log" writes a warning, "raise" fails the request, "off" ignores it.
+    "DUPLICATE_QUERY_THRESHOLD": 10,
+    "DUPLICATE_QUERY_ACTION": "log",
+    "DURATION_BUCKETS": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    "QUERY_BUCKETS": (1, 2, 5, 10, 20, 50, 100),
+}
+
+_current = ContextVar("request_metrics", default=None)
+_END = object()
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "REQUEST_METRICS", {})}
+
+
+class DuplicateQueriesError(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.statements = Counter()
+        self._serializing = 0
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def duplicates(self, threshold):
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+    def server_timing(self):
+        return ", ".join(
+            [
+                f"total;dur={self.duration * 1000:.1f}",
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+                f"serialize;dur={self.serialize_time * 1000:.1f}",
+            ]
+        )
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection (see ``signals``)."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.statements[sql] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializing():
+    """
+    Adds the time spent in the block to the request's serializer time. Only
+    the outermost block is timed, so nested serializers and the items of a
+    ``many=True`` list are not counted twice. Queries run while serializing
+    (lazy relations) are included.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics._serializing:
+        yield
+        return
+    metrics._serializing += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+        metrics._serializing -= 1
+
+
+class SerializerTimingMixin:
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+HISTOGRAMS = (
+    ("bibliopolis_request_duration_seconds", "Wall time per request.", "duration"),
+    ("bibliopolis_request_db_seconds", "Time spent in SQL per request.", "db_time"),
+    (
+        "bibliopolis_request_serialize_seconds",
+        "Time spent in serializers per request.",
+        "serialize_time",
+    ),
+    ("bibliopolis_request_queries", "SQL queries per request.", "queries"),
+)
+
+
+class MetricsRegistry:
+    """
+    In-process histograms per URL name and method. Each worker process keeps
+    its own numbers, like the view cache and event bus counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._responses = Counter()
+            self._duplicates = Counter()
+
+    def observe(self, view, method, status_code, metrics, duplicated=False):
+        conf = config()
+        key = (view, method)
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = {
+                    attr: Histogram(
+                        conf["QUERY_BUCKETS"]
+                        if attr == "queries"
+                        else conf["DURATION_BUCKETS"]
+                    )
+                    for _, _, attr in HISTOGRAMS
+                }
+            for attr, histogram in histograms.items():
+                histogram.observe(getattr(metrics, attr))
+            self._responses[(view, method, status_code)] += 1
+            if duplicated:
+                self._duplicates[key] += 1
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            responses = sorted(self._responses.items())
+            duplicates = sorted(self._duplicates.items())
+
+        lines = []
+        for name, help_text, attr in HISTOGRAMS:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (view, method), by_attr in histograms:
+                labels = f'view="{view}",method="{method}"'
+                lines.extend(by_attr[attr].lines(name, labels))
+
+        name = "bibliopolis_requests_total"
+        lines += [f"# HELP {name} Responses by status.", f"# TYPE {name} counter"]
+        for (view, method, code), count in responses:
+            lines.append(
+                f'{name}{{view="{view}",method="{method}",status="{code}"}} {count}'
+            )
+
+        name = "bibliopolis_duplicate_query_requests_total"
+        lines += [
+            f"# HELP {name} Requests that repeated one statement past the threshold.",
+            f"# TYPE {name} counter",
+        ]
+        for (view, method), count in duplicates:
+            lines.append(f'{name}{{view="{view}",method="{method}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or match.func.__name__
+
+
+def report(request, response, metrics):
+    """
+    Records a finished request and reports repeated statements. A streamed
+    response is reported once its body has been sent, so it gets no
+    Server-Timing header and repeated statements are logged, not raised.
+    """
+    conf = config()
+    name = view_name(request)
+    streamed = response.streaming
+
+    duplicates = {}
+    if conf["DUPLICATE_QUERY_ACTION"] != "off":
+        duplicates = metrics.duplicates(conf["DUPLICATE_QUERY_THRESHOLD"])
+
+    registry.observe(
+        name, request.method, response.status_code, metrics, bool(duplicates)
+    )
+    if conf["SERVER_TIMING"] and not streamed:
+        response["Server-Timing"] = metrics.server_timing()
+
+    if conf["LOG"]:
+        duration_ms = metrics.duration * 1000
+        level = logging.WARNING if duration_ms >= conf["SLOW_MS"] else logging.INFO
+        line = {
+            "view": name,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_ms": round(metrics.db_time * 1000, 2),
+            "queries": metrics.queries,
+            "serialize_ms": round(metrics.serialize_time * 1000, 2),
+        }
+        if streamed:
+            line["streamed"] = True
+        logger.log(level, json.dumps(line))
+
+    if duplicates:
+        message = json.dumps(
+            {
+                "view": name,
+                "method": request.method,
+                "path": request.path,
+                "duplicate_queries": [
+                    {"sql": sql, "count": count}
+                    for sql, count in sorted(duplicates.items(), key=lambda i: -i[1])
+                ],
+            }
+        )
+        if conf["DUPLICATE_QUERY_ACTION"] == "raise" and not streamed:
+            raise DuplicateQueriesError(message)
+        logger.warning(message)
+
+
+class MeasuredStream:
+    """
+    The body of a streaming response, consumed with the request's metrics
+    active so the queries its generator runs are counted. The request is
+    reported when the server closes the response.
+    """
+
+    def __init__(self, content, request, response, metrics):
+        self._content = content
+        self._request = request
+        self._response = response
+        self._metrics = metrics
+        self._reported = False
+
+    def close(self):
+        if self._reported:
+            return
+        self._reported = True
+        self._metrics.finish()
+        report(self._request, self._response, self._metrics)
+
+
+class MeasuredIterator(MeasuredStream):
+    def __iter__(self):
+        iterator = iter(self._content)
+        while True:
+            # Active around each chunk only: the server may resume the
+            # generator from another context.
+            token = _current.set(self._metrics)
+            try:
+                chunk = next(iterator, _END)
+            finally:
+                _current.reset(token)
+            if chunk is _END:
+                return
+            yield chunk
+
+
+class MeasuredAsyncIterator(MeasuredStream):
+    async def __aiter__(self):
+        iterator = self._content.__aiter__()
+        while True:
+            token = _current.set(self._metrics)
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield chunk
+
+
+def report_streamed(request, response, metrics):
+    """Defers ``report`` of a streaming response until its body is sent."""
+    stream = MeasuredAsyncIterator if response.is_async else MeasuredIterator
+    response.streaming_content = stream(
+        response.streaming_content, request, response, metrics
+    )
@@ -0,0 +1,214 @@
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics
+from .cache import strip_etag_encoding
+from .permissions import load_permissions
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+COMPRESSION_DEFAULTS = {"MIN_SIZE": 1024, "GZIP_LEVEL": 6, "BROTLI_QUALITY": 5}
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures every request: wall time, SQL queries and their time, and time
+    spent in serializers. Adds a ``Server-Timing`` header, writes a JSON line
+    to the ``books.requests`` logger and feeds the histograms behind
+    ``/api/_metrics``. Streaming responses are reported once their body has
+    been sent. Configured by ``REQUEST_METRICS``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics.config()["ENABLED"]:
+            return self.get_response(request)
+        collected, token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop(token)
+        if response.streaming:
+            metrics.report_streamed(request, response, collected)
+            return response
+        collected.finish()
+        metrics.report(request, response, collected)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.config()["ENABLED"]:
+            return await self.get_response(request)
+        collected, token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop(token)
+        if response.streaming:
+            metrics.report_streamed(request, response, collected)
+            return response
+        collected.finish()
+        metrics.report(request, response, collected)
+        return response
+
+
+class PermissionContextMiddleware:
+    """
+    Attaches ``request.permissions``, built once on first use. DRF copies the
+    authenticated user onto the underlying request, so the context is
+    resolved for the JWT user rather than the session one.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.permissions = SimpleLazyObject(lambda: load_permissions(request.user))
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an Accept-Encoding header, without q=0 codings."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                continue
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return {coding: q for coding, q in accepted.items() if q > 0}
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses of at least MIN_SIZE bytes with brotli (when the
+    ``brotli`` package is installed) or gzip, whichever the client prefers.
+    A strong ETag gets the encoding appended ("...-gzip"), so every
+    representation keeps a strong validator; the view cache strips the
+    suffix again when it compares If-None-Match. Streaming responses and
+    ones already encoded (gzip exports) are left alone.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            return self._not_modified(request, response)
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or not 200 <= response.status_code < 300
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+
+        config = {**COMPRESSION_DEFAULTS, **getattr(settings, "HTTP_COMPRESSION", {})}
+        if len(response.content) < config["MIN_SIZE"]:
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        encoding = self.negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding == "br":
+            body = brotli.compress(response.content, quality=config["BROTLI_QUALITY"])
+        elif encoding == "gzip":
+            body = gzip.compress(
+                response.content, compresslevel=config["GZIP_LEVEL"], mtime=0
+            )
+        else:
+            return response
+        if len(body) >= len(response.content):
+            return response
+
+        response.content = body
+        response["Content-Length"] = str(len(body))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and not etag.startswith("W/"):
+            response["ETag"] = f'{etag[:-1]}-{encoding}"'
+        return response
+
+    @staticmethod
+    def negotiate(header):
+        accepted = accepted_encodings(header)
+        wildcard = accepted.get("*", 0)
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+        ranked = [
+            (accepted.get(coding, wildcard), -index, coding)
+            for index, coding in enumerate(available)
+        ]
+        q, _, coding = max(ranked)
+        return coding if q > 0 else None
+
+    @staticmethod
+    def _not_modified(request, response):
+        # Echo the encoded tag the client revalidated with.
+        etag = response.get("ETag")
+        for tag in request.headers.get("If-None-Match", "").split(","):
+            tag = tag.strip()
+            if etag and tag != etag and strip_etag_encoding(tag) == etag:
+                response["ETag"] = tag
+                patch_vary_headers(response, ("Accept-Encoding",))
+                break
+        return response
+
+
+class CacheControlMiddleware(MiddlewareMixin):
+    """
+    Sets Cache-Control on successful GET/HEAD responses that have none, from
+    the HTTP_CACHE_CONTROL policy of the URL name ("default" otherwise).
+    Requests with credentials get the "authenticated" policy.
+    """
+
+    def process_response(self, request, response):
+        if (
+            request.method not in ("GET", "HEAD")
+            or response.status_code not in (200, 304)
+            or response.has_header("Cache-Control")
+        ):
+            return response
+
+        policies = getattr(settings, "HTTP_CACHE_CONTROL", {})
+        match = getattr(request, "resolver_match", None)
+        policy = policies.get(match.url_name if match else None)
+        if policy is None:
+            policy = policies.get("default")
+        if policy is None:
+            return response
+
+        user = getattr(request, "user", None)
+        authenticated = "HTTP_AUTHORIZATION" in request.META or (
+            user is not None and user.is_authenticated
+        )
+        value = policy.get("authenticated" if authenticated else "anonymous")
+        if value:
+            response["Cache-Control"] = value
+        return response
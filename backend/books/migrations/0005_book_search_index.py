@@ -0,0 +1,52 @@
+import unicodedata
+
+from django.db import migrations
+
+FTS_TABLE = "books_book_fts"
+EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "ß": "ss"})
+
+
+def fold(text):
+    text = unicodedata.normalize("NFKD", (text or "").translate(EXTRA_FOLDS))
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    Book = apps.get_model("books", "Book")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, author, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author, description) "
+            "VALUES (%s, %s, %s, %s)",
+            [
+                (pk, fold(title), fold(author), fold(description))
+                for pk, title, author, description in Book.objects.values_list(
+                    "id", "title", "author", "description"
+                )
+            ],
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_alter_book_approved'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
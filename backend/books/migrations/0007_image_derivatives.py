@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0006_order_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="galleryimage",
+            name="image_derivatives",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
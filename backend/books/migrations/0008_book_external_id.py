@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0007_image_derivatives"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="external_id",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
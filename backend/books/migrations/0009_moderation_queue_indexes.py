@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-18 07:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0008_book_external_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["approved", "category", "created_at"],
+                name="books_book_approve_1828c6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["approved", "book", "created_at"],
+                name="books_comme_approve_e586d9_idx",
+            ),
+        ),
+    ]
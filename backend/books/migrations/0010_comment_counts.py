@@ -0,0 +1,41 @@
+# Generated by Django 4.2.17 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_approved_comments(apps, schema_editor):
+    Book = apps.get_model("books", "Book")
+    Comment = apps.get_model("books", "Comment")
+    approved = (
+        Comment.objects.filter(book=OuterRef("pk"), approved=True)
+        .order_by()
+        .values("book")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Book.objects.update(approved_comment_count=Coalesce(Subquery(approved), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0009_moderation_queue_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="approved_comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["book", "approved", "created_at"],
+                name="books_comme_book_id_5b27ed_idx",
+            ),
+        ),
+        migrations.RunPython(count_approved_comments, migrations.RunPython.noop),
+    ]
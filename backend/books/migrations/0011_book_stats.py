@@ -0,0 +1,66 @@
+# Generated by Django 4.2.17 on 2026-10-18 07:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0010_comment_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookStats",
+            fields=[
+                (
+                    "book",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="books.book",
+                    ),
+                ),
+                ("sales_count", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("comment_count", models.PositiveIntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="books.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-sales_count"], name="bookstats_sales_idx"),
+                    models.Index(fields=["-revenue"], name="bookstats_revenue_idx"),
+                    models.Index(
+                        fields=["-comment_count"], name="bookstats_comments_idx"
+                    ),
+                    models.Index(
+                        fields=["category", "-sales_count"],
+                        name="bookstats_cat_sales_idx",
+                    ),
+                    models.Index(
+                        fields=["category", "-revenue"],
+                        name="bookstats_cat_revenue_idx",
+                    ),
+                    models.Index(
+                        fields=["category", "-comment_count"],
+                        name="bookstats_cat_comments_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
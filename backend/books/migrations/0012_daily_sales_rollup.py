@@ -0,0 +1,66 @@
+# Generated by Django 4.2.17 on 2026-10-18 07:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0011_book_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySalesRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Oczekujące"),
+                            ("shipped", "Wysłane"),
+                            ("delivered", "Dostarczone"),
+                            ("cancelled", "Anulowane"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("all_categories", models.BooleanField(default=False)),
+                ("orders", models.IntegerField(default=0)),
+                ("items", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="books.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["all_categories", "day", "status"],
+                        name="rollup_day_idx",
+                    )
+                ],
+            },
+        ),
+    ]
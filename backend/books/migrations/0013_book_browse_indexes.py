@@ -0,0 +1,24 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0012_daily_sales_rollup"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["category", "approved", "price"],
+                name="books_book_categor_c245ce_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["author"], name="books_book_author_b941fe_idx"),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+def keep_first_default(apps, schema_editor):
+    # The default slider endpoint served the first one; the rest lose the flag.
+    Slider = apps.get_model("books", "Slider")
+    first = Slider.objects.filter(is_default=True).order_by("pk").first()
+    if first is not None:
+        Slider.objects.filter(is_default=True).exclude(pk=first.pk).update(
+            is_default=False
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0013_book_browse_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_first_default, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="slider",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_default", True)),
+                fields=("is_default",),
+                name="single_default_slider",
+            ),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_memberships(apps, schema_editor):
+    # Images keep the order in which they were added to the slider.
+    Slider = apps.get_model("books", "Slider")
+    SliderImage = apps.get_model("books", "SliderImage")
+    rows, positions = [], {}
+    for link in Slider.images.through.objects.order_by("slider_id", "id"):
+        position = positions.get(link.slider_id, 0)
+        positions[link.slider_id] = position + 1
+        rows.append(
+            SliderImage(
+                slider_id=link.slider_id,
+                image_id=link.galleryimage_id,
+                position=position,
+            )
+        )
+    SliderImage.objects.bulk_create(rows, batch_size=500)
+
+
+def restore_memberships(apps, schema_editor):
+    Slider = apps.get_model("books", "Slider")
+    SliderImage = apps.get_model("books", "SliderImage")
+    Slider.images.through.objects.bulk_create(
+        [
+            Slider.images.through(slider_id=row.slider_id, galleryimage_id=row.image_id)
+            for row in SliderImage.objects.order_by("slider_id", "position", "id")
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0014_single_default_slider"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SliderImage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.PositiveIntegerField(default=0)),
+                (
+                    "image",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="books.galleryimage",
+                    ),
+                ),
+                (
+                    "slider",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="books.slider"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["position", "id"],
+            },
+        ),
+        migrations.RunPython(copy_memberships, restore_memberships),
+        # A many-to-many field cannot be altered to use a custom through
+        # model, so the automatic one is dropped once its rows are copied.
+        migrations.RemoveField(
+            model_name="slider",
+            name="images",
+        ),
+        migrations.AddField(
+            model_name="slider",
+            name="images",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="sliders",
+                through="books.SliderImage",
+                to="books.galleryimage",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sliderimage",
+            index=models.Index(
+                fields=["slider", "position"], name="books_slide_slider__bfaf69_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="sliderimage",
+            constraint=models.UniqueConstraint(
+                fields=("slider", "image"), name="unique_slider_image"
+            ),
+        ),
+    ]
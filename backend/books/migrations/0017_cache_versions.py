@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("books", "0016_chunked_uploads"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CacheVersion",
+            fields=[
+                (
+                    "namespace",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("version", models.BigIntegerField()),
+            ],
+        ),
+    ]
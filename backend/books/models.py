@@ -1,9 +1,12 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
 
 class Book(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
     title = models.CharField(max_length=200)
     author = models.CharField(
         max_length=100, null=True, blank=True, default="Autor nieznany"
@@ -13,6 +16,7 @@ class Book(models.Model):
         max_digits=10, decimal_places=2, null=True, blank=True, default=1000.00
     )
     image = models.ImageField(upload_to="products/", blank=True, null=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey(
         "Category",
@@ -22,6 +26,15 @@ class Book(models.Model):
         related_name="books",
     )
     approved = models.BooleanField(null=True)
+    # Number of approved comments, kept up to date by books.comments.
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["approved", "category", "created_at"]),
+            models.Index(fields=["category", "approved", "price"]),
+            models.Index(fields=["author"]),
+        ]
 
     def __str__(self):
         return self.title
@@ -47,6 +60,12 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     approved = models.BooleanField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["approved", "book", "created_at"]),
+            models.Index(fields=["book", "approved", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.book.title}"
 
@@ -100,6 +119,7 @@ class GalleryImage(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     image = models.ImageField(upload_to="gallery/")
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.title
@@ -107,13 +127,42 @@ class GalleryImage(models.Model):
 
 class Slider(models.Model):
     title = models.CharField(max_length=255)
-    images = models.ManyToManyField(GalleryImage, related_name="sliders", blank=True)
+    images = models.ManyToManyField(
+        GalleryImage, through="SliderImage", related_name="sliders", blank=True
+    )
     is_default = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["is_default"],
+                condition=models.Q(is_default=True),
+                name="single_default_slider",
+            )
+        ]
+
     def __str__(self):
         return self.title
 
 
+class SliderImage(models.Model):
+    slider = models.ForeignKey(Slider, on_delete=models.CASCADE)
+    image = models.ForeignKey(GalleryImage, on_delete=models.CASCADE)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["position", "id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["slider", "image"], name="unique_slider_image"
+            )
+        ]
+        indexes = [models.Index(fields=["slider", "position"])]
+
+    def __str__(self):
+        return f"{self.slider} #{self.position}: {self.image}"
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("pending", "Oczekujące"),
@@ -132,6 +181,12 @@ class Order(models.Model):
     postal_code = models.CharField(max_length=20, null=True, blank=True)
     phone_number = models.CharField(max_length=20, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["user", "created_at"]),
+        ]
+
     def __str__(self):
         return f"Zamówienie {self.id} - {self.user.username}"
 
@@ -144,3 +199,102 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"Produkt: {self.book.title}, Ilość: {self.quantity}"
+
+
+class BookStats(models.Model):
+    """
+    Running totals per book, updated incrementally by books.stats. Sales and
+    revenue ignore cancelled orders. ``category`` is copied from the book so
+    the top lists can be read from a single index.
+    """
+
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    sales_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-sales_count"], name="bookstats_sales_idx"),
+            models.Index(fields=["-revenue"], name="bookstats_revenue_idx"),
+            models.Index(fields=["-comment_count"], name="bookstats_comments_idx"),
+            models.Index(
+                fields=["category", "-sales_count"], name="bookstats_cat_sales_idx"
+            ),
+            models.Index(
+                fields=["category", "-revenue"], name="bookstats_cat_revenue_idx"
+            ),
+            models.Index(
+                fields=["category", "-comment_count"],
+                name="bookstats_cat_comments_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Statystyki: {self.book.title}"
+
+
+class DailySalesRollup(models.Model):
+    """
+    Order totals per day and status, maintained by books.reports. Rows with
+    ``all_categories`` hold the exact totals of the day; the others split
+    items and revenue per category, where ``orders`` counts the orders that
+    contain that category.
+    """
+
+    day = models.DateField()
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    all_categories = models.BooleanField(default=False)
+    orders = models.IntegerField(default=0)
+    items = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["all_categories", "day", "status"], name="rollup_day_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.revenue}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    An image upload in progress; the bytes received so far are kept by
+    books.uploads under ``CHUNKED_UPLOADS["DIRECTORY"]``. Rows are deleted
+    when the upload completes or is reaped.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class CacheVersion(models.Model):
+    """
+    The version of a books.cache namespace: a nanosecond timestamp of its
+    last change, shared by every worker through the database.
+    """
+
+    namespace = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.namespace}: {self.version}"
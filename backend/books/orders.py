@@ -0,0 +1,272 @@
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .cache import view_cache
+from .models import Book, Order, OrderItem
+from .reports import record_new_orders, record_status_change
+from .stats import record_sales
+
+ORDER_FIELDS = ("shipping_address", "city", "postal_code", "phone_number")
+MAX_QUANTITY = 10_000
+# Prices and totals are DecimalField(max_digits=10, decimal_places=2).
+MAX_AMOUNT = Decimal("99999999.99")
+CENT = Decimal("0.01")
+
+
+class OrderError(Exception):
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def parse_order(data):
+    """Validates the request payload and returns ``(fields, lines)``."""
+    if not isinstance(data, dict):
+        raise OrderError("Nieprawidłowe dane zamówienia.")
+
+    fields = {name: data.get(name) for name in ORDER_FIELDS}
+    items = data.get("items")
+    if not all(fields.values()) or not items:
+        raise OrderError(
+            "Adres wysyłki, miasto, kod pocztowy, numer telefonu i produkty są wymagane."
+        )
+    if not isinstance(items, list):
+        raise OrderError("Nieprawidłowe pozycje zamówienia.")
+
+    lines = []
+    for item in items:
+        try:
+            book_id = int(item.get("book"))
+            quantity = int(item.get("quantity", 1))
+        except (AttributeError, TypeError, ValueError):
+            raise OrderError("Nieprawidłowe pozycje zamówienia.")
+        if not 1 <= quantity <= MAX_QUANTITY:
+            raise OrderError(f"Nieprawidłowa ilość dla książki {book_id}.")
+        lines.append((book_id, quantity))
+    return fields, lines
+
+
+def build_order(user, fields, lines, books):
+    """
+    Returns an unsaved Order and its OrderItems with prices taken from
+    ``books`` (an ``in_bulk`` map), so no query is issued here.
+    """
+    order = Order(user=user, **fields)
+    items = []
+    total_price = Decimal("0.00")
+    for book_id, quantity in lines:
+        book = books.get(book_id)
+        if book is None:
+            raise OrderError(f"Książka o id {book_id} nie istnieje.")
+        if book.price is None:
+            raise OrderError(f"Książka '{book.title}' nie ma ceny.")
+        item_total_price = book.price * quantity
+        if not fits_amount(item_total_price):
+            raise OrderError(f"Wartość pozycji dla książki {book_id} jest zbyt duża.")
+        total_price += item_total_price
+        items.append(
+            OrderItem(
+                order=order, book=book, quantity=quantity, total_price=item_total_price
+            )
+        )
+    if not fits_amount(total_price):
+        raise OrderError("Wartość zamówienia jest zbyt duża.")
+    order.total_price = total_price
+    return order, items
+
+
+def save_orders(built):
+    """Inserts ``[(order, items), ...]`` with one bulk_create per table."""
+    orders = Order.objects.bulk_create([order for order, _ in built])
+    all_items = []
+    for order, items in built:
+        for item in items:
+            item.order = order
+        all_items.extend(items)
+    OrderItem.objects.bulk_create(all_items)
+    record_sales(all_items)
+    record_new_orders(built)
+    view_cache.bump("orders")
+    return orders
+
+
+def set_order_status(order, new_status):
+    """
+    Saves the new status, moves the order's totals to the new status in the
+    daily rollup, and takes its items out of (or back into) the book sales
+    statistics when it is cancelled (or un-cancelled).
+    """
+    with transaction.atomic():
+        old_status = (
+            Order.objects.select_for_update()
+            .values_list("status", flat=True)
+            .get(pk=order.pk)
+        )
+        order.status = new_status
+        order.save()
+        if old_status == new_status:
+            return
+        items = list(
+            order.items.select_related("book").only(
+                "order", "quantity", "total_price", "book__category"
+            )
+        )
+        record_status_change(order, items, old_status, new_status)
+        if (old_status == "cancelled") != (new_status == "cancelled"):
+            record_sales(items, sign=-1 if new_status == "cancelled" else 1)
+
+
+def _parse_moment(value, param, end_of_day=False):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({param: "Nieprawidłowa data."})
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def to_decimal(value):
+    """``value`` as a finite Decimal, or None."""
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None
+    # NaN and Infinity parse, but no amount column accepts them.
+    return amount if amount.is_finite() else None
+
+
+def fits_amount(amount):
+    """Whether ``amount`` can be stored in a price or total column."""
+    return abs(amount) <= MAX_AMOUNT and amount == amount.quantize(CENT)
+
+
+def parse_decimal(value, param):
+    amount = to_decimal(value)
+    if amount is None:
+        raise ValidationError({param: "Nieprawidłowa kwota."})
+    return amount
+
+
+def filter_created_at(queryset, params):
+    """Applies ``date_from``/``date_to`` (ISO date or datetime) to created_at."""
+    if params.get("date_from"):
+        queryset = queryset.filter(
+            created_at__gte=_parse_moment(params["date_from"], "date_from")
+        )
+    if params.get("date_to"):
+        queryset = queryset.filter(
+            created_at__lte=_parse_moment(params["date_to"], "date_to", end_of_day=True)
+        )
+    return queryset
+
+
+def filter_orders(queryset, params):
+    """
+    Applies the list filters shared by the order endpoints: ``status``
+    (comma separated), ``date_from``/``date_to`` (ISO date or datetime),
+    ``user`` (id or username) and ``min_total``/``max_total``.
+    """
+    statuses = [s for s in params.get("status", "").split(",") if s]
+    if statuses:
+        unknown = set(statuses) - set(dict(Order.STATUS_CHOICES))
+        if unknown:
+            raise ValidationError({"status": "Nieprawidłowy status"})
+        queryset = queryset.filter(status__in=statuses)
+
+    queryset = filter_created_at(queryset, params)
+
+    user = params.get("user")
+    if user:
+        queryset = (
+            queryset.filter(user_id=int(user))
+            if user.isdigit()
+            else queryset.filter(user__username=user)
+        )
+
+    if params.get("min_total"):
+        queryset = queryset.filter(
+            total_price__gte=parse_decimal(params["min_total"], "min_total")
+        )
+    if params.get("max_total"):
+        queryset = queryset.filter(
+            total_price__lte=parse_decimal(params["max_total"], "max_total")
+        )
+    return queryset
+
+
+def order_items_prefetch():
+    return Prefetch("items", queryset=OrderItem.objects.select_related("book"))
+
+
+def prefetch_order_items(orders):
+    prefetch_related_objects(orders, order_items_prefetch())
+
+
+def place_order(user, data):
+    fields, lines = parse_order(data)
+    books = Book.objects.in_bulk({book_id for book_id, _ in lines})
+    order, items = build_order(user, fields, lines, books)
+    with transaction.atomic():
+        save_orders([(order, items)])
+    return order
+
+
+def place_orders(default_user, payloads, allow_user_override=False):
+    """
+    Creates many independent orders. Invalid orders are reported and
+    skipped; the valid ones are written in a single transaction. Returns a
+    list of ``(order, None)`` or ``(None, error)`` in payload order.
+    """
+    parsed = []
+    book_ids = set()
+    user_ids = set()
+    for data in payloads:
+        try:
+            fields, lines = parse_order(data)
+            user_id = data.get("user") if allow_user_override else None
+            if user_id is not None:
+                try:
+                    user_id = int(user_id)
+                except (TypeError, ValueError):
+                    raise OrderError(f"Użytkownik o id {user_id} nie istnieje.")
+                user_ids.add(user_id)
+        except OrderError as e:
+            parsed.append(e)
+            continue
+        parsed.append((user_id, fields, lines))
+        book_ids.update(book_id for book_id, _ in lines)
+
+    books = Book.objects.in_bulk(book_ids)
+    users = User.objects.in_bulk(user_ids) if user_ids else {}
+    results = []
+    built = []
+    for entry in parsed:
+        if isinstance(entry, OrderError):
+            results.append((None, entry.detail))
+            continue
+        user_id, fields, lines = entry
+        user = default_user if user_id is None else users.get(user_id)
+        try:
+            if user is None:
+                raise OrderError(f"Użytkownik o id {user_id} nie istnieje.")
+            order, items = build_order(user, fields, lines, books)
+        except OrderError as e:
+            results.append((None, e.detail))
+            continue
+        built.append((order, items))
+        results.append((order, None))
+
+    if built:
+        with transaction.atomic():
+            save_orders(built)
+    return results
@@ -0,0 +1,168 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique, composite ordering such as
+    ``(created_at, id)``. The cursor stores the ordering values of the last
+    row on the page, so fetching the next page is a single indexed range
+    query no matter how deep the client scrolls.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    @staticmethod
+    def _params(request):
+        # Plain Django requests (async views) have GET instead of query_params.
+        return getattr(request, "query_params", request.GET)
+
+    def is_requested(self, request):
+        params = self._params(request)
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(self._params(request)[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+
+        encoded = self._params(request).get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self._after(self.decode_cursor(encoded)))
+        return queryset.order_by(*self.ordering)[: self.page_size + 1]
+
+    @property
+    def cursor_fields(self):
+        """Model fields the cursor is read from, so they must stay loaded."""
+        return [self._field_name(f) for f in self.ordering]
+
+    def _finish_page(self, rows):
+        fields = self.cursor_fields
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        self.last_position = (
+            [self._value(rows[-1], field) for field in fields] if rows else None
+        )
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._finish_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        page = self._page_queryset(queryset, request)
+        return self._finish_page([row async for row in page])
+
+    def get_paginated_data(self, data, **extra):
+        return {"next": self.get_next_link(), **extra, "results": data}
+
+    def get_paginated_response(self, data, **extra):
+        return Response(self.get_paginated_data(data, **extra))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last_position)
+        )
+
+    def encode_cursor(self, values):
+        # Full precision: DjangoJSONEncoder would drop microseconds and the
+        # cursor would then skip or repeat rows sharing a millisecond.
+        payload = json.dumps(
+            values,
+            default=lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v),
+        )
+        return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, encoded):
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            values = json.loads(urlsafe_b64decode(padded.encode()).decode())
+            fields = self.cursor_fields
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, position):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        clauses = []
+        for index, ordering in enumerate(self.ordering):
+            field = self._field_name(ordering)
+            lookup = "lt" if ordering.startswith("-") else "gt"
+            equal = {
+                self._field_name(f): position[i]
+                for i, f in enumerate(self.ordering[:index])
+            }
+            clauses.append(Q(**equal, **{f"{field}__{lookup}": position[index]}))
+        return reduce(or_, clauses)
+
+    @staticmethod
+    def _field_name(ordering):
+        return ordering.lstrip("-")
+
+    @staticmethod
+    def _value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+
+class BookCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 24
+
+
+class OrderCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 50
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 50
+
+
+class ModerationQueuePagination(KeysetPagination):
+    ordering = ("created_at", "id")
+    page_size = 50
+
+
+class BookSearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class BookBrowsePagination(PageNumberPagination):
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+
+from .models import Category
+
+
+class PermissionContext:
+    """
+    What the current user may see and moderate, loaded once per request.
+    Views ask this object instead of reaching for ``user.userprofile`` and
+    ``category.moderators`` themselves.
+    """
+
+    def __init__(self, user, is_admin=False, is_moderator=False, categories=()):
+        self.user = user
+        self.is_admin = is_admin
+        self.is_moderator = is_moderator
+        self.moderated_category_ids = frozenset(categories)
+
+    @property
+    def is_authenticated(self):
+        return self.user.is_authenticated
+
+    @property
+    def is_staff(self):
+        return self.is_admin or self.is_moderator
+
+    def can_moderate_category(self, category_id):
+        if self.is_admin:
+            return True
+        return self.is_moderator and category_id in self.moderated_category_ids
+
+    def book_visibility_q(self):
+        if not self.is_authenticated:
+            return Q(approved=True)
+        if self.is_admin:
+            return Q()
+
+        visible = Q(approved=True) | Q(user=self.user)
+        if self.is_moderator and self.moderated_category_ids:
+            visible |= Q(category_id__in=self.moderated_category_ids)
+        return visible
+
+    def visibility_key(self):
+        """Identifies what this user is allowed to see, for per-user ETags."""
+        if not self.is_authenticated:
+            return "anonymous"
+        categories = ",".join(map(str, sorted(self.moderated_category_ids)))
+        return f"{self.user.pk}:{self.is_admin:d}:{self.is_moderator:d}:{categories}"
+
+    def comment_visibility_q(self, book):
+        if not self.is_authenticated:
+            return Q(approved=True)
+        if self.can_moderate_category(book.category_id):
+            return Q()
+        return Q(approved=True) | Q(user=self.user)
+
+
+class PermissionCache:
+    """
+    Short-lived per-process cache of ``(is_admin, is_moderator, category ids)``
+    by user id, off unless ``PERMISSION_CACHE_TTL`` is set. Entries are dropped
+    on moderator or profile changes made in this process; other processes see
+    such changes once the TTL runs out.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, "PERMISSION_CACHE_TTL", 0)
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, user_id, value):
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            else:
+                for user_id in user_ids:
+                    self._entries.pop(user_id, None)
+
+
+permission_cache = PermissionCache()
+
+
+def load_permissions(user):
+    if not user.is_authenticated:
+        return PermissionContext(user)
+
+    cached = permission_cache.get(user.pk)
+    if cached is None:
+        try:
+            profile = user.userprofile
+            flags = (profile.is_admin, profile.is_moderator)
+        except ObjectDoesNotExist:
+            flags = (False, False)
+        categories = ()
+        if flags[1] and not flags[0]:
+            categories = frozenset(
+                Category.objects.filter(moderators=user).values_list("id", flat=True)
+            )
+        cached = (*flags, categories)
+        permission_cache.set(user.pk, cached)
+    return PermissionContext(user, *cached)
+
+
+def permissions_for(request):
+    """
+    The policy API used by views. ``PermissionContextMiddleware`` attaches a
+    lazy context to every request; it is evaluated on first use, after DRF
+    has authenticated the user.
+    """
+    context = getattr(request, "permissions", None)
+    if context is None:
+        context = load_permissions(request.user)
+        request.permissions = context
+    return context
@@ -0,0 +1,166 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailySalesRollup, OrderItem
+
+CENTS = Decimal("0.01")
+BUCKETS = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+GROUPS = ("none", "status", "category")
+REPORT_FIELDS = {
+    "none": ["period", "orders", "items", "revenue"],
+    "status": ["period", "status", "orders", "items", "revenue"],
+    "category": ["period", "category", "category_name", "orders", "items", "revenue"],
+}
+
+
+def _new_delta():
+    return [0, 0, Decimal("0")]
+
+
+def _add_order(deltas, day, status, lines, sign):
+    """Adds one order, given as ``[(category_id, quantity, total), ...]``."""
+    total = deltas[(day, status, None, True)]
+    total[0] += sign
+    categories = defaultdict(_new_delta)
+    for category_id, quantity, price in lines:
+        for row in (total, categories[category_id]):
+            row[1] += sign * quantity
+            row[2] += sign * Decimal(price)
+    for category_id, (_, quantity, price) in categories.items():
+        row = deltas[(day, status, category_id, False)]
+        row[0] += sign
+        row[1] += quantity
+        row[2] += price
+
+
+def _apply(deltas):
+    for (day, status, category_id, all_categories), delta in deltas.items():
+        orders, items, revenue = delta
+        if not (orders or items or revenue):
+            continue
+        key = {
+            "day": day,
+            "status": status,
+            "category_id": category_id,
+            "all_categories": all_categories,
+        }
+        updated = DailySalesRollup.objects.filter(**key).update(
+            orders=F("orders") + orders,
+            items=F("items") + items,
+            revenue=F("revenue") + revenue,
+        )
+        if not updated:
+            DailySalesRollup.objects.create(
+                **key, orders=orders, items=items, revenue=revenue
+            )
+
+
+def _lines(items):
+    return [(item.book.category_id, item.quantity, item.total_price) for item in items]
+
+
+def record_new_orders(built):
+    """Adds freshly saved ``[(order, items), ...]`` to the rollup."""
+    deltas = defaultdict(_new_delta)
+    for order, items in built:
+        day = timezone.localdate(order.created_at)
+        _add_order(deltas, day, order.status, _lines(items), 1)
+    _apply(deltas)
+
+
+def record_status_change(order, items, old_status, new_status):
+    """Moves an order's totals from ``old_status`` to ``new_status``."""
+    if old_status == new_status:
+        return
+    deltas = defaultdict(_new_delta)
+    day = timezone.localdate(order.created_at)
+    lines = _lines(items)
+    _add_order(deltas, day, old_status, lines, -1)
+    _add_order(deltas, day, new_status, lines, 1)
+    _apply(deltas)
+
+
+def rebuild_sales_rollup(batch_size=2000):
+    """Recomputes the whole rollup from OrderItem with two GROUP BY queries."""
+    items = OrderItem.objects.values(
+        day=TruncDate("order__created_at"), order_status=F("order__status")
+    ).order_by()
+    totals = items.annotate(
+        order_count=Count("order", distinct=True),
+        quantity=Sum("quantity"),
+        total=Sum("total_price"),
+    )
+    per_category = (
+        items.values("day", "order_status", category_key=F("book__category_id"))
+        .annotate(
+            order_count=Count("order", distinct=True),
+            quantity=Sum("quantity"),
+            total=Sum("total_price"),
+        )
+        .order_by()
+    )
+
+    rows = [
+        DailySalesRollup(
+            day=row["day"],
+            status=row["order_status"],
+            category_id=row.get("category_key"),
+            all_categories="category_key" not in row,
+            orders=row["order_count"],
+            items=row["quantity"],
+            revenue=row["total"],
+        )
+        for queryset in (totals, per_category)
+        for row in queryset
+    ]
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        DailySalesRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def sales_report(date_from, date_to, bucket="day", group="none", statuses=None):
+    """
+    Aggregates the rollup into ``bucket`` periods between two dates
+    (inclusive) and yields one dict with the REPORT_FIELDS keys per row.
+    """
+    rows = DailySalesRollup.objects.filter(
+        all_categories=group != "category", day__range=(date_from, date_to)
+    )
+    if statuses:
+        rows = rows.filter(status__in=statuses)
+
+    dimensions = {
+        "none": {},
+        "status": {"group_status": F("status")},
+        "category": {
+            "group_category": F("category_id"),
+            "category_name": F("category__name"),
+        },
+    }[group]
+    rows = (
+        rows.annotate(period=BUCKETS[bucket]("day"))
+        .values("period", **dimensions)
+        .annotate(
+            order_count=Sum("orders"),
+            item_count=Sum("items"),
+            revenue_total=Sum("revenue"),
+        )
+        .order_by("period", *dimensions)
+    )
+    for row in rows:
+        report = {"period": row["period"]}
+        if group == "status":
+            report["status"] = row["group_status"]
+        elif group == "category":
+            report["category"] = row["group_category"]
+            report["category_name"] = row["category_name"]
+        report["orders"] = row["order_count"]
+        report["items"] = row["item_count"]
+        report["revenue"] = Decimal(row["revenue_total"]).quantize(CENTS)
+        yield report
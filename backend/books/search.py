@@ -0,0 +1,240 @@
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Book
+
+FTS_TABLE = "books_book_fts"
+
+# BM25 column weights: a hit in the title outranks one in the description.
+FIELD_WEIGHTS = {"title": 10.0, "author": 5.0, "description": 1.0}
+
+# Letters that NFKD does not decompose into a base letter plus a diacritic.
+_EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "ß": "ss"})
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def fold(text):
+    text = (text or "").translate(_EXTRA_FOLDS)
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def book_document(book):
+    """Accepts a Book or a ``values()`` dict and returns its folded fields."""
+    get = book.get if isinstance(book, dict) else lambda f: getattr(book, f)
+    return {field: fold(get(field)) for field in FIELD_WEIGHTS}
+
+
+class SQLiteFTSBackend:
+    name = "fts5"
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, book):
+        doc = book_document(book)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, description) "
+                "VALUES (%s, %s, %s, %s)",
+                [book.pk, doc["title"], doc["author"], doc["description"]],
+            )
+
+    def remove(self, book_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+
+    def rebuild(self, chunk_size=2000):
+        rows = Book.objects.values("id", *FIELD_WEIGHTS).iterator(chunk_size=chunk_size)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            batch = []
+            for row in rows:
+                doc = book_document(row)
+                batch.append(
+                    (row["id"], doc["title"], doc["author"], doc["description"])
+                )
+                if len(batch) >= chunk_size:
+                    total += self._insert(cursor, batch)
+                    batch = []
+            total += self._insert(cursor, batch)
+        return total
+
+    @staticmethod
+    def _insert(cursor, batch):
+        if batch:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, description) "
+                "VALUES (%s, %s, %s, %s)",
+                batch,
+            )
+        return len(batch)
+
+
+class InvertedIndexBackend:
+    """
+    In-process inverted index used when FTS5 is not available. The index is
+    loaded from the database on first use and then kept current by the Book
+    signals, so every worker process holds its own copy.
+    """
+
+    name = "python"
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._postings = defaultdict(dict)  # term -> {book_id: weighted tf}
+        self._doc_terms = {}  # book_id -> set of terms
+        self._doc_lengths = {}
+        self._total_length = 0.0
+        self._vocabulary = None
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for expanded in self._expand(term):
+                    self._score_term(expanded, term_scores)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        doc: score + term_scores[doc]
+                        for doc, score in scores.items()
+                        if doc in term_scores
+                    }
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [doc for doc, _ in ranked[:limit]]
+
+    def index(self, book):
+        with self._lock:
+            if self._loaded:
+                self._add(book.pk, book_document(book))
+
+    def remove(self, book_id):
+        with self._lock:
+            if self._loaded:
+                self._discard(book_id)
+
+    def rebuild(self, chunk_size=2000):
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._total_length = 0.0
+            self._vocabulary = None
+            rows = Book.objects.values("id", *FIELD_WEIGHTS).iterator(
+                chunk_size=chunk_size
+            )
+            for row in rows:
+                self._add(row["id"], book_document(row))
+            self._loaded = True
+            return len(self._doc_lengths)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def _add(self, book_id, doc):
+        self._discard(book_id)
+        frequencies = defaultdict(float)
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in _TOKEN_RE.findall(doc[field]):
+                frequencies[token] += weight
+                length += weight
+        for token, tf in frequencies.items():
+            if token not in self._postings:
+                self._vocabulary = None
+            self._postings[token][book_id] = tf
+        self._doc_terms[book_id] = set(frequencies)
+        self._doc_lengths[book_id] = length
+        self._total_length += length
+
+    def _discard(self, book_id):
+        for token in self._doc_terms.pop(book_id, ()):
+            postings = self._postings[token]
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary = None
+        self._total_length -= self._doc_lengths.pop(book_id, 0.0)
+
+    def _expand(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        vocabulary = self._vocabulary
+        for i in range(bisect_left(vocabulary, prefix), len(vocabulary)):
+            if not vocabulary[i].startswith(prefix):
+                break
+            yield vocabulary[i]
+
+    def _score_term(self, term, scores):
+        postings = self._postings.get(term)
+        if not postings:
+            return
+        n = len(self._doc_lengths)
+        avg_length = self._total_length / n
+        idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+        for doc, tf in postings.items():
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc] / avg_length)
+            scores[doc] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+
+_backends = {}
+_fts_tables = {}
+
+
+def _fts_available():
+    if connection.vendor != "sqlite":
+        return False
+    name = str(connection.settings_dict["NAME"])
+    if name not in _fts_tables:
+        _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[name]
+
+
+def get_search_backend():
+    choice = getattr(settings, "BOOK_SEARCH_BACKEND", "auto")
+    if choice == "auto":
+        choice = "fts5" if _fts_available() else "python"
+    if choice not in _backends:
+        backend_class = {
+            "fts5": SQLiteFTSBackend,
+            "python": InvertedIndexBackend,
+        }[choice]
+        _backends[choice] = backend_class()
+    return _backends[choice]
@@ -0,0 +1,217 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import DurationField, ExpressionWrapper, F, Max, Value
+
+from .cache import view_cache
+from .comments import refresh_comment_counts
+from .models import (
+    Book,
+    Category,
+    Comment,
+    GalleryImage,
+    Order,
+    OrderItem,
+    Slider,
+    SliderImage,
+    Theme,
+    UserProfile,
+)
+from .orders import build_order
+from .reports import rebuild_sales_rollup
+from .search import get_search_backend
+from .stats import rebuild_book_stats
+
+USERNAME_PREFIX = "perf"
+WORDS = (
+    "księga wiedźmin zamek smok król miasto morze las noc dzień wojna pokój "
+    "miłość śmierć źródło łódź żółw gęś ćma historia podróż tajemnica ogień "
+    "woda kamień cień światło słońce księżyc gwiazda droga dom ogród szkoła "
+    "dragon castle river winter summer shadow empire garden secret journey"
+).split()
+AUTHORS = (
+    "Sienkiewicz",
+    "Prus",
+    "Mickiewicz",
+    "Orzeszkowa",
+    "Lem",
+    "Sapkowski",
+    "Szymborska",
+    "Miłosz",
+    "Tokarczuk",
+    "Żeromski",
+)
+CITIES = ("Warszawa", "Kraków", "Gdańsk", "Wrocław", "Poznań", "Łódź")
+ORDER_STATUSES = (
+    ("delivered", 60),
+    ("shipped", 15),
+    ("pending", 15),
+    ("cancelled", 10),
+)
+COMMENT_STATES = ((True, 80), (None, 12), (False, 8))
+
+
+def _choices(rng, weighted, k):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights, k=k)
+
+
+def _text(rng, words):
+    return " ".join(rng.choices(WORDS, k=words)).capitalize()
+
+
+def _spread_created_at(model, days):
+    """
+    Moves ``created_at`` back so rows span the last ``days`` days in id order,
+    with one UPDATE (bulk_create always stamps the current time).
+    """
+    top = model.objects.aggregate(top=Max("id"))["top"]
+    if top is None:
+        return
+    step = timedelta(seconds=days * 86400 / model.objects.count())
+    model.objects.update(
+        created_at=F("created_at")
+        - ExpressionWrapper((top - F("id")) * Value(step), output_field=DurationField())
+    )
+
+
+def seed_perf_data(
+    books,
+    orders,
+    comments,
+    users=100,
+    categories=20,
+    days=365,
+    seed=0,
+    batch_size=5000,
+):
+    """
+    Fills an empty database with a reproducible synthetic shop: users with
+    profiles, an admin, one moderator per category, ``books`` books,
+    ``orders`` orders of 1-4 items and ``comments`` comments, spread over the
+    last ``days`` days. Rows go in with ``bulk_create``, so the derived
+    tables (stats, sales rollup, comment counts, search index) are rebuilt
+    at the end. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+
+    customers = User.objects.bulk_create(
+        User(
+            username=f"{USERNAME_PREFIX}{i}", email=f"{USERNAME_PREFIX}{i}@example.com"
+        )
+        for i in range(users)
+    )
+    admin = User.objects.create_user(f"{USERNAME_PREFIX}-admin", password="perf")
+    moderators = User.objects.bulk_create(
+        User(username=f"{USERNAME_PREFIX}-mod{i}") for i in range(categories)
+    )
+    UserProfile.objects.bulk_create(
+        [UserProfile(user=user, city=rng.choice(CITIES)) for user in customers]
+        + [UserProfile(user=admin, is_admin=True)]
+        + [UserProfile(user=user, is_moderator=True) for user in moderators]
+    )
+
+    category_rows = Category.objects.bulk_create(
+        Category(name=f"{_text(rng, 2)} {i}") for i in range(categories)
+    )
+    Category.moderators.through.objects.bulk_create(
+        Category.moderators.through(category=category, user=user)
+        for category, user in zip(category_rows, moderators)
+    )
+
+    approved = _choices(rng, ((True, 85), (None, 10), (False, 5)), books)
+    Book.objects.bulk_create(
+        (
+            Book(
+                user=rng.choice(customers),
+                title=_text(rng, rng.randint(2, 5)),
+                author=rng.choice(AUTHORS),
+                description=_text(rng, rng.randint(20, 60)),
+                price=rng.randint(500, 15000) / 100,
+                category=rng.choice(category_rows),
+                approved=approved[i],
+            )
+            for i in range(books)
+        ),
+        batch_size=batch_size,
+    )
+    _spread_created_at(Book, days)
+    catalog = Book.objects.in_bulk(
+        Book.objects.filter(approved=True).values_list("id", flat=True)
+    )
+    book_ids = list(catalog)
+
+    for start in range(0, orders, batch_size):
+        count = min(batch_size, orders - start)
+        built = []
+        for status in _choices(rng, ORDER_STATUSES, count):
+            lines = [
+                (book_id, rng.randint(1, 3))
+                for book_id in rng.sample(
+                    book_ids, min(rng.randint(1, 4), len(book_ids))
+                )
+            ]
+            fields = {
+                "shipping_address": f"ul. {_text(rng, 1)} {rng.randint(1, 200)}",
+                "city": rng.choice(CITIES),
+                "postal_code": f"{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}",
+                "phone_number": f"{rng.randint(500000000, 899999999)}",
+            }
+            order, items = build_order(rng.choice(customers), fields, lines, catalog)
+            order.status = status
+            built.append((order, items))
+        created = Order.objects.bulk_create([order for order, _ in built])
+        for order, (_, items) in zip(created, built):
+            for item in items:
+                item.order = order
+        OrderItem.objects.bulk_create(
+            [item for _, items in built for item in items], batch_size=batch_size
+        )
+    _spread_created_at(Order, days)
+
+    for start in range(0, comments, batch_size):
+        count = min(batch_size, comments - start)
+        Comment.objects.bulk_create(
+            Comment(
+                book_id=rng.choice(book_ids),
+                user=rng.choice(customers),
+                content=_text(rng, rng.randint(5, 30)),
+                approved=state,
+            )
+            for state in _choices(rng, COMMENT_STATES, count)
+        )
+    _spread_created_at(Comment, days)
+
+    Theme.objects.create(
+        name="Domyślny",
+        primary_color="#3498db",
+        secondary_color="#2ecc71",
+        accent_color="#e74c3c",
+    )
+    images = GalleryImage.objects.bulk_create(
+        GalleryImage(title=_text(rng, 2), description="", image=f"gallery/perf{i}.jpg")
+        for i in range(5)
+    )
+    slider = Slider.objects.create(title="Start", is_default=True)
+    SliderImage.objects.bulk_create(
+        SliderImage(slider=slider, image=image, position=position)
+        for position, image in enumerate(images)
+    )
+
+    all_ids = list(Book.objects.values_list("id", flat=True))
+    for start in range(0, len(all_ids), batch_size):
+        refresh_comment_counts(all_ids[start : start + batch_size])
+    rebuild_book_stats(batch_size=batch_size)
+    rebuild_sales_rollup(batch_size=batch_size)
+    get_search_backend().rebuild(chunk_size=batch_size)
+    view_cache.clear()
+
+    return {
+        "users": len(customers) + len(moderators) + 1,
+        "categories": len(category_rows),
+        "books": books,
+        "orders": orders,
+        "order_items": OrderItem.objects.count(),
+        "comments": comments,
+    }
@@ -1,6 +1,10 @@
 from rest_framework import serializers
+from .fieldsets import SparseFieldsMixin
+from .images import derivative_urls
+from .metrics import SerializerTimingMixin
 from .models import (
     Book,
+    BookStats,
     GalleryImage,
     Slider,
     Category,
@@ -12,7 +16,13 @@ from .models import (
 )
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class TimedModelSerializer(
+    SparseFieldsMixin, SerializerTimingMixin, serializers.ModelSerializer
+):
+    pass
+
+
+class CategorySerializer(TimedModelSerializer):
     moderators = serializers.PrimaryKeyRelatedField(
         queryset=UserProfile.objects.filter(is_moderator=True), many=True
     )
@@ -22,9 +32,30 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "moderators"]
 
 
-class BookSerializer(serializers.ModelSerializer):
+class DerivativesMixin:
+    def _derivative_urls(self, obj):
+        # derivatives and srcset are read one after the other for each row.
+        cached = getattr(self, "_derivatives_of", None)
+        if cached is None or cached[0] is not obj:
+            urls = derivative_urls(obj.image_derivatives, self.context.get("request"))
+            cached = self._derivatives_of = (obj, urls)
+        return cached[1]
+
+    def get_derivatives(self, obj):
+        return self._derivative_urls(obj)[0]
+
+    def get_srcset(self, obj):
+        return self._derivative_urls(obj)[1]
+
+
+class BookSerializer(DerivativesMixin, TimedModelSerializer):
     image = serializers.ImageField(required=False)
     category = CategorySerializer()
+    derivatives = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    comment_count = serializers.IntegerField(
+        source="approved_comment_count", read_only=True
+    )
 
     class Meta:
         model = Book
@@ -36,10 +67,17 @@ class BookSerializer(serializers.ModelSerializer):
             "description",
             "price",
             "image",
+            "derivatives",
+            "srcset",
             "category",
             "created_at",
             "approved",
+            "comment_count",
         ]
+        method_sources = {
+            "derivatives": ["image_derivatives"],
+            "srcset": ["image_derivatives"],
+        }
 
     def get_image(self, obj):
         request = self.context.get("request")
@@ -48,7 +86,15 @@ class BookSerializer(serializers.ModelSerializer):
         return None
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class BookStatsSerializer(TimedModelSerializer):
+    book = BookSerializer()
+
+    class Meta:
+        model = BookStats
+        fields = ["book", "sales_count", "revenue", "comment_count"]
+
+
+class CommentSerializer(TimedModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
 
     class Meta:
@@ -57,18 +103,33 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user", "approved", "created_at"]
 
 
-class EventSerializer(serializers.ModelSerializer):
+class ModerationCommentSerializer(CommentSerializer):
+    book_title = serializers.CharField(source="book.title", read_only=True)
+    category = serializers.IntegerField(source="book.category_id", read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ["book", "book_title", "category"]
+
+
+class EventSerializer(TimedModelSerializer):
     class Meta:
         model = Event
         fields = ["action", "description", "created_at"]
 
 
-class GalleryImageSerializer(serializers.ModelSerializer):
+class GalleryImageSerializer(DerivativesMixin, TimedModelSerializer):
     image = serializers.SerializerMethodField()
+    derivatives = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = GalleryImage
-        fields = ["id", "title", "description", "image"]
+        fields = ["id", "title", "description", "image", "derivatives", "srcset"]
+        method_sources = {
+            "image": ["image"],
+            "derivatives": ["image_derivatives"],
+            "srcset": ["image_derivatives"],
+        }
 
     def get_image(self, obj):
         request = self.context.get("request")
@@ -77,15 +138,17 @@ class GalleryImageSerializer(serializers.ModelSerializer):
         return request.build_absolute_uri(obj.image.url)
 
 
-class SliderSerializer(serializers.ModelSerializer):
+class SliderSerializer(TimedModelSerializer):
     images = GalleryImageSerializer(many=True, read_only=True)
 
     class Meta:
         model = Slider
         fields = ["id", "title", "images", "is_default"]
+        # Changed through set_default only, which keeps a single default.
+        read_only_fields = ["is_default"]
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(TimedModelSerializer):
     book_title = serializers.CharField(source="book.title")
 
     class Meta:
@@ -93,7 +156,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ["book_title", "quantity", "total_price"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedModelSerializer):
     items = OrderItemSerializer(many=True)
     total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
     shipping_address = serializers.CharField()
@@ -111,3 +174,19 @@ class OrderSerializer(serializers.ModelSerializer):
             "total_price",
             "items",
         ]
+
+
+class OrderSummarySerializer(TimedModelSerializer):
+    username = serializers.CharField(source="user.username", read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "username",
+            "shipping_address",
+            "status",
+            "created_at",
+            "updated_at",
+            "total_price",
+        ]
@@ -0,0 +1,158 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import view_cache
+from .comments import refresh_comment_counts
+from .database import apply_sqlite_pragmas
+from .images import schedule_derivatives
+from .metrics import install_query_recorder
+from .models import (
+    Book,
+    BookStats,
+    Category,
+    Comment,
+    GalleryImage,
+    Order,
+    OrderItem,
+    Slider,
+    Theme,
+    UserProfile,
+)
+from .permissions import permission_cache
+from .search import get_search_backend
+from .sliders import default_slider_snapshot
+from .uploads import store_image_upload
+
+# Cache namespaces invalidated by a change to each model.
+CACHE_NAMESPACES = {
+    Book: ("books",),
+    Order: ("orders",),
+    OrderItem: ("orders",),
+    Category: ("categories",),
+    Theme: ("themes",),
+    Slider: ("sliders",),
+    GalleryImage: ("images", "sliders"),
+}
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_search_backend().index(instance)
+
+
+@receiver(post_save, sender=Book)
+def sync_stats_category(sender, instance, created=False, raw=False, **kwargs):
+    if not (raw or created):
+        BookStats.objects.filter(book_id=instance.pk).exclude(
+            category_id=instance.category_id
+        ).update(category_id=instance.category_id)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def count_comments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_comment_counts([instance.book_id])
+
+
+def bump_cache_namespaces(sender, **kwargs):
+    view_cache.bump(*CACHE_NAMESPACES[sender])
+
+
+def bump_m2m_cache_namespaces(sender, action, **kwargs):
+    if action.startswith("post_"):
+        view_cache.bump(*CACHE_M2M_NAMESPACES[sender])
+
+
+CACHE_M2M_NAMESPACES = {
+    Category.moderators.through: ("categories",),
+    Slider.images.through: ("sliders",),
+}
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(bump_cache_namespaces, sender=model)
+    post_delete.connect(bump_cache_namespaces, sender=model)
+
+for through in CACHE_M2M_NAMESPACES:
+    m2m_changed.connect(bump_m2m_cache_namespaces, sender=through)
+
+
+def reset_image_derivatives(sender, instance, raw=False, **kwargs):
+    # A freshly assigned upload is not committed to storage until the field's
+    # pre_save runs, which happens after this signal.
+    if not raw and instance.image and not instance.image._committed:
+        instance.image_derivatives = {}
+        instance._image_uploaded = True
+
+
+def render_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, "_image_uploaded", False):
+        instance._image_uploaded = False
+        schedule_derivatives(instance)
+
+
+def invalidate_moderator_permissions(
+    sender, action, instance, reverse, pk_set, **kwargs
+):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        permission_cache.invalidate([instance.pk])
+    elif pk_set:
+        permission_cache.invalidate(pk_set)
+    else:
+        # post_clear does not say which moderators were removed.
+        permission_cache.invalidate()
+
+
+def invalidate_profile_permissions(sender, instance, **kwargs):
+    permission_cache.invalidate([instance.user_id])
+
+
+def invalidate_category_permissions(sender, **kwargs):
+    permission_cache.invalidate()
+
+
+m2m_changed.connect(
+    invalidate_moderator_permissions, sender=Category.moderators.through
+)
+post_save.connect(invalidate_profile_permissions, sender=UserProfile)
+post_delete.connect(invalidate_profile_permissions, sender=UserProfile)
+post_delete.connect(invalidate_category_permissions, sender=Category)
+
+
+def deduplicate_image_upload(sender, instance, raw=False, **kwargs):
+    # Stores the upload as a shared blob; the field's pre_save then finds
+    # it committed and writes nothing.
+    if not raw and instance.image and not instance.image._committed:
+        instance.image = store_image_upload(instance.image)
+
+
+for model in (Book, GalleryImage):
+    pre_save.connect(reset_image_derivatives, sender=model)
+    # After reset_image_derivatives, which looks for uncommitted uploads.
+    pre_save.connect(deduplicate_image_upload, sender=model)
+    post_save.connect(render_image_derivatives, sender=model)
+
+
+def rebuild_slider_snapshot(sender, raw=False, action="post_", **kwargs):
+    if not raw and action.startswith("post_"):
+        default_slider_snapshot.schedule_rebuild()
+
+
+# Connected after the cache bumps, so the rebuild sees the new version.
+for model in (Slider, GalleryImage):
+    post_save.connect(rebuild_slider_snapshot, sender=model)
+    post_delete.connect(rebuild_slider_snapshot, sender=model)
+m2m_changed.connect(rebuild_slider_snapshot, sender=Slider.images.through)
+
+
+connection_created.connect(apply_sqlite_pragmas)
+connection_created.connect(install_query_recorder)
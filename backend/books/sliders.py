@@ -0,0 +1,300 @@
+"""
+The default slider, served on every homepage visit, as a prebuilt JSON
+document. The document is rendered once per origin (image URLs are
+absolute), kept in memory and, with ``SLIDER_SNAPSHOT["DIRECTORY"]`` set,
+on disk so other workers and restarts pick it up without querying.
+
+Documents are stamped with the view cache's "sliders" version, which every
+change to a slider, its images or the default flag bumps. The version is a
+database row, so a document rendered by one worker is valid in all of them
+and survives restarts. Known origins are re-rendered as soon as such a
+change commits; a stale document is never served because its stamp no
+longer matches.
+
+Slider membership is stored in ``SliderImage`` rows with a position;
+``set_slider_images`` applies a whole new image list in a fixed number of
+queries.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Prefetch, Q
+from django.http import HttpRequest, HttpResponse
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from .cache import last_modified, not_modified, set_validators, view_cache
+from .models import GalleryImage, Slider, SliderImage
+from .serializers import SliderSerializer
+
+DEFAULTS = {"DIRECTORY": None}
+NAMESPACE = "sliders"
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "SLIDER_SNAPSHOT", {})}
+
+
+class OriginRequest(HttpRequest):
+    """Enough of a request for serializers to build absolute URLs."""
+
+    def __init__(self, origin):
+        super().__init__()
+        self.method = "GET"
+        self._scheme, self.META["HTTP_HOST"] = origin.split("://", 1)
+
+    def _get_scheme(self):
+        return self._scheme
+
+
+def set_default(slider):
+    """Makes ``slider`` the only default slider."""
+    with transaction.atomic():
+        # Locks the current default too, so concurrent calls queue up.
+        list(
+            Slider.objects.select_for_update().filter(
+                Q(pk=slider.pk) | Q(is_default=True)
+            )
+        )
+        Slider.objects.filter(is_default=True).exclude(pk=slider.pk).update(
+            is_default=False
+        )
+        if not slider.is_default:
+            slider.is_default = True
+            slider.save(update_fields=["is_default"])
+        # update() sends no signals.
+        sliders_changed()
+
+
+def sliders_changed():
+    """Invalidates cached sliders after writes that send no signals."""
+    view_cache.bump(NAMESPACE)
+    default_slider_snapshot.schedule_rebuild()
+
+
+def ordered_images():
+    """Prefetches the images of sliders in their slider order."""
+    return Prefetch(
+        "images",
+        queryset=GalleryImage.objects.order_by(
+            "sliderimage__position", "sliderimage__id"
+        ),
+    )
+
+
+def parse_image_ids(value):
+    if not isinstance(value, list) or not all(
+        isinstance(pk, int) and not isinstance(pk, bool) for pk in value
+    ):
+        raise ValidationError({"images": "A list of image IDs is required."})
+    if len(set(value)) != len(value):
+        raise ValidationError({"images": "Image IDs must not repeat."})
+    return value
+
+
+def set_slider_images(slider, image_ids):
+    """
+    Makes ``image_ids`` the images of ``slider``, in that order. Removed,
+    moved and added images cost one DELETE, UPDATE and INSERT respectively
+    (bulk statements are split only past the database's parameter limit,
+    a few hundred rows on SQLite), however many images change.
+    """
+    image_ids = parse_image_ids(image_ids)
+    with transaction.atomic():
+        known = set(
+            GalleryImage.objects.filter(pk__in=image_ids).values_list("pk", flat=True)
+        )
+        missing = [str(pk) for pk in image_ids if pk not in known]
+        if missing:
+            raise ValidationError({"images": f"Unknown images: {', '.join(missing)}."})
+
+        current = {
+            row.image_id: row
+            for row in SliderImage.objects.select_for_update().filter(slider=slider)
+        }
+        removed = [row.pk for pk, row in current.items() if pk not in known]
+        moved, added = [], []
+        for position, pk in enumerate(image_ids):
+            row = current.get(pk)
+            if row is None:
+                added.append(SliderImage(slider=slider, image_id=pk, position=position))
+            elif row.position != position:
+                row.position = position
+                moved.append(row)
+
+        if removed:
+            SliderImage.objects.filter(pk__in=removed).delete()
+        if moved:
+            SliderImage.objects.bulk_update(moved, ["position"])
+        if added:
+            SliderImage.objects.bulk_create(added)
+        if removed or moved or added:
+            sliders_changed()
+
+
+def append_image(slider, image):
+    """Adds ``image`` after the last image of ``slider``."""
+    with transaction.atomic():
+        last = SliderImage.objects.filter(slider=slider).aggregate(Max("position"))
+        position = 0 if last["position__max"] is None else last["position__max"] + 1
+        slider.images.add(image, through_defaults={"position": position})
+
+
+def move_image(slider, image_id, position):
+    """Moves an image of ``slider`` to ``position``, shifting the others."""
+    with transaction.atomic():
+        image_ids = list(
+            SliderImage.objects.select_for_update()
+            .filter(slider=slider)
+            .values_list("image_id", flat=True)
+        )
+        if image_id not in image_ids:
+            return False
+        image_ids.remove(image_id)
+        image_ids.insert(max(position, 0), image_id)
+        set_slider_images(slider, image_ids)
+    return True
+
+
+def render_default_slider(origin):
+    """``(status, content)`` of the default slider as seen from ``origin``."""
+    slider = (
+        Slider.objects.filter(is_default=True)
+        .prefetch_related(ordered_images())
+        .first()
+    )
+    if slider is None:
+        data = {"error": "No default slider."}
+        code = status.HTTP_404_NOT_FOUND
+    else:
+        data = SliderSerializer(slider, context={"request": OriginRequest(origin)}).data
+        code = status.HTTP_200_OK
+    content = json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+    return code, content
+
+
+class Document:
+    def __init__(self, version, code, content):
+        self.version = version
+        self.status = code
+        self.content = content
+        self.etag = quote_etag(hashlib.md5(content).hexdigest())
+        self.last_modified = last_modified(version)
+
+    def serialize(self):
+        return f"{self.version} {self.status}\n".encode() + self.content
+
+    @classmethod
+    def parse(cls, raw):
+        header, content = raw.split(b"\n", 1)
+        version, code = header.split()
+        return cls(int(version), int(code), content)
+
+
+class SliderSnapshot:
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def _path(self, origin):
+        directory = config()["DIRECTORY"]
+        if directory is None:
+            return None
+        digest = hashlib.md5(origin.encode()).hexdigest()[:16]
+        return Path(directory) / f"default-slider-{digest}.json"
+
+    def _load(self, origin, version):
+        path = self._path(origin)
+        if path is None:
+            return None
+        try:
+            document = Document.parse(path.read_bytes())
+        except (OSError, ValueError):
+            return None
+        return document if document.version == version else None
+
+    def _write(self, origin, document):
+        path = self._path(origin)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written next to the target and renamed over it, so readers see
+        # either the old or the new document, never a partial one.
+        fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(document.serialize())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def build(self, origin):
+        version = view_cache.version(NAMESPACE)
+        document = Document(version, *render_default_slider(origin))
+        self._write(origin, document)
+        with self._lock:
+            self._documents[origin] = document
+        return document
+
+    def get(self, origin):
+        version = view_cache.version(NAMESPACE)
+        document = self._documents.get(origin)
+        if document is not None and document.version == version:
+            return document
+        document = self._load(origin, version)
+        if document is None:
+            return self.build(origin)
+        with self._lock:
+            self._documents[origin] = document
+        return document
+
+    def rebuild(self):
+        """Re-renders the outdated documents of the origins served so far."""
+        version = view_cache.version(NAMESPACE)
+        with self._lock:
+            origins = [
+                origin
+                for origin, document in self._documents.items()
+                if document.version != version
+            ]
+        for origin in origins:
+            self.build(origin)
+
+    def schedule_rebuild(self):
+        # Several changes in one transaction schedule several rebuilds; all
+        # but the first find the documents up to date.
+        transaction.on_commit(self.rebuild, robust=True)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def respond(self, request):
+        document = self.get(f"{request.scheme}://{request.get_host()}")
+        entry = {"etag": document.etag, "last_modified": document.last_modified}
+        if document.status == status.HTTP_200_OK and not_modified(request, entry):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(
+                document.content,
+                status=document.status,
+                content_type="application/json",
+            )
+        if document.status == status.HTTP_200_OK:
+            set_validators(response, entry)
+        return response
+
+
+default_slider_snapshot = SliderSnapshot()
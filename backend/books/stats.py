@@ -0,0 +1,115 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .cache import view_cache
+from .models import Book, BookStats, Comment, OrderItem
+
+TOP_ORDERINGS = {
+    "sales": "-sales_count",
+    "revenue": "-revenue",
+    "comments": "-comment_count",
+}
+
+
+def ensure_stats(book_ids):
+    """Creates missing BookStats rows with one INSERT ... ON CONFLICT IGNORE."""
+    categories = Book.objects.filter(id__in=book_ids).values_list("id", "category_id")
+    BookStats.objects.bulk_create(
+        [BookStats(book_id=book_id, category_id=cat) for book_id, cat in categories],
+        ignore_conflicts=True,
+    )
+
+
+def _delta(column, deltas, output_field):
+    return F(column) + Case(
+        *[When(book_id=book_id, then=Value(delta)) for book_id, delta in deltas],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def record_sales(items, sign=1):
+    """
+    Adds (or with ``sign=-1`` subtracts) the quantities and totals of
+    ``items`` to the affected books in a single UPDATE of F() expressions.
+    """
+    quantities = defaultdict(int)
+    revenue = defaultdict(Decimal)
+    for item in items:
+        quantities[item.book_id] += sign * item.quantity
+        revenue[item.book_id] += sign * Decimal(item.total_price)
+    if not quantities:
+        return
+
+    ensure_stats(quantities)
+    BookStats.objects.filter(book_id__in=quantities).update(
+        sales_count=_delta(
+            "sales_count",
+            quantities.items(),
+            BookStats._meta.get_field("sales_count"),
+        ),
+        revenue=_delta(
+            "revenue", revenue.items(), BookStats._meta.get_field("revenue")
+        ),
+    )
+
+
+def sync_comment_counts(book_ids):
+    """Copies the recounted ``Book.approved_comment_count`` into BookStats."""
+    ensure_stats(book_ids)
+    count = Book.objects.filter(pk=OuterRef("book_id")).values("approved_comment_count")
+    BookStats.objects.filter(book_id__in=book_ids).update(comment_count=Subquery(count))
+
+
+def rebuild_book_stats(batch_size=2000):
+    """
+    Recomputes every BookStats row from orders and comments: one aggregate
+    query per source, then upserts in batches. Returns the number of rows.
+    """
+    sales = (
+        OrderItem.objects.exclude(order__status="cancelled")
+        .values("book_id")
+        .annotate(quantity=Sum("quantity"), revenue=Sum("total_price"))
+        .order_by()
+    )
+    totals = {row["book_id"]: (row["quantity"], row["revenue"]) for row in sales}
+    comments = dict(
+        Comment.objects.filter(approved=True)
+        .values("book_id")
+        .annotate(count=Count("id"))
+        .order_by()
+        .values_list("book_id", "count")
+    )
+
+    rows = []
+    for book_id, category_id in Book.objects.values_list("id", "category_id"):
+        quantity, revenue = totals.get(book_id, (0, Decimal("0")))
+        rows.append(
+            BookStats(
+                book_id=book_id,
+                category_id=category_id,
+                sales_count=quantity,
+                revenue=revenue,
+                comment_count=comments.get(book_id, 0),
+            )
+        )
+    BookStats.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["book"],
+        update_fields=["category", "sales_count", "revenue", "comment_count"],
+    )
+    Book.objects.update(
+        approved_comment_count=Coalesce(
+            Subquery(
+                BookStats.objects.filter(book_id=OuterRef("pk")).values("comment_count")
+            ),
+            0,
+        )
+    )
+    view_cache.bump("books")
+    return len(rows)
@@ -1,3 +1,2060 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import async_views, metrics
+from .cache import view_cache
+from .events import EventBus
+from .fieldsets import dump
+from .images import store_manifest
+from .permissions import permission_cache
+from .models import (
+    Book,
+    BookStats,
+    CacheVersion,
+    Category,
+    ChunkedUpload,
+    Comment,
+    DailySalesRollup,
+    Event,
+    GalleryImage,
+    Order,
+    OrderItem,
+    Slider,
+    SliderImage,
+    Theme,
+    UserProfile,
+)
+from . import uploads
+from .search import InvertedIndexBackend
+from .sliders import SliderSnapshot, default_slider_snapshot
+from .serializers import (
+    BookSerializer,
+    CategorySerializer,
+    OrderSerializer,
+    SliderSerializer,
+)
+from .views import (
+    BookDetailAPIView,
+    BookListAPIView,
+    CategoryListAPIView,
+    DefaultSliderView,
+    ThemeView,
+    product_comments,
+)
+
+
+def setUpModule():
+    # Keep the per-request JSON lines out of the test output.
+    logging.getLogger("books.requests").setLevel(logging.CRITICAL)
+
+
+def tearDownModule():
+    logging.getLogger("books.requests").setLevel(logging.NOTSET)
+
+
+def make_user(username, is_admin=False, is_moderator=False):
+    user = User.objects.create_user(username, f"{username}@example.com", "secret")
+    UserProfile.objects.create(user=user, is_admin=is_admin, is_moderator=is_moderator)
+    return user
+
+
+class BookListAPIViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = make_user("owner")
+        self.moderator = make_user("moderator", is_moderator=True)
+        self.admin = make_user("admin", is_admin=True)
+        self.category = Category.objects.create(name="Fantasy")
+        self.category.moderators.add(self.moderator)
+        self.other_category = Category.objects.create(name="Kryminał")
+
+    def add_books(self, count, **kwargs):
+        kwargs.setdefault("user", self.owner)
+        kwargs.setdefault("category", self.category)
+        kwargs.setdefault("approved", True)
+        for i in range(count):
+            Book.objects.create(title=f"Book {Book.objects.count()}", **kwargs)
+
+    def count_queries(self, user=None, params=None):
+        self.client.force_authenticate(user)
+        permission_cache.invalidate()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/books/", params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_visibility_per_role(self):
+        self.add_books(1)
+        self.add_books(1, approved=None)
+        self.add_books(1, approved=None, category=self.other_category)
+        self.add_books(1, approved=None, user=self.admin, category=self.other_category)
+
+        expected = {None: 1, self.owner: 3, self.moderator: 2, self.admin: 4}
+        for user, count in expected.items():
+            self.client.force_authenticate(user)
+            response = self.client.get("/api/books/")
+            self.assertEqual(len(response.data), count, user)
+
+    def test_query_count_is_constant(self):
+        self.add_books(2)
+        for user in (None, self.owner, self.moderator, self.admin):
+            small = self.count_queries(user)
+            self.add_books(10)
+            self.assertEqual(self.count_queries(user), small, user)
+
+    def test_cursor_pagination_walks_every_book_once(self):
+        self.add_books(7)
+        self.client.force_authenticate(None)
+
+        seen = []
+        response = self.client.get("/api/books/", {"page_size": 3})
+        while True:
+            seen.extend(book["id"] for book in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        expected = list(
+            Book.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/books/", {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PERMISSION_CACHE_TTL=30)
+class PermissionContextTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = make_user("author")
+        self.moderator = make_user("moderator", is_moderator=True)
+        self.category = Category.objects.create(name="Fantasy")
+        self.book = Book.objects.create(
+            user=self.author, title="Dune", category=self.category
+        )
+        Comment.objects.create(
+            book=self.book, user=self.author, content="Great", approved=True
+        )
+        permission_cache.invalidate()
+
+    def visible_books(self, user):
+        self.client.force_authenticate(user)
+        return [book["id"] for book in self.client.get("/api/books/").data]
+
+    def count_queries(self, method, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400)
+        return len(ctx)
+
+    def test_permissions_are_loaded_once_and_reused(self):
+        self.category.moderators.add(self.moderator)
+        self.client.force_authenticate(self.moderator)
+        url = f"/api/books/{self.book.id}/comments/"
+
+        cold = self.count_queries("get", url)
+        warm = self.count_queries("get", url)
+        self.client.force_authenticate(None)
+        anonymous = self.count_queries("get", url)
+
+        # Flags and moderated categories are only queried on a cache miss.
+        self.assertGreater(cold, warm)
+        self.assertEqual(warm, anonymous)
+
+    def test_moderator_changes_invalidate_cache(self):
+        self.assertEqual(self.visible_books(self.moderator), [])
+
+        self.category.moderators.add(self.moderator)
+        self.assertEqual(self.visible_books(self.moderator), [self.book.id])
+
+        self.moderator.moderated_categories.clear()
+        self.assertEqual(self.visible_books(self.moderator), [])
+
+        self.category.moderators.add(self.moderator)
+        self.visible_books(self.moderator)
+        self.category.moderators.clear()
+        self.assertEqual(self.visible_books(self.moderator), [])
+
+    def test_profile_changes_invalidate_cache(self):
+        self.assertEqual(self.visible_books(self.author), [self.book.id])
+        self.assertEqual(self.visible_books(self.moderator), [])
+
+        self.moderator.userprofile.is_admin = True
+        self.moderator.userprofile.save()
+        self.assertEqual(self.visible_books(self.moderator), [self.book.id])
+
+    @override_settings(EVENT_BUS={"MODE": "sync"})
+    def test_moderator_of_other_category_cannot_approve(self):
+        self.client.force_authenticate(self.moderator)
+        response = self.client.patch(f"/api/books/{self.book.id}/approve/")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Event.objects.exists())
+
+        self.category.moderators.add(self.moderator)
+        response = self.client.patch(f"/api/books/{self.book.id}/approve/")
+        self.assertEqual(response.status_code, 200)
+        event = Event.objects.get()
+        self.assertEqual((event.user, event.action), (self.author, "BOOK_APPROVED"))
+
+
+class ProductCommentsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = make_user("author")
+        self.admin = make_user("admin", is_admin=True)
+        self.book = Book.objects.create(user=self.author, title="Dune")
+
+    def add_comments(self, count, approved=True):
+        for i in range(count):
+            user = make_user(f"reader{Comment.objects.count()}")
+            Comment.objects.create(
+                book=self.book, user=user, content=f"#{i}", approved=approved
+            )
+
+    def test_cursor_pagination_newest_first(self):
+        self.add_comments(5)
+        url = f"/api/books/{self.book.id}/comments/"
+
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.data["count"], 5)
+        seen = []
+        while True:
+            seen.extend(comment["id"] for comment in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        expected = Comment.objects.order_by("-created_at", "-id")
+        self.assertEqual(seen, list(expected.values_list("id", flat=True)))
+
+    def test_query_count_does_not_depend_on_comment_count(self):
+        url = f"/api/books/{self.book.id}/comments/"
+        self.add_comments(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        self.add_comments(20)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual(len(large), len(small))
+
+    def approved_comment_count(self):
+        response = self.client.get(f"/api/books/{self.book.id}/")
+        return response.data["comment_count"]
+
+    def test_comment_count_follows_moderation(self):
+        self.add_comments(2)
+        self.add_comments(3, approved=None)
+        self.assertEqual(self.approved_comment_count(), 2)
+
+        self.client.force_authenticate(self.admin)
+        pending = list(
+            Comment.objects.filter(approved=None).values_list("id", flat=True)
+        )
+        self.client.post(f"/api/comments/{pending[0]}/approve/")
+        self.assertEqual(self.approved_comment_count(), 3)
+
+        self.client.post(
+            "/api/comments/moderate/",
+            {"ids": pending[1:], "decision": "approve"},
+            format="json",
+        )
+        self.assertEqual(self.approved_comment_count(), 5)
+
+        Comment.objects.filter(id=pending[0]).delete()
+        self.assertEqual(self.approved_comment_count(), 4)
+
+
+class BookStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = make_user("buyer")
+        self.admin = make_user("admin", is_admin=True)
+        self.fantasy = Category.objects.create(name="Fantasy")
+        self.crime = Category.objects.create(name="Kryminał")
+        self.dune = self.book("Dune", 30, self.fantasy)
+        self.hobbit = self.book("Hobbit", 20, self.fantasy)
+        self.poirot = self.book("Poirot", 50, self.crime)
+
+    def book(self, title, price, category):
+        return Book.objects.create(
+            user=self.admin, title=title, price=price, category=category, approved=True
+        )
+
+    def order(self, *lines):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(
+            "/api/order/",
+            {
+                **CreateOrderViewTests.address,
+                "items": [{"book": book.id, "quantity": qty} for book, qty in lines],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def stats(self, book):
+        stats = BookStats.objects.get(book=book)
+        return stats.sales_count, stats.revenue, stats.comment_count
+
+    def top(self, **params):
+        response = self.client.get("/api/books/top/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["book"]["title"] for row in response.data]
+
+    @override_settings(EVENT_BUS={"MODE": "sync"})
+    def test_orders_and_cancellations_update_sales(self):
+        self.order((self.dune, 2), (self.hobbit, 1))
+        order_id = self.order((self.dune, 1))
+        self.assertEqual(self.stats(self.dune), (3, 90, 0))
+        self.assertEqual(self.stats(self.hobbit), (1, 20, 0))
+
+        url = f"/api/orders/{order_id}/update-status/"
+        self.client.post(url, {"status": "cancelled"}, format="json")
+        self.assertEqual(self.stats(self.dune), (2, 60, 0))
+        self.client.post(url, {"status": "cancelled"}, format="json")
+        self.assertEqual(self.stats(self.dune), (2, 60, 0))
+        self.client.post(url, {"status": "shipped"}, format="json")
+        self.assertEqual(self.stats(self.dune), (3, 90, 0))
+        self.assertEqual(
+            Event.objects.filter(
+                user=self.buyer, action="ORDER_STATUS_UPDATED"
+            ).count(),
+            3,
+        )
+
+    @override_settings(EVENT_BUS={"MODE": "sync"})
+    def test_comment_moderation_updates_comment_count(self):
+        comment = Comment.objects.create(
+            book=self.poirot, user=self.buyer, content="Świetna"
+        )
+        self.client.force_authenticate(self.admin)
+        self.client.post(f"/api/comments/{comment.id}/approve/")
+        self.assertEqual(self.stats(self.poirot), (0, 0, 1))
+        self.client.post(f"/api/comments/{comment.id}/reject/")
+        self.assertEqual(self.stats(self.poirot), (0, 0, 0))
+        self.assertEqual(
+            list(
+                Event.objects.filter(user=self.buyer)
+                .order_by("id")
+                .values_list("action", flat=True)
+            ),
+            ["COMMENT_APPROVED", "COMMENT_REJECTED"],
+        )
+
+    def test_top_books(self):
+        self.order((self.dune, 1), (self.hobbit, 4), (self.poirot, 2))
+        Comment.objects.create(
+            book=self.dune, user=self.buyer, content="!", approved=True
+        )
+
+        self.assertEqual(self.top(by="sales"), ["Hobbit", "Poirot", "Dune"])
+        self.assertEqual(self.top(by="revenue"), ["Poirot", "Hobbit", "Dune"])
+        self.assertEqual(self.top(by="comments", limit=1), ["Dune"])
+        self.assertEqual(
+            self.top(by="revenue", category=self.fantasy.id), ["Hobbit", "Dune"]
+        )
+        response = self.client.get("/api/books/top/", {"by": "likes"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_matches_incremental_updates(self):
+        self.order((self.dune, 2), (self.poirot, 1))
+        cancelled = self.order((self.hobbit, 5))
+        Order.objects.filter(id=cancelled).update(status="cancelled")
+        Comment.objects.create(
+            book=self.hobbit, user=self.buyer, content="!", approved=True
+        )
+        self.hobbit.category = self.crime
+        self.hobbit.save()
+        expected = {row["book_id"]: row for row in BookStats.objects.values()}
+        expected[self.hobbit.id].update(sales_count=0, revenue=0)
+
+        BookStats.objects.all().delete()
+        call_command("rebuild_book_stats", stdout=io.StringIO())
+
+        self.assertEqual(
+            {row["book_id"]: row for row in BookStats.objects.values()}, expected
+        )
+
+
+class SalesReportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = make_user("buyer")
+        self.admin = make_user("admin", is_admin=True)
+        fantasy = Category.objects.create(name="Fantasy")
+        crime = Category.objects.create(name="Kryminał")
+        self.dune = Book.objects.create(
+            user=self.admin, title="Dune", price=30, category=fantasy
+        )
+        self.poirot = Book.objects.create(
+            user=self.admin, title="Poirot", price=50, category=crime
+        )
+
+    def order(self, *lines):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post(
+            "/api/order/",
+            {
+                **CreateOrderViewTests.address,
+                "items": [{"book": book.id, "quantity": qty} for book, qty in lines],
+            },
+            format="json",
+        )
+        return response.data["id"]
+
+    def report(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get("/api/reports/sales/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def totals(self, rows, *keys):
+        return {
+            tuple(row[key] for key in keys): (
+                row["orders"],
+                row["items"],
+                row["revenue"],
+            )
+            for row in rows
+        }
+
+    def test_rollup_follows_orders_and_status_changes(self):
+        self.order((self.dune, 2), (self.poirot, 1))
+        second = self.order((self.dune, 1))
+        self.client.force_authenticate(self.admin)
+        self.client.post(
+            f"/api/orders/{second}/update-status/", {"status": "cancelled"}
+        )
+
+        self.assertEqual(
+            self.totals(self.report(group="status"), "status"),
+            {("pending",): (1, 3, 110), ("cancelled",): (1, 1, 30)},
+        )
+        self.assertEqual(
+            self.totals(
+                self.report(group="category", status="pending"), "category_name"
+            ),
+            {("Fantasy",): (1, 2, 60), ("Kryminał",): (1, 1, 50)},
+        )
+        self.assertEqual(
+            self.totals(self.report(bucket="month"), "period"),
+            {(timezone.localdate().replace(day=1),): (2, 4, 140)},
+        )
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.order((self.dune, 2), (self.poirot, 1))
+        self.order((self.poirot, 3))
+        fields = ["day", "status", "category", "all_categories", "orders"]
+        expected = sorted(
+            DailySalesRollup.objects.values_list(*fields, "items", "revenue"), key=str
+        )
+
+        call_command("rebuild_sales_rollup", stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(
+                DailySalesRollup.objects.values_list(*fields, "items", "revenue"),
+                key=str,
+            ),
+            expected,
+        )
+
+    def test_csv_is_streamed(self):
+        self.order((self.dune, 1))
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(
+            "/api/reports/sales/", {"group": "status", "output": "csv"}
+        )
+
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "period,status,orders,items,revenue")
+        self.assertEqual(lines[1], f"{timezone.localdate()},pending,1,1,30.00")
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.get("/api/reports/sales/")
+        self.assertEqual(response.status_code, 403)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = make_user("buyer")
+        self.other = make_user("other")
+        self.admin = make_user("admin", is_admin=True)
+        book = Book.objects.create(user=self.admin, title="Dune", price=30)
+        for user, status in (
+            (self.buyer, "pending"),
+            (self.buyer, "shipped"),
+            (self.other, "pending"),
+        ):
+            order = Order.objects.create(user=user, status=status, total_price=30)
+            OrderItem.objects.create(order=order, book=book, total_price=30)
+            Event.objects.create(user=user, action=f"ORDER_{status.upper()}")
+
+    def export(self, url, as_user, **params):
+        self.client.force_authenticate(as_user)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content), response
+
+    def test_orders_csv_uses_list_filters(self):
+        content, response = self.export(
+            "/api/orders/export/", self.admin, status="pending"
+        )
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual([row["username"] for row in rows], ["buyer", "other"])
+        self.assertEqual(rows[0]["total_price"], "30.00")
+
+    def test_users_export_only_their_orders(self):
+        content, _ = self.export(
+            "/api/orders/export/", self.buyer, output="ndjson", rows="items"
+        )
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+
+        self.assertEqual([row["status"] for row in rows], ["pending", "shipped"])
+        self.assertEqual(rows[0]["book_title"], "Dune")
+
+    def test_gzip(self):
+        content, response = self.export(
+            "/api/events/export/", self.admin, output="ndjson", gzip="1"
+        )
+        rows = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('events.ndjson.gz"', response["Content-Disposition"])
+        self.assertEqual(len(rows), 3)
+
+    def test_event_filters(self):
+        content, _ = self.export(
+            "/api/events/export/", self.admin, action="ORDER_PENDING", user="other"
+        )
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(
+            [(r["username"], r["action"]) for r in rows], [("other", "ORDER_PENDING")]
+        )
+
+        content, _ = self.export("/api/events/export/", self.other)
+        self.assertEqual(len(content.decode().splitlines()), 2)
+
+
+class SQLitePragmaTests(TestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class AsyncCatalogTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        self.factory = AsyncRequestFactory()
+        owner = make_user("owner")
+        moderator = make_user("moderator", is_moderator=True)
+        category = Category.objects.create(name="Fantasy")
+        category.moderators.add(moderator)
+        self.book = Book.objects.create(
+            user=owner, title="Dune", price=30, category=category, approved=True
+        )
+        Book.objects.create(user=owner, title="Draft", category=category)
+        Comment.objects.create(
+            book=self.book, user=owner, content="Świetna", approved=True
+        )
+        Comment.objects.create(book=self.book, user=owner, content="Spam")
+        Theme.objects.create(
+            name="Jasny",
+            primary_color="#fff",
+            secondary_color="#eee",
+            accent_color="#f00",
+        )
+        slider = Slider.objects.create(title="Start", is_default=True)
+        slider.images.add(
+            GalleryImage.objects.create(title="Okładka", description="", image="a.png")
+        )
+
+    async def test_payloads_match_sync_views(self):
+        cases = [
+            (async_views.book_list, BookListAPIView.as_view(), "/api/books/", {}),
+            (
+                async_views.book_list,
+                BookListAPIView.as_view(),
+                "/api/books/?page_size=1",
+                {},
+            ),
+            (
+                async_views.book_detail,
+                BookDetailAPIView.as_view(),
+                f"/api/books/{self.book.id}/",
+                {"pk": self.book.id},
+            ),
+            (
+                async_views.category_list,
+                CategoryListAPIView.as_view(),
+                "/api/categories/",
+                {},
+            ),
+            (
+                async_views.product_comments,
+                product_comments,
+                f"/api/books/{self.book.id}/comments/",
+                {"book_id": self.book.id},
+            ),
+            (async_views.theme, ThemeView.as_view(), "/api/theme/default/", {}),
+            (
+                async_views.default_slider,
+                DefaultSliderView.as_view(),
+                "/api/sliders/default/",
+                {},
+            ),
+        ]
+        for async_view, sync_view, path, kwargs in cases:
+            with self.subTest(path=path):
+                response = await async_view(self.factory.get(path), **kwargs)
+                expected = await sync_to_async(sync_view)(
+                    self.factory.get(path), **kwargs
+                )
+                self.assertEqual(response.status_code, 200)
+                if hasattr(expected, "data"):
+                    expected = json.dumps(expected.data, cls=DjangoJSONEncoder)
+                else:
+                    # The default slider is a prebuilt document.
+                    expected = expected.content
+                self.assertEqual(json.loads(response.content), json.loads(expected))
+
+    async def test_authenticated_requests_use_sync_views(self):
+        request = self.factory.get(
+            "/api/books/", headers={"Authorization": "Bearer nope"}
+        )
+        response = await async_views.book_list(request)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_missing_book(self):
+        response = await async_views.book_detail(
+            self.factory.get("/api/books/999/"), pk=999
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {"detail": "Book not found"})
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        metrics.registry.reset()
+        self.client = APIClient()
+        owner = make_user("owner")
+        category = Category.objects.create(name="Fantasy")
+        for title in ("Dune", "Solaris"):
+            Book.objects.create(
+                user=owner, title=title, category=category, approved=True
+            )
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs("books.requests", level="INFO") as logs:
+            response = self.client.get("/api/books/")
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("serialize;dur=", timing)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["view"], "book-list")
+        self.assertEqual(line["status"], 200)
+        self.assertGreater(line["queries"], 0)
+        self.assertGreater(line["serialize_ms"], 0)
+
+    def test_streamed_response_is_reported_after_its_body(self):
+        self.client.force_authenticate(make_user("admin", is_admin=True))
+        with self.assertLogs("books.requests", level="INFO") as logs:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get("/api/orders/export/")
+                self.assertEqual(logs.records, [])
+                b"".join(response.streaming_content)
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["view"], "order-export")
+        self.assertTrue(line["streamed"])
+        # Including the export query run while the body was consumed.
+        self.assertEqual(line["queries"], len(ctx))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/books/")
+        self.assertEqual(self.client.get("/api/_metrics").status_code, 401)
+        self.client.force_authenticate(make_user("reader"))
+        self.assertEqual(self.client.get("/api/_metrics").status_code, 403)
+
+        self.client.force_authenticate(make_user("admin", is_admin=True))
+        response = self.client.get("/api/_metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            'bibliopolis_request_duration_seconds_count{view="book-list",method="GET"} 1',
+            body,
+        )
+        self.assertIn(
+            'bibliopolis_requests_total{view="book-list",method="GET",status="200"} 1',
+            body,
+        )
+        self.assertIn(
+            'bibliopolis_request_queries_bucket{view="book-list",method="GET",le="+Inf"} 1',
+            body,
+        )
+
+    def run_repeated_queries(self):
+        collected, token = metrics.start()
+        try:
+            for book in Book.objects.all():
+                Book.objects.get(pk=book.pk)
+        finally:
+            metrics.stop(token)
+        collected.finish()
+        request = RequestFactory().get("/api/books/")
+        metrics.report(request, HttpResponse(), collected)
+
+    @override_settings(REQUEST_METRICS={"DUPLICATE_QUERY_THRESHOLD": 2})
+    def test_repeated_queries_are_reported(self):
+        with self.assertLogs("books.requests", level="WARNING") as logs:
+            self.run_repeated_queries()
+        report = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(report["duplicate_queries"][0]["count"], 2)
+        self.assertIn(
+            "bibliopolis_duplicate_query_requests_total", metrics.registry.render()
+        )
+
+    @override_settings(
+        REQUEST_METRICS={
+            "DUPLICATE_QUERY_THRESHOLD": 2,
+            "DUPLICATE_QUERY_ACTION": "raise",
+        }
+    )
+    def test_repeated_queries_can_fail_the_request(self):
+        with self.assertRaises(metrics.DuplicateQueriesError):
+            self.run_repeated_queries()
+
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = make_user("owner")
+        self.lodz = Book.objects.create(
+            user=self.owner,
+            title="Ziemia obiecana",
+            author="Władysław Reymont",
+            description="Powieść o Łodzi.",
+            approved=True,
+        )
+        self.witcher = Book.objects.create(
+            user=self.owner,
+            title="Wiedźmin",
+            author="Andrzej Sapkowski",
+            description="Geralt z Rivii.",
+            approved=True,
+        )
+        self.hidden = Book.objects.create(
+            user=self.owner,
+            title="Wiedźmin: szkic",
+            approved=None,
+        )
+
+    def search(self, query):
+        response = self.client.get("/api/books/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [book["id"] for book in response.data["results"]]
+
+    def test_folds_diacritics_and_matches_prefixes(self):
+        self.assertEqual(self.search("lodz"), [self.lodz.id])
+        self.assertEqual(self.search("WIEDZ"), [self.witcher.id])
+        self.assertEqual(self.search("wladys reym"), [self.lodz.id])
+
+    def test_owner_sees_own_pending_book(self):
+        self.client.force_authenticate(self.owner)
+        self.assertCountEqual(
+            self.search("wiedzmin"), [self.witcher.id, self.hidden.id]
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        self.witcher.title = "Krew elfów"
+        self.witcher.save()
+        self.assertEqual(self.search("elfow"), [self.witcher.id])
+        self.witcher.delete()
+        self.assertEqual(self.search("elfow"), [])
+
+    def test_python_backend_ranks_title_hits_first(self):
+        Book.objects.create(
+            user=self.owner, title="Inna", description="Ziemia", approved=True
+        )
+        backend = InvertedIndexBackend()
+        results = backend.search("ziemia", 10)
+        self.assertEqual(results[0], self.lodz.id)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(backend.search("lodz", 10), [self.lodz.id])
+
+
+class CreateOrderViewTests(TestCase):
+    address = {
+        "shipping_address": "Piotrkowska 1",
+        "city": "Łódź",
+        "postal_code": "90-001",
+        "phone_number": "123456789",
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = make_user("buyer")
+        self.admin = make_user("admin", is_admin=True)
+        self.books = [
+            Book.objects.create(user=self.admin, title=f"Book {i}", price=10 + i)
+            for i in range(5)
+        ]
+
+    def order(self, *lines):
+        return {
+            **self.address,
+            "items": [{"book": book.id, "quantity": qty} for book, qty in lines],
+        }
+
+    def test_creates_order_with_constant_queries(self):
+        self.client.force_authenticate(self.user)
+        # The first order of the day creates its sales rollup rows.
+        self.client.post("/api/order/", self.order((self.books[0], 1)), format="json")
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(
+                "/api/order/", self.order((self.books[0], 1)), format="json"
+            )
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(
+                "/api/order/",
+                self.order(*[(book, 2) for book in self.books]),
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["total_price"], "120.00")
+        self.assertEqual(len(response.data["items"]), 5)
+        self.assertEqual(len(large), len(small))
+
+    def test_missing_book_leaves_nothing_behind(self):
+        self.client.force_authenticate(self.user)
+        payload = self.order((self.books[0], 1))
+        payload["items"].append({"book": 9999, "quantity": 1})
+        response = self.client.post("/api/order/", payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_batch_reports_each_order(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            "/api/orders/batch/",
+            {
+                "orders": [
+                    self.order((self.books[0], 1)),
+                    {**self.order((self.books[1], 1)), "city": ""},
+                    {**self.order((self.books[2], 3)), "user": self.user.id},
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 1))
+        statuses = [result["result"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "error", "created"])
+        self.assertEqual(Order.objects.get(user=self.user).total_price, 36)
+
+    def test_amounts_that_do_not_fit_are_rejected(self):
+        self.client.force_authenticate(self.user)
+        costly = Book.objects.create(user=self.admin, title="Atlas", price=60_000_000)
+        payloads = [
+            self.order((self.books[0], 10**12)),
+            # The line total overflows.
+            self.order((costly, 2)),
+            # Every line fits, the order total does not.
+            self.order((costly, 1), (costly, 1)),
+        ]
+        for payload in payloads:
+            response = self.client.post("/api/order/", payload, format="json")
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            "/api/orders/batch/",
+            {"orders": [self.order((costly, 2)), self.order((self.books[0], 1))]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["result"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["error", "created"])
+
+    def test_batch_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/api/orders/batch/",
+            {"orders": [self.order((self.books[0], 1))]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderListViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = make_user("admin", is_admin=True)
+        self.buyer = make_user("buyer")
+        self.book = Book.objects.create(user=self.admin, title="Lalka", price=25)
+
+    def add_orders(self, count, user=None, status="pending", items=2):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=user or self.buyer, status=status, total_price=25 * items
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, book=self.book, total_price=25)
+                for _ in range(items)
+            )
+
+    def get(self, params=None):
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/orders/", params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_query_count_is_constant(self):
+        self.add_orders(2)
+        _, small = self.get()
+        self.add_orders(10, items=4)
+        response, large = self.get()
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(large, small)
+
+    def test_summary_skips_items(self):
+        self.add_orders(3)
+        response, queries = self.get({"fields": "summary"})
+        _, full = self.get()
+        self.assertNotIn("items", response.data[0])
+        self.assertEqual(queries, full - 1)
+
+    def test_filters_and_pagination(self):
+        self.add_orders(3, status="shipped")
+        self.add_orders(2, status="pending", items=1)
+        self.add_orders(1, user=self.admin, status="shipped")
+
+        response, _ = self.get({"status": "shipped", "user": "buyer", "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNotNone(response.data["next"])
+
+        response, _ = self.get({"max_total": "30", "date_from": "2000-01-01"})
+        self.assertEqual(len(response.data), 2)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get("/api/orders/", {"status": "lost"})
+        self.assertEqual(response.status_code, 400)
+        for amount in ("NaN", "sNaN", "-Infinity", "abc"):
+            response = self.client.get("/api/orders/", {"min_total": amount})
+            self.assertEqual(response.status_code, 400, amount)
+        response = self.client.get("/api/orders/export/", {"max_total": "sNaN"})
+        self.assertEqual(response.status_code, 400)
+
+
+class ViewCacheTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        self.client = APIClient()
+        Theme.objects.create(name="Jasny")
+
+    def test_second_read_is_served_from_cache(self):
+        self.client.get("/api/themes/")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/themes/")
+        # The namespace versions only.
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(
+            view_cache.stats()["ThemeListView.get"], {"hits": 1, "misses": 1}
+        )
+
+    def test_writes_invalidate_dependent_entries(self):
+        self.assertEqual(len(self.client.get("/api/themes/").data), 1)
+        Theme.objects.create(name="Ciemny")
+        self.assertEqual(len(self.client.get("/api/themes/").data), 2)
+
+        category = Category.objects.create(name="Poezja")
+        self.assertEqual(self.client.get("/api/categories/").data[0]["moderators"], [])
+        category.moderators.add(make_user("moderator", is_moderator=True))
+        self.assertEqual(
+            len(self.client.get("/api/categories/").data[0]["moderators"]), 1
+        )
+
+    def test_conditional_requests(self):
+        # A change made in an earlier second.
+        CacheVersion.objects.filter(namespace="themes").update(
+            version=F("version") - 5_000_000_000
+        )
+        response = self.client.get("/api/themes/")
+        etag = response["ETag"]
+        response = self.client.get("/api/themes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            "/api/themes/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        Theme.objects.create(name="Ciemny")
+        response = self.client.get("/api/themes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_waits_for_its_second_to_pass(self):
+        # A change whose second has not passed yet (a second ahead, so the
+        # test cannot cross into it): a later change in that second would get
+        # the same Last-Modified.
+        CacheVersion.objects.filter(namespace="themes").update(
+            version=time.time_ns() + 1_000_000_000
+        )
+        response = self.client.get("/api/themes/")
+        self.assertFalse(response.has_header("Last-Modified"))
+        response = self.client.get(
+            "/api/themes/", HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_versions_are_shared_between_workers(self):
+        etag = self.client.get("/api/themes/")["ETag"]
+        # Another worker's bump only reaches this one through the database.
+        CacheVersion.objects.filter(namespace="themes").update(version=F("version") + 1)
+        response = self.client.get("/api/themes/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class HttpCachingTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        self.client = APIClient()
+        self.owner = make_user("owner")
+        self.category = Category.objects.create(name="Fantasy")
+        for i in range(20):
+            Book.objects.create(
+                user=self.owner,
+                title=f"Wiedźmin {i}",
+                description="Opowiadania " * 5,
+                category=self.category,
+                approved=True,
+            )
+
+    def test_book_list_revalidates_with_one_query(self):
+        response = self.client.get("/api/books/")
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(response["ETag"], etag)
+
+        book = Book.objects.get(title="Wiedźmin 1")
+        book.title = "Ostatnie życzenie"
+        book.save()
+        response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_book_list_revalidates_after_derivatives_are_stored(self):
+        etag = self.client.get("/api/books/")["ETag"]
+        book = Book.objects.get(title="Wiedźmin 0")
+        manifest = {
+            "sha256": "0" * 64,
+            "sizes": {
+                "thumb": {
+                    "width": 200,
+                    "height": 300,
+                    "webp": "derivatives/a.webp",
+                    "jpeg": "derivatives/a.jpg",
+                }
+            },
+        }
+        store_manifest(Book, book.pk, manifest)
+        response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        derivatives = {row["id"]: row["derivatives"] for row in response.data}
+        self.assertIn("thumb", derivatives[book.pk])
+
+    def test_order_list_etag_is_per_user(self):
+        other = make_user("other")
+        Order.objects.create(user=self.owner, total_price=10)
+        self.client.force_authenticate(self.owner)
+        response = self.client.get("/api/orders/")
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertIn("Authorization", response["Vary"])
+        self.assertEqual(
+            self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        self.client.force_authenticate(other)
+        response = self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
+
+        self.client.force_authenticate(self.owner)
+        order = Order.objects.get()
+        order.status = "shipped"
+        order.save()
+        response = self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_gzip_above_threshold(self):
+        plain = self.client.get("/api/books/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+        response = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="br;q=0.5, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], plain["ETag"][:-1] + '-gzip"')
+
+        response = self.client.get(
+            "/api/books/",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], plain["ETag"][:-1] + '-gzip"')
+
+        refused = self.client.get("/api/books/", HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(refused.has_header("Content-Encoding"))
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get("/api/categories/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertLess(len(response.content), 1024)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class DefaultSliderSnapshotTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        default_slider_snapshot.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(SLIDER_SNAPSHOT={"DIRECTORY": self.directory})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.image = GalleryImage.objects.create(title="Okładka", image="gallery/a.jpg")
+        self.slider = Slider.objects.create(title="Start", is_default=True)
+        self.slider.images.add(self.image)
+
+    def get(self, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/sliders/default/", **headers)
+        return response, len(ctx)
+
+    def test_served_from_snapshot_and_rebuilt_on_change(self):
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            data["images"][0]["image"], "http://testserver/media/gallery/a.jpg"
+        )
+        # The version check only.
+        self.assertEqual(self.get()[1], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.title = "Nowa okładka"
+            self.image.save()
+        response, queries = self.get()
+        self.assertEqual(queries, 1)
+        self.assertEqual(
+            json.loads(response.content)["images"][0]["title"], "Nowa okładka"
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slider.images.clear()
+        self.assertEqual(json.loads(self.get()[0].content)["images"], [])
+
+    def test_disk_document_outlives_process_memory(self):
+        etag = self.get()[0]["ETag"]
+        default_slider_snapshot.clear()
+        response, queries = self.get()
+        self.assertEqual(queries, 1)
+        self.assertEqual(response["ETag"], etag)
+
+        response, _ = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_document_rendered_by_another_worker_is_served(self):
+        self.get()
+        # Another worker changes the slider and renders the new document.
+        Slider.objects.filter(pk=self.slider.pk).update(title="Lato")
+        view_cache.bump("sliders")
+        SliderSnapshot().build("http://testserver")
+
+        response, queries = self.get()
+        self.assertEqual(queries, 1)
+        self.assertEqual(json.loads(response.content)["title"], "Lato")
+
+    def test_single_default(self):
+        other = Slider.objects.create(title="Lato")
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/api/sliders/{other.id}/set_default/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(Slider.objects.filter(is_default=True)), [other])
+        self.assertEqual(json.loads(self.get()[0].content)["title"], "Lato")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Slider.objects.create(title="Zima", is_default=True)
+
+    def test_no_default_slider(self):
+        self.slider.delete()
+        response, _ = self.get()
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {"error": "No default slider."})
+
+
+class SliderMembershipTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        default_slider_snapshot.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(make_user("admin", is_admin=True))
+        self.slider = Slider.objects.create(title="Start", is_default=True)
+        self.images = [
+            GalleryImage.objects.create(title=f"Zdjęcie {i}", image=f"gallery/{i}.jpg")
+            for i in range(30)
+        ]
+
+    def put(self, image_ids):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(
+                f"/api/sliders/{self.slider.id}/images/",
+                {"images": image_ids},
+                format="json",
+            )
+        return response, len(ctx)
+
+    def ids(self, images):
+        return [image.id for image in images]
+
+    def titles(self):
+        response = self.client.get(f"/api/sliders/{self.slider.id}/")
+        return [image["title"] for image in response.data["images"]]
+
+    def test_batch_update_cost_does_not_grow_with_images(self):
+        costs = []
+        for size in (3, 15):
+            # Drops the first image, reverses the rest and appends as many.
+            self.put(self.ids(self.images[:size]))
+            wanted = self.ids(self.images[size - 1 : 0 : -1] + self.images[size:])
+            response, queries = self.put(wanted)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([image["id"] for image in response.data["images"]], wanted)
+            costs.append(queries)
+        self.assertEqual(costs[0], costs[1])
+
+    def test_reorder_add_and_remove_in_one_request(self):
+        self.put(self.ids(self.images[:3]))
+        response, _ = self.put(self.ids([self.images[2], self.images[4]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(), ["Zdjęcie 2", "Zdjęcie 4"])
+        self.assertEqual(
+            list(
+                SliderImage.objects.filter(slider=self.slider).values_list(
+                    "image_id", "position"
+                )
+            ),
+            [(self.images[2].id, 0), (self.images[4].id, 1)],
+        )
+
+    def test_invalid_lists_change_nothing(self):
+        self.put(self.ids(self.images[:2]))
+        for images in ([self.images[0].id, 999], [1, 1], "1,2", None):
+            response, _ = self.put(images)
+            self.assertEqual(response.status_code, 400, images)
+        self.assertEqual(self.titles(), ["Zdjęcie 0", "Zdjęcie 1"])
+
+    def test_move_rejects_malformed_bodies(self):
+        self.put(self.ids(self.images[:2]))
+        for body in ([self.images[0].id, 1], {"image_id": self.images[0].id}):
+            response = self.client.patch(
+                f"/api/sliders/{self.slider.id}/update_order/", body, format="json"
+            )
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(make_user("customer"))
+        response, _ = self.put([])
+        self.assertEqual(response.status_code, 403)
+
+    def test_move_and_append_keep_order(self):
+        self.put(self.ids(self.images[:3]))
+        response = self.client.patch(
+            f"/api/sliders/{self.slider.id}/update_order/",
+            {"image_id": self.images[0].id, "new_order": 2},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.post(
+            f"/api/sliders/{self.slider.id}/add_image/",
+            {"image_id": self.images[5].id},
+        )
+        self.assertEqual(
+            self.titles(), ["Zdjęcie 1", "Zdjęcie 2", "Zdjęcie 0", "Zdjęcie 5"]
+        )
+
+    def test_default_slider_follows_batch_update(self):
+        self.put(self.ids(self.images[:2]))
+        self.client.get("/api/sliders/default/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.put(self.ids(self.images[1::-1]))
+        response = self.client.get("/api/sliders/default/")
+        self.assertEqual(
+            [image["title"] for image in json.loads(response.content)["images"]],
+            ["Zdjęcie 1", "Zdjęcie 0"],
+        )
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        self.client = APIClient()
+        self.owner = make_user("owner")
+        moderator = make_user("moderator", is_moderator=True)
+        self.category = Category.objects.create(name="Fantasy")
+        self.category.moderators.add(moderator)
+        manifest = {
+            "sizes": {
+                "thumb": {
+                    "width": 200,
+                    "height": 300,
+                    "webp": "derivatives/a.webp",
+                    "jpeg": "derivatives/a.jpg",
+                }
+            }
+        }
+        self.books = [
+            Book.objects.create(
+                user=self.owner,
+                title=f"Wiedźmin {i}",
+                description="Opowiadania " * 20,
+                price=39 + i,
+                category=self.category,
+                approved=True,
+                image="books/cover.jpg" if i else "",
+                image_derivatives=manifest if i else {},
+            )
+            for i in range(3)
+        ]
+        image = GalleryImage.objects.create(title="Okładka", image="gallery/a.jpg")
+        Slider.objects.create(title="Start", is_default=True).images.add(image)
+        order = Order.objects.create(user=self.owner, total_price=81)
+        OrderItem.objects.create(
+            order=order, book=self.books[0], quantity=2, total_price=78
+        )
+
+    def test_dump_matches_drf_serializers(self):
+        cases = [
+            (BookSerializer, "", "?fields=id,category", "?fields=id,category.name"),
+            (CategorySerializer, "", "?fields=name"),
+            (SliderSerializer, "", "?fields=title,images&expand=images"),
+            (OrderSerializer, "", "?fields=username,items.book_title"),
+        ]
+        for serializer_class, *queries in cases:
+            instances = serializer_class.Meta.model.objects.all()
+            for query in queries:
+                context = {"request": RequestFactory().get(f"/{query}")}
+                self.assertEqual(
+                    dump(serializer_class(context=context), instances),
+                    serializer_class(instances, many=True, context=context).data,
+                    query,
+                )
+
+    def test_fields_narrow_output_and_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                "/api/books/?fields=id,title,price,derivatives&page_size=10"
+            )
+        self.assertEqual(response.status_code, 200)
+        book = response.data["results"][0]
+        self.assertEqual(list(book), ["id", "title", "price", "derivatives"])
+        self.assertIn("thumb", book["derivatives"])
+        sql = " ".join(query["sql"] for query in ctx.captured_queries)
+        self.assertNotIn("description", sql)
+        self.assertNotIn("books_category", sql)
+        self.assertNotIn("auth_user", sql)
+
+    def test_nested_objects_collapse_unless_expanded(self):
+        response = self.client.get("/api/books/?fields=id,category")
+        self.assertEqual(response.data[0]["category"], self.category.id)
+
+        response = self.client.get("/api/books/?fields=id,category&expand=category")
+        self.assertEqual(response.data[0]["category"]["name"], "Fantasy")
+        self.assertEqual(len(response.data[0]["category"]["moderators"]), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/books/?fields=title,category.name")
+        # The cache versions, then the books.
+        self.assertEqual(len(ctx), 2)
+        self.assertEqual(
+            response.data[0], {"title": "Wiedźmin 0", "category": {"name": "Fantasy"}}
+        )
+        self.assertFalse(
+            any("moderators" in query["sql"] for query in ctx.captured_queries)
+        )
+
+        response = self.client.get("/api/sliders/?fields=title,images")
+        self.assertEqual(response.data[0]["images"], [GalleryImage.objects.get().id])
+
+    def test_unknown_field(self):
+        response = self.client.get("/api/books/?fields=id,isbn")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("isbn", response.data["fields"])
+
+    def test_order_fields(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get("/api/orders/?fields=id,total_price,items.quantity")
+        self.assertEqual(
+            response.data[0],
+            {
+                "id": Order.objects.get().id,
+                "total_price": "81.00",
+                "items": [{"quantity": 2}],
+            },
+        )
+        response = self.client.get("/api/orders/?fields=summary")
+        self.assertIn("username", response.data[0])
+
+
+class BookBrowseTests(TestCase):
+    def setUp(self):
+        view_cache.clear()
+        self.client = APIClient()
+        owner = make_user("owner")
+        self.fantasy = Category.objects.create(name="Fantasy")
+        self.classics = Category.objects.create(name="Klasyka")
+        for title, author, price, category, approved in [
+            ("Wiedźmin", "Sapkowski", 39, self.fantasy, True),
+            ("Krew elfów", "Sapkowski", 45, self.fantasy, True),
+            ("Solaris", "Lem", 25, self.fantasy, True),
+            ("Lalka", "Prus", 15, self.classics, True),
+            ("Potop", "Sienkiewicz", 120, self.classics, True),
+            ("Szkic", "Sapkowski", 10, self.fantasy, None),
+        ]:
+            Book.objects.create(
+                user=owner,
+                title=title,
+                author=author,
+                price=price,
+                description="Opis",
+                category=category,
+                approved=approved,
+            )
+
+    def test_facets_ignore_their_own_filter(self):
+        response = self.client.get(
+            f"/api/books/browse/?category={self.fantasy.id}&sort=price"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(
+            [book["title"] for book in response.data["results"]],
+            ["Solaris", "Wiedźmin", "Krew elfów"],
+        )
+        facets = response.data["facets"]
+        self.assertEqual(
+            [(row["name"], row["count"]) for row in facets["category"]],
+            [("Fantasy", 3), ("Klasyka", 2)],
+        )
+        self.assertEqual(
+            [(row["name"], row["count"]) for row in facets["author"]],
+            [("Sapkowski", 2), ("Lem", 1)],
+        )
+        self.assertEqual([row["count"] for row in facets["price"]], [0, 3, 0, 0, 0])
+
+    def test_author_and_price_filters(self):
+        response = self.client.get(
+            "/api/books/browse/?author=Sapkowski&author=Prus&max_price=40"
+        )
+        self.assertEqual(
+            sorted(book["title"] for book in response.data["results"]),
+            ["Lalka", "Wiedźmin"],
+        )
+        self.assertEqual(
+            [row["count"] for row in response.data["facets"]["price"]],
+            [1, 2, 0, 0, 0],
+        )
+
+    def test_invalid_prices_are_rejected(self):
+        for amount in ("NaN", "sNaN", "Infinity", "dużo"):
+            response = self.client.get(f"/api/books/browse/?min_price={amount}")
+            self.assertEqual(response.status_code, 400, amount)
+            self.assertEqual(response.data, {"min_price": "Nieprawidłowa kwota."})
+
+    def test_facets_are_cached_until_books_change(self):
+        self.client.get("/api/books/browse/?sort=title")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/books/browse/?sort=-price")
+        # Cache versions (response and facets), page count and rows, plus the
+        # moderators prefetch.
+        self.assertEqual(len(ctx), 5)
+
+        Book.objects.filter(title="Szkic").update(approved=True)
+        view_cache.bump("books")
+        response = self.client.get("/api/books/browse/?sort=title")
+        self.assertEqual(response.data["facets"]["author"][0]["count"], 3)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(
+            self.client.get("/api/books/browse/?sort=cena").status_code, 400
+        )
+        self.assertEqual(
+            self.client.get("/api/books/browse/?min_price=dużo").status_code, 400
+        )
+        self.assertEqual(
+            self.client.get("/api/books/browse/?category=x").status_code, 400
+        )
+        response = self.client.get(f"/api/books/browse/?category={10**23}")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"category": "Nieprawidłowa kategoria."})
+
+
+def make_png(name="cover.png", size=(900, 600), color="navy"):
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVE_WORKERS=0
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        view_cache.clear()
+
+    def upload(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(
+                "/api/upload/", {"file": make_png(name), "title": name}
+            )
+        return GalleryImage.objects.get(id=response.data["id"])
+
+    def test_upload_renders_deduplicated_derivatives(self):
+        first = self.upload("a.png")
+        second = self.upload("b.png")
+
+        sizes = first.image_derivatives["sizes"]
+        self.assertEqual(
+            (sizes["thumb"]["width"], sizes["thumb"]["height"]), (200, 133)
+        )
+        self.assertEqual((sizes["hero"]["width"], sizes["hero"]["height"]), (900, 600))
+        self.assertEqual(first.image_derivatives, second.image_derivatives)
+        for ext in ("webp", "jpeg"):
+            with Image.open(f"{self.media_root}/{sizes['card'][ext]}") as image:
+                self.assertEqual(image.size, (480, 320))
+
+        data = APIClient().get("/api/images/").data[0]
+        self.assertTrue(data["derivatives"]["thumb"]["webp"].endswith("thumb.webp"))
+        self.assertIn(" 480w", data["srcset"]["jpeg"])
+
+    def test_backfill_command(self):
+        image = GalleryImage.objects.create(title="Stare", image=make_png())
+        GalleryImage.objects.filter(pk=image.pk).update(image_derivatives={})
+        call_command("generate_image_derivatives", workers=0, stdout=io.StringIO())
+        image.refresh_from_db()
+        self.assertIn("hero", image.image_derivatives["sizes"])
+
+    def test_backfill_command_revalidates_book_lists(self):
+        view_cache.clear()
+        book = Book.objects.create(
+            user=make_user("owner"), title="Dune", image=make_png(), approved=True
+        )
+        Book.objects.filter(pk=book.pk).update(image_derivatives={})
+        client = APIClient()
+        etag = client.get("/api/books/")["ETag"]
+
+        call_command("generate_image_derivatives", workers=0, stdout=io.StringIO())
+        response = client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hero", response.data[0]["derivatives"])
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.upload_dir = f"{self.media_root}/parts"
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_DERIVATIVE_WORKERS=0,
+            CHUNKED_UPLOADS={"DIRECTORY": self.upload_dir, "MAX_PART_SIZE": 512},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = APIClient()
+        self.admin = make_user("admin", is_admin=True)
+        self.client.force_authenticate(self.admin)
+        self.content = make_png(size=(300, 200), color="teal").read()
+
+    def start(self, content=None):
+        content = self.content if content is None else content
+        response = self.client.post(
+            "/api/uploads/", {"filename": "okładka.png", "size": len(content)}
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["id"]
+
+    def put(self, upload_id, offset, data):
+        return self.client.put(
+            f"/api/uploads/{upload_id}/?offset={offset}",
+            data,
+            content_type="application/octet-stream",
+        )
+
+    def send(self, upload_id, content=None, start=0):
+        content = self.content if content is None else content
+        for offset in range(start, len(content), 512):
+            response = self.put(upload_id, offset, content[offset : offset + 512])
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def complete(self, upload_id, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/uploads/{upload_id}/complete/", data)
+
+    def blobs(self):
+        return sorted(
+            str(path.relative_to(self.media_root))
+            for path in Path(self.media_root, "blobs").rglob("*.*")
+        )
+
+    def test_resumes_after_interruption(self):
+        upload_id = self.start()
+        self.assertEqual(self.put(upload_id, 0, self.content[:512]).status_code, 200)
+        # A part lost on the way: the server tells where to continue.
+        response = self.put(upload_id, 1024, self.content[1024:1536])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["offset"], 512)
+        # The next part is served by a worker without the hash state.
+        uploads._hashers.clear()
+        self.assertEqual(
+            self.client.get(f"/api/uploads/{upload_id}/").data["offset"], 512
+        )
+        self.send(upload_id, start=512)
+
+        sha = hashlib.sha256(self.content).hexdigest()
+        response = self.complete(upload_id, title="Okładka", sha256=sha)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["sha256"], sha)
+        self.assertFalse(response.data["deduplicated"])
+        image = GalleryImage.objects.get(id=response.data["id"])
+        self.assertEqual(image.image.name, f"blobs/{sha[:2]}/{sha}.png")
+        self.assertIn("thumb", image.image_derivatives["sizes"])
+        with open(image.image.path, "rb") as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_identical_files_share_one_blob(self):
+        upload_id = self.start()
+        self.send(upload_id)
+        first = GalleryImage.objects.get(id=self.complete(upload_id).data["id"])
+
+        direct = self.client.post(
+            "/api/upload/",
+            {"file": SimpleUploadedFile("kopia.png", self.content), "title": "Kopia"},
+        )
+        copy = GalleryImage.objects.get(id=direct.data["id"])
+
+        book = Book.objects.create(
+            user=self.admin,
+            title="Lalka",
+            price=30,
+            category=Category.objects.create(name="Proza"),
+        )
+        upload_id = self.start()
+        self.send(upload_id)
+        response = self.complete(upload_id, book=book.id)
+        self.assertTrue(response.data["deduplicated"])
+        book.refresh_from_db()
+
+        self.assertEqual(copy.image.name, first.image.name)
+        self.assertEqual(book.image.name, first.image.name)
+        self.assertEqual(self.blobs(), [first.image.name])
+
+    def test_rejects_bad_uploads(self):
+        upload_id = self.start()
+        self.send(upload_id)
+        response = self.complete(upload_id, sha256="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(ChunkedUpload.objects.filter(pk=upload_id).exists())
+
+        text = b"not an image" * 10
+        upload_id = self.start(text)
+        self.send(upload_id, text)
+        self.assertEqual(self.complete(upload_id).status_code, 400)
+
+        response = self.put(self.start(), 0, self.content[:600])
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post("/api/uploads/", ["a.png", 1], format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            f"/api/uploads/{self.start()}/complete/", [], format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(make_user("customer"))
+        response = self.client.post("/api/uploads/", {"filename": "a.png", "size": 1})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(f"/api/uploads/{upload_id}/").status_code, 404)
+
+    def test_reaper_removes_abandoned_uploads(self):
+        abandoned = self.start()
+        self.put(abandoned, 0, self.content[:512])
+        active = self.start()
+        self.put(active, 0, self.content[:512])
+        ChunkedUpload.objects.filter(pk=abandoned).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+
+        call_command("reap_uploads", stdout=io.StringIO())
+        self.assertEqual(
+            list(ChunkedUpload.objects.values_list("pk", flat=True)), [active]
+        )
+        self.assertEqual(os.listdir(self.upload_dir), [f"{active}.part"])
+
+
+class CatalogFeedCommandTests(TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        make_user("supplier")
+        Category.objects.create(name="Proza")
+
+    def write(self, name, content):
+        path = f"{self.workdir}/{name}"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_import_upserts_by_external_id_and_exports(self):
+        feed = self.write(
+            "feed.csv",
+            "external_id,title,author,price,category,approved\n"
+            "A-1,Lalka,Bolesław Prus,39.90,Proza,true\n"
+            "A-2,Faraon,Bolesław Prus,bad,Proza,true\n"
+            "A-3,Emancypantki,Bolesław Prus,NaN,Proza,true\n"
+            "A-4,Placówka,Bolesław Prus,123456789.00,Proza,true\n"
+            ",Chłopi,Reymont,25,Nowa,\n",
+        )
+        stderr = io.StringIO()
+        call_command(
+            "import_books",
+            feed,
+            user="supplier",
+            create_categories=True,
+            stdout=io.StringIO(),
+            stderr=stderr,
+        )
+        self.assertEqual(Book.objects.count(), 2)
+        for price in ("'bad'", "'NaN'", "'123456789.00'"):
+            self.assertIn(f"invalid price {price}", stderr.getvalue())
+        self.assertEqual(Book.objects.get(title="Chłopi").category.name, "Nowa")
+
+        update = self.write(
+            "update.jsonl",
+            '{"external_id": "A-1", "title": "Lalka", "price": "45.00", "user": "supplier"}\n',
+        )
+        call_command("import_books", update, stdout=io.StringIO())
+        lalka = Book.objects.get(external_id="A-1")
+        self.assertEqual((lalka.price, lalka.author), (45, "Bolesław Prus"))
+        self.assertEqual(Book.objects.count(), 2)
+
+        export = f"{self.workdir}/export.jsonl"
+        call_command("export_books", export, stdout=io.StringIO())
+        with open(export, encoding="utf-8") as f:
+            rows = {row["title"]: row for row in map(json.loads, f)}
+        self.assertEqual(set(rows), {"Lalka", "Chłopi"})
+        self.assertEqual(rows["Lalka"]["category"], "Proza")
+        self.assertEqual(rows["Lalka"]["user"], "supplier")
+
+
+class SeedPerfDataTests(TestCase):
+    def seed(self, **options):
+        options = {"books": 60, "orders": 40, "comments": 80, "users": 5, **options}
+        call_command("seed_perf_data", categories=3, stdout=io.StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(Book.objects.order_by("id").values_list("title", "price", "approved")),
+            list(Order.objects.order_by("id").values_list("status", "total_price")),
+        )
+
+    def test_creates_consistent_data(self):
+        self.seed()
+        self.assertEqual(Book.objects.count(), 60)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 80)
+        self.assertTrue(Slider.objects.filter(is_default=True).exists())
+
+        sold = OrderItem.objects.exclude(order__status="cancelled").aggregate(
+            n=Sum("quantity")
+        )["n"]
+        self.assertEqual(BookStats.objects.aggregate(n=Sum("sales_count"))["n"], sold)
+        self.assertEqual(
+            Book.objects.aggregate(n=Sum("approved_comment_count"))["n"],
+            Comment.objects.filter(approved=True).count(),
+        )
+        self.assertEqual(
+            DailySalesRollup.objects.filter(all_categories=True).aggregate(
+                n=Sum("orders")
+            )["n"],
+            40,
+        )
+        oldest = Order.objects.order_by("created_at").first().created_at
+        self.assertLess(oldest, timezone.now() - timedelta(days=300))
+
+    def test_same_seed_same_data(self):
+        with transaction.atomic():
+            self.seed(seed=7)
+            first = self.snapshot()
+            transaction.set_rollback(True)
+        self.seed(seed=7)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_refuses_to_seed_twice(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+class EventBusTests(TransactionTestCase):
+    def setUp(self):
+        self.user = make_user("reader")
+        self.bus = EventBus()
+        self.addCleanup(self.bus.stop)
+
+    def publish(self, count):
+        for i in range(count):
+            self.bus.publish(self.user, "COMMENT_APPROVED", f"Event {i}")
+
+    @override_settings(EVENT_BUS={"BATCH_SIZE": 10, "FLUSH_INTERVAL": 0.05})
+    def test_writes_in_batches_off_the_request_thread(self):
+        self.publish(25)
+        self.assertTrue(self.bus.flush())
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 25)
+        stats = self.bus.stats()
+        self.assertEqual((stats["written"], stats["queue_depth"]), (25, 0))
+        self.assertGreaterEqual(stats["batches"], 3)
+
+    @override_settings(EVENT_BUS={"BLOCK_TIMEOUT": 0})
+    def test_counts_backpressure_and_drops(self):
+        # No writer thread, so the queue fills up.
+        self.bus._queue = queue.Queue(maxsize=2)
+        self.bus._ensure_started = lambda config: None
+        self.publish(3)
+        stats = self.bus.stats()
+        self.assertEqual(
+            (stats["queue_depth"], stats["backpressure"], stats["dropped"]), (2, 1, 1)
+        )
+
+    @override_settings(EVENT_BUS={"MODE": "sync"})
+    def test_sync_mode_writes_immediately(self):
+        self.publish(2)
+        self.assertEqual(Event.objects.filter(user=self.user).count(), 2)
+
+
+@override_settings(EVENT_BUS={"MODE": "sync"})
+class BulkModerationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = make_user("author")
+        self.moderator = make_user("moderator", is_moderator=True)
+        self.category = Category.objects.create(name="Fantasy")
+        self.category.moderators.add(self.moderator)
+        self.other = Category.objects.create(name="Historia")
+
+    def books(self, count, category):
+        return [
+            Book.objects.create(user=self.author, title=f"T{i}", category=category).id
+            for i in range(count)
+        ]
+
+    def moderate(self, url, ids, decision):
+        self.client.force_authenticate(self.moderator)
+        permission_cache.invalidate()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                url, {"ids": ids, "decision": decision}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(ctx)
+
+    def test_books_report_per_id_results(self):
+        mine = self.books(2, self.category)
+        foreign = self.books(1, self.other)
+        data, _ = self.moderate(
+            "/api/books/moderate/", mine + foreign + [999], "approve"
+        )
+
+        results = {r["id"]: r["result"] for r in data["results"]}
+        self.assertEqual(
+            results,
+            {
+                mine[0]: "approved",
+                mine[1]: "approved",
+                foreign[0]: "forbidden",
+                999: "not_found",
+            },
+        )
+        self.assertEqual(Book.objects.filter(approved=True).count(), 2)
+        self.assertEqual(Event.objects.filter(action="BOOK_APPROVED").count(), 2)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        _, small = self.moderate(
+            "/api/books/moderate/", self.books(2, self.category), "reject"
+        )
+        _, large = self.moderate(
+            "/api/books/moderate/", self.books(50, self.category), "reject"
+        )
+        self.assertEqual(large, small)
+
+    def test_comments(self):
+        book = Book.objects.create(
+            user=self.author, title="Dune", category=self.category
+        )
+        comments = [
+            Comment.objects.create(book=book, user=self.author, content=str(i)).id
+            for i in range(3)
+        ]
+        data, _ = self.moderate("/api/comments/moderate/", comments, "reject")
+        self.assertEqual(data["updated"], 3)
+        self.assertEqual(Comment.objects.filter(approved=False).count(), 3)
+        events = Event.objects.filter(action="COMMENT_REJECTED")
+        self.assertEqual(events.count(), 3)
+        self.assertEqual(
+            events[0].description, "Your comment on 'Dune' has been rejected."
+        )
+
+    def test_rejects_bad_payloads(self):
+        self.client.force_authenticate(self.moderator)
+        for payload in (
+            {"ids": [1], "decision": "maybe"},
+            {"ids": "1", "decision": "approve"},
+        ):
+            response = self.client.post("/api/books/moderate/", payload, format="json")
+            self.assertEqual(response.status_code, 400)
+        for url in ("/api/books/moderate/", "/api/comments/moderate/"):
+            response = self.client.post(url, [1, 2], format="json")
+            self.assertEqual(response.status_code, 400)
+
+
+class ModerationQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = make_user("author")
+        self.moderator = make_user("moderator", is_moderator=True)
+        self.category = Category.objects.create(name="Fantasy")
+        self.category.moderators.add(self.moderator)
+        other = Category.objects.create(name="Historia")
+
+        self.pending = [
+            Book.objects.create(user=self.author, title=f"P{i}", category=self.category)
+            for i in range(3)
+        ]
+        Book.objects.create(
+            user=self.author, title="Done", category=self.category, approved=True
+        )
+        Book.objects.create(user=self.author, title="Elsewhere", category=other)
+        self.comment = Comment.objects.create(
+            book=self.pending[0], user=self.author, content="?"
+        )
+
+    def get(self, params):
+        self.client.force_authenticate(self.moderator)
+        return self.client.get("/api/moderation/queue/", params)
+
+    def test_lists_moderated_pending_books_oldest_first(self):
+        response = self.get({"page_size": 2})
+        self.assertEqual(
+            [b["id"] for b in response.data["results"]],
+            [b.id for b in self.pending[:2]],
+        )
+        self.assertEqual(
+            response.data["counts"],
+            [
+                {
+                    "category": self.category.id,
+                    "name": "Fantasy",
+                    "books": 3,
+                    "comments": 1,
+                }
+            ],
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [b["id"] for b in response.data["results"]], [self.pending[2].id]
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_lists_comments(self):
+        response = self.get({"type": "comments"})
+        self.assertEqual(response.data["results"][0]["id"], self.comment.id)
+        self.assertEqual(response.data["results"][0]["book_title"], "P0")
+
+    def test_requires_moderator(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.get("/api/moderation/queue/")
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,247 @@
+"""
+Chunked, resumable image uploads and content-addressed image storage.
+
+A client creates an upload with the file's name and size, sends the bytes
+in parts at the offset the server reports (so an interrupted upload resumes
+where it stopped) and completes it. Parts are appended to a file under
+``CHUNKED_UPLOADS["DIRECTORY"]`` while a SHA-256 of the bytes so far is kept
+in memory between parts; a request served by another worker, or after a
+restart, re-hashes the part file instead.
+
+Completed uploads and files assigned to ``Book.image`` or
+``GalleryImage.image`` are stored once per content as
+``blobs/<sha[:2]>/<sha>.<ext>``, so identical images share one file.
+``reap_uploads`` deletes uploads left untouched for ``EXPIRE_AFTER``
+seconds.
+"""
+
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .cache import LRUCache
+from .models import ChunkedUpload
+
+DEFAULTS = {
+    "DIRECTORY": os.path.join(tempfile.gettempdir(), "bibliopolis-uploads"),
+    "MAX_SIZE": 50 * 1024 * 1024,
+    "MAX_PART_SIZE": 8 * 1024 * 1024,
+    "EXPIRE_AFTER": 24 * 60 * 60,
+}
+BLOBS_DIR = "blobs"
+READ_SIZE = 64 * 1024
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+# (offset, sha256) of uploads in progress, so a part only hashes its own bytes.
+_hashers = LRUCache(max_entries=256, timeout=None)
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "CHUNKED_UPLOADS", {})}
+
+
+def part_path(upload_id):
+    return Path(config()["DIRECTORY"]) / f"{upload_id}.part"
+
+
+def stream_sha256(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks(READ_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_extension(file, filename):
+    """``(extension, is_image)``; the extension follows the detected format."""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            image.verify()
+            extension = FORMAT_EXTENSIONS.get(image.format)
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return os.path.splitext(filename)[1].lower(), False
+    finally:
+        file.seek(0)
+    return extension or os.path.splitext(filename)[1].lower(), True
+
+
+class PartFile(File):
+    """A finished part file; file system storages move it instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def store_blob(storage, file, sha, extension):
+    """
+    Saves ``file`` as the blob of ``sha`` unless ``storage`` already has it.
+    Returns ``(name, created)``.
+    """
+    name = f"{BLOBS_DIR}/{sha[:2]}/{sha}{extension}"
+    if storage.exists(name):
+        return name, False
+    saved = storage.save(name, file)
+    if saved != name:
+        # Another request stored the same content first.
+        storage.delete(saved)
+        return name, False
+    return name, True
+
+
+def store_image_upload(field_file):
+    """Stores a newly assigned image field upload as a blob; returns its name."""
+    file = field_file.file
+    sha = stream_sha256(file)
+    extension, _ = image_extension(file, field_file.name)
+    return store_blob(field_file.storage, file, sha, extension)[0]
+
+
+def start_upload(user, filename, size):
+    limits = config()
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ValidationError({"size": "File size is required."})
+    if not 0 < size <= limits["MAX_SIZE"]:
+        raise ValidationError(
+            {"size": f"File size must be between 1 and {limits['MAX_SIZE']} bytes."}
+        )
+    if not filename:
+        raise ValidationError({"filename": "File name is required."})
+    return ChunkedUpload.objects.create(
+        user=user, filename=os.path.basename(str(filename))[:255], size=size
+    )
+
+
+def get_upload(upload_id, user, lock=False):
+    uploads = (
+        ChunkedUpload.objects.select_for_update() if lock else ChunkedUpload.objects
+    )
+    try:
+        return uploads.get(pk=upload_id, user=user)
+    except ChunkedUpload.DoesNotExist:
+        raise NotFound("Upload not found.")
+
+
+def upload_status(upload):
+    return {"id": upload.pk, "size": upload.size, "offset": upload.offset}
+
+
+def _hasher(upload):
+    cached = _hashers.get(upload.pk)
+    if cached is not None and cached[0] == upload.offset:
+        # A copy, so a part that fails halfway leaves the cached state intact.
+        return cached[1].copy()
+    digest = hashlib.sha256()
+    remaining = upload.offset
+    if remaining:
+        with open(part_path(upload.pk), "rb") as f:
+            while remaining:
+                chunk = f.read(min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+    return digest
+
+
+def write_part(upload, stream, length):
+    """
+    Appends ``length`` bytes read from ``stream`` at the upload's offset.
+    Call with the upload row locked.
+    """
+    offset = upload.offset
+    if not 0 < length <= config()["MAX_PART_SIZE"]:
+        raise ValidationError(
+            {"error": f"Parts must be 1 to {config()['MAX_PART_SIZE']} bytes."}
+        )
+    if offset + length > upload.size:
+        raise ValidationError({"error": "Part exceeds the declared file size."})
+
+    digest = _hasher(upload)
+    path = part_path(upload.pk)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    remaining = length
+    with open(path, "a+b") as f:
+        # Drops whatever an interrupted part left past the offset.
+        f.truncate(offset)
+        while remaining:
+            chunk = stream.read(min(READ_SIZE, remaining))
+            if not chunk:
+                break
+            f.write(chunk)
+            digest.update(chunk)
+            remaining -= len(chunk)
+    if remaining:
+        raise ValidationError({"error": "Part is shorter than its Content-Length."})
+
+    upload.offset += length
+    upload.save(update_fields=["offset", "updated_at"])
+    _hashers.set(upload.pk, (upload.offset, digest))
+    return upload
+
+
+def complete_upload(upload, storage, expected_sha256=""):
+    """
+    Moves a fully received upload into blob storage and deletes it. Returns
+    ``(name, sha256, deduplicated)``.
+    """
+    if upload.offset != upload.size:
+        raise ValidationError(
+            {"error": f"Received {upload.offset} of {upload.size} bytes."}
+        )
+    sha = _hasher(upload).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha:
+        raise ValidationError({"sha256": "Checksum mismatch."})
+
+    with PartFile(open(part_path(upload.pk), "rb")) as file:
+        extension, is_image = image_extension(file, upload.filename)
+        if not is_image:
+            raise ValidationError({"error": "The file is not a supported image."})
+        name, created = store_blob(storage, file, sha, extension)
+    discard_upload(upload)
+    return name, sha, not created
+
+
+def _remove_part(upload_id):
+    _hashers.delete(upload_id)
+    part_path(upload_id).unlink(missing_ok=True)
+
+
+def discard_upload(upload):
+    upload_id = upload.pk
+    upload.delete()
+    _remove_part(upload_id)
+
+
+def reap_uploads(expire_after=None):
+    """
+    Deletes uploads untouched for ``expire_after`` seconds (default
+    ``EXPIRE_AFTER``) and part files no upload refers to. Returns the number
+    of uploads deleted.
+    """
+    if expire_after is None:
+        expire_after = config()["EXPIRE_AFTER"]
+    cutoff = timezone.now() - timedelta(seconds=expire_after)
+    expired = ChunkedUpload.objects.filter(updated_at__lt=cutoff)
+    upload_ids = list(expired.values_list("pk", flat=True))
+    expired.filter(pk__in=upload_ids).delete()
+    for upload_id in upload_ids:
+        _remove_part(upload_id)
+
+    # Part files of uploads deleted without reaching discard_upload.
+    directory = Path(config()["DIRECTORY"])
+    if directory.is_dir():
+        live = {str(pk) for pk in ChunkedUpload.objects.values_list("pk", flat=True)}
+        for path in directory.glob("*.part"):
+            if path.stem not in live and path.stat().st_mtime < cutoff.timestamp():
+                path.unlink(missing_ok=True)
+    return len(upload_ids)
@@ -1,22 +1,38 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
+    BookBrowseView,
     BookDetailAPIView,
     BookListAPIView,
+    BookSearchAPIView,
+    TopBooksView,
     CategoryListAPIView,
+    CacheStatsView,
+    ModerationQueueView,
+    EventBusStatsView,
+    MetricsView,
     ThemeView,
     ThemeManagementView,
     ThemeListView,
     SelectedThemeView,
     GalleryImageUploadView,
-    UpdateSliderOrderView,
+    UploadListView,
+    UploadDetailView,
+    CompleteUploadView,
     SliderListView,
     SliderDetailView,
+    SliderImagesView,
+    DefaultSliderView,
     ImageListView,
     UserProfileView,
     CreateOrderView,
+    BatchCreateOrderView,
     OrderDetailView,
     UpdateOrderStatusView,
     OrderListView,
+    OrderExportView,
+    EventExportView,
+    SalesReportView,
     update_user_profile,
     add_image_to_slider,
     set_default_slider,
@@ -28,23 +44,57 @@ from .views import (
     create_book,
     approve_book,
     reject_book,
+    moderate_books,
+    moderate_comments,
 )
 
+
+def catalog_view(sync_view, async_name):
+    """The async_views counterpart of a hot read endpoint under ASYNC_CATALOG."""
+    if getattr(settings, "ASYNC_CATALOG", False):
+        from . import async_views
+
+        return getattr(async_views, async_name)
+    return sync_view
+
+
 urlpatterns = [
     path("user_status/", user_status, name="user_status"),
     path("profile/", UserProfileView.as_view(), name="user_profile"),
     path("user/update/", update_user_profile, name="update_user_profile"),
-    path("books/", BookListAPIView.as_view(), name="book-list"),
-    path("books/<int:pk>/", BookDetailAPIView.as_view(), name="book-detail"),
+    path(
+        "books/", catalog_view(BookListAPIView.as_view(), "book_list"), name="book-list"
+    ),
+    path("books/browse/", BookBrowseView.as_view(), name="book-browse"),
+    path("books/top/", TopBooksView.as_view(), name="book-top"),
+    path("books/search/", BookSearchAPIView.as_view(), name="book-search"),
+    path(
+        "books/<int:pk>/",
+        catalog_view(BookDetailAPIView.as_view(), "book_detail"),
+        name="book-detail",
+    ),
     path("books/create/", create_book, name="create_book"),
     path("books/<int:book_id>/approve/", approve_book, name="approve_book"),
     path("books/<int:book_id>/reject/", reject_book, name="reject_book"),
-    path("categories/", CategoryListAPIView.as_view(), name="category-list"),
-    path("books/<int:book_id>/comments/", product_comments, name="product_comments"),
+    path("books/moderate/", moderate_books, name="moderate_books"),
+    path("comments/moderate/", moderate_comments, name="moderate_comments"),
+    path("moderation/queue/", ModerationQueueView.as_view(), name="moderation-queue"),
+    path(
+        "categories/",
+        catalog_view(CategoryListAPIView.as_view(), "category_list"),
+        name="category-list",
+    ),
+    path(
+        "books/<int:book_id>/comments/",
+        catalog_view(product_comments, "product_comments"),
+        name="product_comments",
+    ),
     path("comments/<int:comment_id>/approve/", approve_comment, name="approve_comment"),
     path("comments/<int:comment_id>/reject/", reject_comment, name="reject_comment"),
     path("events/", get_user_events, name="get_user_events"),
-    path("theme/default/", ThemeView.as_view(), name="theme"),
+    path("events/export/", EventExportView.as_view(), name="event-export"),
+    path("events/bus/stats/", EventBusStatsView.as_view(), name="event-bus-stats"),
+    path("theme/default/", catalog_view(ThemeView.as_view(), "theme"), name="theme"),
     path("themes/", ThemeListView.as_view(), name="theme-list"),
     path("themes/manage/", ThemeManagementView.as_view(), name="manage_themes"),
     path(
@@ -54,19 +104,37 @@ urlpatterns = [
     ),
     path("themes/select/", SelectedThemeView.as_view(), name="select-theme"),
     path("upload/", GalleryImageUploadView.as_view(), name="gallery_image_upload"),
-    path("images/", ImageListView.as_view(), name="image-list"),
+    path("uploads/", UploadListView.as_view(), name="upload-list"),
+    path("uploads/<uuid:upload_id>/", UploadDetailView.as_view(), name="upload-detail"),
     path(
-        "update-slider-order/",
-        UpdateSliderOrderView.as_view(),
-        name="update_slider_order",
+        "uploads/<uuid:upload_id>/complete/",
+        CompleteUploadView.as_view(),
+        name="upload-complete",
     ),
+    path("images/", ImageListView.as_view(), name="image-list"),
     path("sliders/", SliderListView.as_view(), name="slider-list"),
+    path(
+        "sliders/default/",
+        catalog_view(DefaultSliderView.as_view(), "default_slider"),
+        name="slider-default",
+    ),
     path("sliders/<int:slider_id>/", SliderDetailView.as_view(), name="slider-detail"),
+    path(
+        "sliders/<int:slider_id>/images/",
+        SliderImagesView.as_view(),
+        name="slider-images",
+    ),
+    path("sliders/<int:slider_id>/update_order/", SliderImagesView.as_view()),
     path("sliders/<int:slider_id>/add_image/", add_image_to_slider),
     path("sliders/<int:slider_id>/set_default/", set_default_slider),
+    path("cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("_metrics", MetricsView.as_view(), name="metrics"),
     path("order/", CreateOrderView.as_view(), name="create_order"),
     path("orders/", OrderListView.as_view(), name="order-list"),
+    path("orders/export/", OrderExportView.as_view(), name="order-export"),
+    path("orders/batch/", BatchCreateOrderView.as_view(), name="order-batch"),
     path("orders/<int:order_id>/", OrderDetailView.as_view(), name="order-detail"),
+    path("reports/sales/", SalesReportView.as_view(), name="sales-report"),
     path(
         "orders/<int:pk>/update-status/",
         UpdateOrderStatusView.as_view(),
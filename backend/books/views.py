@@ -1,5 +1,12 @@
-from django.http import JsonResponse
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, F
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -9,17 +16,79 @@ from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth.decorators import login_required
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import serializers, views, status
-from decimal import Decimal
 from django.contrib.auth.models import User
 from .serializers import (
     BookSerializer,
+    BookStatsSerializer,
     GalleryImageSerializer,
     SliderSerializer,
     CategorySerializer,
     OrderSerializer,
+    OrderSummarySerializer,
     CommentSerializer,
+    ModerationCommentSerializer,
     EventSerializer,
 )
+from .browse import (
+    BROWSE_SORTS,
+    book_facets,
+    filter_books,
+    filter_signature,
+    parse_browse_filters,
+)
+from .cache import cached_view, conditional_view, view_cache
+from .events import event_bus
+from .fieldsets import dump, narrow_queryset
+from .orders import (
+    OrderError,
+    filter_orders,
+    order_items_prefetch,
+    place_order,
+    place_orders,
+    prefetch_order_items,
+    set_order_status,
+)
+from .permissions import permissions_for
+from .comments import refresh_comment_counts
+from .pagination import (
+    BookBrowsePagination,
+    BookCursorPagination,
+    BookSearchPagination,
+    CommentCursorPagination,
+    ModerationQueuePagination,
+    OrderCursorPagination,
+)
+from .exports import (
+    EVENT_EXPORT_FIELDS,
+    EXPORT_FORMATS,
+    ORDER_EXPORT_FIELDS,
+    ORDER_ITEM_EXPORT_FIELDS,
+    export_response,
+    filter_events,
+    iter_values,
+)
+from .feeds import iter_rows
+from .images import schedule_derivatives
+from .metrics import registry as metrics_registry
+from .reports import BUCKETS, GROUPS, REPORT_FIELDS, sales_report
+from .search import get_search_backend
+from .sliders import (
+    append_image,
+    default_slider_snapshot,
+    move_image,
+    ordered_images,
+    set_default,
+    set_slider_images,
+)
+from .stats import TOP_ORDERINGS
+from .uploads import (
+    complete_upload,
+    discard_upload,
+    get_upload,
+    start_upload,
+    upload_status,
+    write_part,
+)
 from .models import (
     Book,
     Theme,
@@ -31,6 +100,7 @@ from .models import (
     OrderItem,
     Comment,
     Event,
+    BookStats,
 )
 
 
@@ -41,7 +111,6 @@ def create_book(request):
         serializer = BookSerializer(data=request.data)
 
         if serializer.is_valid():
-            print("Image received:", request.data.get("image"))
             serializer.save(user=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -56,17 +125,13 @@ def approve_book(request, book_id):
     except Book.DoesNotExist:
         return Response({"detail": "Book not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    if not (request.user.userprofile.is_admin or request.user.userprofile.is_moderator):
+    if not permissions_for(request).can_moderate_category(book.category_id):
         return Response({"error": "Forbidden"}, status=403)
 
-    if request.user.userprofile.is_moderator:
-        if not book.category.moderators.filter(id=request.user.id).exists():
-            return Response({"error": "Forbidden"}, status=403)
-
     book.approved = True
     book.save()
 
-    Event.objects.create(
+    event_bus.publish(
         user=book.user,
         action="BOOK_APPROVED",
         description=f"Your book '{book.title}' has been approved.",
@@ -82,17 +147,13 @@ def reject_book(request, book_id):
     except Book.DoesNotExist:
         return Response({"detail": "Book not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    if not (request.user.userprofile.is_admin or request.user.userprofile.is_moderator):
+    if not permissions_for(request).can_moderate_category(book.category_id):
         return Response({"error": "Forbidden"}, status=403)
 
-    if request.user.userprofile.is_moderator:
-        if not book.category.moderators.filter(id=request.user.id).exists():
-            return Response({"error": "Forbidden"}, status=403)
-
     book.approved = False
     book.save()
 
-    Event.objects.create(
+    event_bus.publish(
         user=book.user,
         action="BOOK_REJECTED",
         description=f"Your book '{book.title}' has been rejected.",
@@ -100,6 +161,207 @@ def reject_book(request, book_id):
     return Response({"success": "Book rejected"}, status=200)
 
 
+MODERATION_DECISIONS = {"approve": True, "reject": False}
+MAX_MODERATION_BATCH = 5000
+
+
+def _moderation_request(request):
+    """Returns ``(ids, approved, allowed_category_ids)`` or an error Response."""
+    permissions = permissions_for(request)
+    if not permissions.is_staff:
+        return Response({"error": "Forbidden"}, status=403)
+
+    data = request.data if isinstance(request.data, dict) else {}
+    ids = data.get("ids")
+    decision = data.get("decision")
+    if decision not in MODERATION_DECISIONS:
+        return Response(
+            {"error": "Decision must be 'approve' or 'reject'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        if not isinstance(ids, list):
+            raise TypeError
+        ids = list(dict.fromkeys(int(i) for i in ids))
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "A list of ids is required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not ids or len(ids) > MAX_MODERATION_BATCH:
+        return Response(
+            {"error": f"Between 1 and {MAX_MODERATION_BATCH} ids are required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    allowed = None
+    if not permissions.is_admin:
+        allowed = permissions.moderated_category_ids
+    return ids, MODERATION_DECISIONS[decision], allowed
+
+
+def _apply_moderation(model, ids, rows, approved, allowed, make_event, on_update=None):
+    results = []
+    accepted = []
+    for item_id in ids:
+        row = rows.get(item_id)
+        if row is None:
+            results.append({"id": item_id, "result": "not_found"})
+        elif allowed is not None and row["category_id"] not in allowed:
+            results.append({"id": item_id, "result": "forbidden"})
+        else:
+            accepted.append(row)
+            results.append(
+                {"id": item_id, "result": "approved" if approved else "rejected"}
+            )
+
+    if accepted:
+        with transaction.atomic():
+            model.objects.filter(id__in=[row["id"] for row in accepted]).update(
+                approved=approved
+            )
+            event_bus.publish_many([make_event(row) for row in accepted])
+            if on_update:
+                on_update(accepted)
+    return Response({"updated": len(accepted), "results": results})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def moderate_books(request):
+    parsed = _moderation_request(request)
+    if isinstance(parsed, Response):
+        return parsed
+    ids, approved, allowed = parsed
+
+    rows = {
+        row["id"]: row
+        for row in Book.objects.filter(id__in=ids).values(
+            "id", "title", "user_id", "category_id"
+        )
+    }
+    action, verb = (
+        ("BOOK_APPROVED", "approved") if approved else ("BOOK_REJECTED", "rejected")
+    )
+    return _apply_moderation(
+        Book,
+        ids,
+        rows,
+        approved,
+        allowed,
+        lambda row: Event(
+            user_id=row["user_id"],
+            action=action,
+            description=f"Your book '{row['title']}' has been {verb}.",
+        ),
+        on_update=lambda accepted: view_cache.bump("books"),
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def moderate_comments(request):
+    parsed = _moderation_request(request)
+    if isinstance(parsed, Response):
+        return parsed
+    ids, approved, allowed = parsed
+
+    rows = {
+        row["id"]: row
+        for row in Comment.objects.filter(id__in=ids).values(
+            "id",
+            "user_id",
+            "book_id",
+            title=F("book__title"),
+            category_id=F("book__category_id"),
+        )
+    }
+    action, verb = (
+        ("COMMENT_APPROVED", "approved")
+        if approved
+        else ("COMMENT_REJECTED", "rejected")
+    )
+    return _apply_moderation(
+        Comment,
+        ids,
+        rows,
+        approved,
+        allowed,
+        lambda row: Event(
+            user_id=row["user_id"],
+            action=action,
+            description=f"Your comment on '{row['title']}' has been {verb}.",
+        ),
+        on_update=lambda accepted: refresh_comment_counts(
+            row["book_id"] for row in accepted
+        ),
+    )
+
+
+class ModerationQueueView(APIView):
+    permission_classes = [IsAuthenticated]
+    pagination_class = ModerationQueuePagination
+
+    def get(self, request):
+        permissions = permissions_for(request)
+        if not permissions.is_staff:
+            return Response({"error": "Forbidden"}, status=403)
+
+        books = Book.objects.filter(approved__isnull=True)
+        comments = Comment.objects.filter(approved__isnull=True)
+        if not permissions.is_admin:
+            moderated = permissions.moderated_category_ids
+            books = books.filter(category_id__in=moderated)
+            comments = comments.filter(book__category_id__in=moderated)
+
+        kind = request.query_params.get("type", "books")
+        if kind == "books":
+            queryset = books.select_related("category").prefetch_related(
+                "category__moderators"
+            )
+            serializer_class = BookSerializer
+        elif kind == "comments":
+            queryset = comments.select_related("user", "book")
+            serializer_class = ModerationCommentSerializer
+        else:
+            return Response(
+                {"error": "type must be 'books' or 'comments'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(
+            serializer.data, counts=self.category_counts(books, comments)
+        )
+
+    @staticmethod
+    def category_counts(books, comments):
+        counts = {}
+        for kind, queryset, category in (
+            ("books", books, "category"),
+            ("comments", comments, "book__category"),
+        ):
+            rows = (
+                queryset.order_by()
+                .values(group=F(f"{category}_id"), group_name=F(f"{category}__name"))
+                .annotate(total=Count("id"))
+            )
+            for row in rows:
+                entry = counts.setdefault(
+                    row["group"],
+                    {
+                        "category": row["group"],
+                        "name": row["group_name"],
+                        "books": 0,
+                        "comments": 0,
+                    },
+                )
+                entry[kind] = row["total"]
+        return list(counts.values())
+
+
 class BookDetailAPIView(APIView):
     def get(self, request, pk):
         try:
@@ -116,14 +378,7 @@ class BookDetailAPIView(APIView):
         except Book.DoesNotExist:
             raise NotFound("Book not found")
 
-        user = request.user
-        if not (
-            user.userprofile.is_admin
-            or (
-                user.userprofile.is_moderator
-                and book.category.moderators.filter(id=user.id).exists()
-            )
-        ):
+        if not permissions_for(request).can_moderate_category(book.category_id):
             raise PermissionDenied("You do not have permission to edit this book.")
 
         description = request.data.get("description")
@@ -138,64 +393,165 @@ class BookDetailAPIView(APIView):
 
 
 class BookListAPIView(APIView):
+    pagination_class = BookCursorPagination
+
+    @conditional_view("books", "categories")
     def get(self, request):
-        category_id = request.query_params.get("category")
+        paginator = self.pagination_class()
+        serializer = BookSerializer(context={"request": request})
+        books = narrow_queryset(
+            Book.objects.filter(permissions_for(request).book_visibility_q())
+            .select_related("category")
+            .prefetch_related("category__moderators"),
+            serializer,
+            keep=paginator.cursor_fields,
+        )
 
+        category_id = request.query_params.get("category")
         if category_id:
-            books = Book.objects.filter(category_id=category_id, approved=True)
-            if request.user.is_authenticated:
-                user_books = Book.objects.filter(
-                    category_id=category_id, user=request.user
-                )
-                books = books | user_books
-                if request.user.userprofile.is_admin:
-                    books = Book.objects.filter(category_id=category_id)
-                elif request.user.userprofile.is_moderator:
-                    if Category.objects.filter(
-                        id=category_id, moderators=request.user.id
-                    ).exists():
-                        books = Book.objects.filter(category_id=category_id)
+            books = books.filter(category_id=category_id)
 
-        else:
-            books = Book.objects.filter(approved=True)
-            if request.user.is_authenticated:
-                user_books = Book.objects.filter(user=request.user)
-                books = books | user_books
-                if request.user.userprofile.is_admin:
-                    books = Book.objects.all()
-                elif request.user.userprofile.is_moderator:
-                    mod_categories = Category.objects.filter(
-                        moderators=request.user.id
-                    ).values_list("id", flat=True)
-                    mod_books = Book.objects.filter(category_id__in=mod_categories)
-                    books = books | mod_books
-
-        serializer = BookSerializer(books, many=True, context={"request": request})
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(books, request, view=self)
+            return paginator.get_paginated_response(dump(serializer, page))
+
+        return Response(dump(serializer, books))
+
+
+class BookBrowseView(APIView):
+    pagination_class = BookBrowsePagination
+
+    @conditional_view("books", "categories")
+    def get(self, request):
+        sort = request.query_params.get("sort", "newest")
+        if sort not in BROWSE_SORTS:
+            return Response(
+                {"error": f"Nieznane sortowanie: {sort}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        filters = parse_browse_filters(request.query_params)
+        context = permissions_for(request)
+        visible = Book.objects.filter(context.book_visibility_q())
+
+        facets = view_cache.memoize(
+            "book_facets",
+            ("books", "categories"),
+            f"{filter_signature(filters)}|{context.visibility_key()}",
+            lambda: book_facets(visible, filters),
+        )
+
+        serializer = BookSerializer(context={"request": request})
+        books = narrow_queryset(
+            filter_books(visible, filters)
+            .select_related("category")
+            .prefetch_related("category__moderators")
+            .order_by(*BROWSE_SORTS[sort]),
+            serializer,
+        )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(books, request, view=self)
+        response = paginator.get_paginated_response(dump(serializer, page))
+        response.data["facets"] = facets
+        return response
+
+
+class TopBooksView(APIView):
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request):
+        by = request.query_params.get("by", "sales")
+        if by not in TOP_ORDERINGS:
+            return Response(
+                {"error": f"by must be one of: {', '.join(TOP_ORDERINGS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+            category = request.query_params.get("category")
+            category = int(category) if category else None
+        except ValueError:
+            return Response(
+                {"error": "limit and category must be integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, self.max_limit))
+
+        stats = BookStats.objects.filter(book__approved=True)
+        if category is not None:
+            stats = stats.filter(category_id=category)
+        stats = (
+            stats.select_related("book__category")
+            .prefetch_related("book__category__moderators")
+            .order_by(TOP_ORDERINGS[by], "book_id")[:limit]
+        )
+        serializer = BookStatsSerializer(stats, many=True, context={"request": request})
         return Response(serializer.data)
 
 
+class BookSearchAPIView(APIView):
+    pagination_class = BookSearchPagination
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"error": "Query parameter 'q' is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        limit = getattr(settings, "BOOK_SEARCH_MAX_RESULTS", 1000)
+        ranked_ids = get_search_backend().search(query, limit)
+        visible = set(
+            Book.objects.filter(
+                permissions_for(request).book_visibility_q(), id__in=ranked_ids
+            ).values_list("id", flat=True)
+        )
+        ranked_ids = [book_id for book_id in ranked_ids if book_id in visible]
+
+        paginator = self.pagination_class()
+        page_ids = paginator.paginate_queryset(ranked_ids, request, view=self)
+        serializer = BookSerializer(context={"request": request})
+        books = narrow_queryset(
+            Book.objects.select_related("category").prefetch_related(
+                "category__moderators"
+            ),
+            serializer,
+        ).in_bulk(page_ids)
+        return paginator.get_paginated_response(
+            dump(
+                serializer, [books[book_id] for book_id in page_ids if book_id in books]
+            )
+        )
+
+
 class CategoryListAPIView(APIView):
+    @cached_view("categories")
     def get(self, request):
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
+        serializer = CategorySerializer(context={"request": request})
+        categories = narrow_queryset(
+            Category.objects.prefetch_related("moderators"), serializer
+        )
+        return Response(dump(serializer, categories))
 
 
 @api_view(["GET", "POST"])
 def product_comments(request, book_id):
     if request.method == "GET":
         book = get_object_or_404(Book, id=book_id)
-        comments = Comment.objects.filter(book_id=book_id, approved=True)
-
-        if request.user.is_authenticated:
-            user_comments = Comment.objects.filter(book_id=book_id, user=request.user)
-            comments = comments | user_comments
-            if request.user.userprofile.is_admin:
-                comments = Comment.objects.filter(book_id=book_id)
-            elif request.user.userprofile.is_moderator:
-                if book.category.moderators.filter(id=request.user.id).exists():
-                    comments = Comment.objects.filter(book_id=book_id)
+        comments = Comment.objects.filter(
+            permissions_for(request).comment_visibility_q(book), book_id=book_id
+        ).select_related("user")
+
+        paginator = CommentCursorPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(comments, request)
+            serializer = CommentSerializer(page, many=True)
+            return paginator.get_paginated_response(
+                serializer.data, count=book.approved_comment_count
+            )
 
+        comments = comments.order_by(*paginator.ordering)
         serializer = CommentSerializer(comments, many=True)
         return Response(serializer.data)
 
@@ -216,25 +572,18 @@ def product_comments(request, book_id):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def approve_comment(request, comment_id):
-    if not (request.user.userprofile.is_admin or request.user.userprofile.is_moderator):
+    permissions = permissions_for(request)
+    if not permissions.is_staff:
         return Response({"error": "Forbidden"}, status=403)
 
-    comment = get_object_or_404(Comment, id=comment_id)
-    book_category = comment.book.category
-
-    if request.user.userprofile.is_admin:
-        comment.approved = True
-        comment.save()
-    elif request.user.userprofile.is_moderator:
-        if not book_category.moderators.filter(id=request.user.id).exists():
-            return Response({"error": "Forbidden"}, status=403)
-
-        comment.approved = True
-        comment.save()
-    else:
+    comment = get_object_or_404(Comment.objects.select_related("book"), id=comment_id)
+    if not permissions.can_moderate_category(comment.book.category_id):
         return Response({"error": "Forbidden"}, status=403)
 
-    Event.objects.create(
+    comment.approved = True
+    comment.save()
+
+    event_bus.publish(
         user=comment.user,
         action="COMMENT_APPROVED",
         description=f"Your comment on '{comment.book.title}' has been approved.",
@@ -245,25 +594,18 @@ def approve_comment(request, comment_id):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def reject_comment(request, comment_id):
-    if not (request.user.userprofile.is_admin or request.user.userprofile.is_moderator):
+    permissions = permissions_for(request)
+    if not permissions.is_staff:
         return Response({"error": "Forbidden"}, status=403)
 
-    comment = get_object_or_404(Comment, id=comment_id)
-    book_category = comment.book.category
-
-    if request.user.userprofile.is_admin:
-        comment.approved = False
-        comment.save()
-    elif request.user.userprofile.is_moderator:
-        if not book_category.moderators.filter(id=request.user.id).exists():
-            return Response({"error": "Forbidden"}, status=403)
-
-        comment.approved = False
-        comment.save()
-    else:
+    comment = get_object_or_404(Comment.objects.select_related("book"), id=comment_id)
+    if not permissions.can_moderate_category(comment.book.category_id):
         return Response({"error": "Forbidden"}, status=403)
 
-    Event.objects.create(
+    comment.approved = False
+    comment.save()
+
+    event_bus.publish(
         user=comment.user,
         action="COMMENT_REJECTED",
         description=f"Your comment on '{comment.book.title}' has been rejected.",
@@ -288,11 +630,11 @@ def user_status(request):
     if not user.is_authenticated:
         return Response({"is_admin": False, "is_moderator": False})
 
-    profile = user.userprofile
+    permissions = permissions_for(request)
     return Response(
         {
-            "is_admin": profile.is_admin,
-            "is_moderator": profile.is_moderator,
+            "is_admin": permissions.is_admin,
+            "is_moderator": permissions.is_moderator,
         }
     )
 
@@ -332,7 +674,6 @@ def update_user_profile(request):
         city = request.data.get("city")
         postal_code = request.data.get("postal_code")
         phone_number = request.data.get("phone_number")
-        print(request.data)
 
         if first_name:
             user.first_name = first_name
@@ -357,9 +698,39 @@ def update_user_profile(request):
         )
 
 
+class CacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not permissions_for(request).is_admin:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(view_cache.stats())
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not permissions_for(request).is_admin:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        return HttpResponse(
+            metrics_registry.render(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class EventBusStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not permissions_for(request).is_admin:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(event_bus.stats())
+
+
 class ThemeManagementView(APIView):
     def post(self, request):
-        if not request.user.userprofile.is_admin:
+        if not permissions_for(request).is_admin:
             return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
         name = request.data.get("name")
@@ -385,7 +756,7 @@ class ThemeManagementView(APIView):
         )
 
     def delete(self, request, theme_id=None):
-        if not request.user.userprofile.is_admin:
+        if not permissions_for(request).is_admin:
             return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
         if not theme_id:
@@ -411,6 +782,7 @@ class ThemeManagementView(APIView):
 
 
 class ThemeView(APIView):
+    @cached_view("themes")
     def get(self, request):
         theme = Theme.objects.first()
         if theme:
@@ -426,6 +798,7 @@ class ThemeView(APIView):
 
 
 class ThemeListView(APIView):
+    @cached_view("themes")
     def get(self, request):
         themes = Theme.objects.all()
         return Response(
@@ -529,6 +902,113 @@ class GalleryImageUploadView(APIView):
         return Response({"id": image.id, "title": image.title}, status=201)
 
 
+class UploadListView(APIView):
+    """Starts a chunked upload: ``{"filename", "size"}``."""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not permissions_for(request).is_staff:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "A JSON object is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        upload = start_upload(
+            request.user, request.data.get("filename"), request.data.get("size")
+        )
+        return Response(upload_status(upload), status=status.HTTP_201_CREATED)
+
+
+class UploadDetailView(APIView):
+    """
+    GET reports how many bytes arrived, PUT appends the raw request body at
+    ``?offset=`` and DELETE abandons the upload.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        return Response(upload_status(get_upload(upload_id, request.user)))
+
+    def put(self, request, upload_id):
+        try:
+            offset = int(request.query_params["offset"])
+        except (KeyError, ValueError):
+            return Response(
+                {"error": "Offset is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+        with transaction.atomic():
+            upload = get_upload(upload_id, request.user, lock=True)
+            if offset != upload.offset:
+                # A part was lost or repeated; the client resumes from here.
+                return Response(
+                    {"error": "Upload offset mismatch.", **upload_status(upload)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            # Read straight from the request stream, never buffered whole.
+            write_part(upload, request, length)
+        return Response(upload_status(upload))
+
+    def delete(self, request, upload_id):
+        discard_upload(get_upload(upload_id, request.user))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CompleteUploadView(APIView):
+    """
+    Finishes a chunked upload as a new gallery image (``title``,
+    ``description``) or as the cover of ``book``. ``sha256``, when given,
+    must match the received bytes.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"error": "A JSON object is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        permissions = permissions_for(request)
+        book = None
+        if request.data.get("book") is not None:
+            try:
+                book = Book.objects.get(pk=request.data["book"])
+            except (Book.DoesNotExist, ValueError, TypeError):
+                raise NotFound("Book not found")
+            allowed = permissions.can_moderate_category(book.category_id)
+        else:
+            allowed = permissions.is_admin
+        if not allowed:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        target = book or GalleryImage(
+            title=request.data.get("title", ""),
+            description=request.data.get("description", ""),
+        )
+        with transaction.atomic():
+            upload = get_upload(upload_id, request.user, lock=True)
+            name, sha, deduplicated = complete_upload(
+                upload, target.image.storage, request.data.get("sha256", "")
+            )
+            target.image = name
+            target.image_derivatives = {}
+            target.save()
+            schedule_derivatives(target)
+        return Response(
+            {
+                "id": target.id,
+                "image": request.build_absolute_uri(target.image.url),
+                "sha256": sha,
+                "deduplicated": deduplicated,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
 class AddImageView(APIView):
     def post(self, request):
         serializer = GalleryImageSerializer(data=request.data)
@@ -539,30 +1019,21 @@ class AddImageView(APIView):
 
 
 class ImageListView(APIView):
+    @cached_view("images")
     def get(self, request):
         images = GalleryImage.objects.all()
         serializer = GalleryImageSerializer(images, many=True)
         return Response(serializer.data)
 
 
-class UpdateSliderOrderView(APIView):
-    def patch(self, request):
-        data = request.data
-        for item in data:
-            try:
-                image = GalleryImage.objects.get(id=item["id"])
-                image.slider_order = item["slider_order"]
-                image.save()
-            except GalleryImage.DoesNotExist:
-                return Response({"error": "Image not found"}, status=404)
-        return Response({"status": "Slider order updated"})
-
-
 class SliderListView(views.APIView):
+    @cached_view("sliders")
     def get(self, request):
-        sliders = Slider.objects.all()
-        serializer = SliderSerializer(sliders, many=True, context={"request": request})
-        return Response(serializer.data)
+        serializer = SliderSerializer(context={"request": request})
+        sliders = narrow_queryset(
+            Slider.objects.prefetch_related(ordered_images()), serializer
+        )
+        return Response(dump(serializer, sliders))
 
     def post(self, request):
         serializer = SliderSerializer(data=request.data)
@@ -574,10 +1045,15 @@ class SliderListView(views.APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class DefaultSliderView(views.APIView):
+    def get(self, request):
+        return default_slider_snapshot.respond(request)
+
+
 class SliderDetailView(views.APIView):
     def get(self, request, slider_id):
         try:
-            slider = Slider.objects.get(id=slider_id)
+            slider = Slider.objects.prefetch_related(ordered_images()).get(id=slider_id)
             serializer = SliderSerializer(slider, context={"request": request})
             return Response(serializer.data)
         except Slider.DoesNotExist:
@@ -587,7 +1063,7 @@ class SliderDetailView(views.APIView):
 
     def patch(self, request, slider_id):
         try:
-            slider = Slider.objects.get(id=slider_id)
+            slider = Slider.objects.prefetch_related(ordered_images()).get(id=slider_id)
             serializer = SliderSerializer(
                 slider, data=request.data, partial=True, context={"request": request}
             )
@@ -651,17 +1127,69 @@ def add_image_to_slider(request, slider_id):
     except GalleryImage.DoesNotExist:
         return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Dodajemy zdjęcie do slajdera
-    slider.images.add(image)
+    # Dodajemy zdjęcie na koniec slajdera
+    append_image(slider, image)
     return Response({"message": "Image added to slider"}, status=status.HTTP_200_OK)
 
 
+class SliderImagesView(APIView):
+    """
+    PUT replaces the slider's images with ``{"images": [ids...]}`` (or the
+    bare list) in that order; PATCH moves one image with ``{"image_id", "new_order"}``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_slider(self, request, slider_id):
+        if not permissions_for(request).is_admin:
+            return None, Response(
+                {"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            return Slider.objects.get(id=slider_id), None
+        except Slider.DoesNotExist:
+            return None, Response(
+                {"error": "Slider not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+    def respond(self, request, slider):
+        slider = Slider.objects.prefetch_related(ordered_images()).get(id=slider.id)
+        return Response(SliderSerializer(slider, context={"request": request}).data)
+
+    def put(self, request, slider_id):
+        slider, error = self.get_slider(request, slider_id)
+        if error is not None:
+            return error
+        image_ids = request.data
+        if isinstance(image_ids, dict):
+            image_ids = image_ids.get("images")
+        set_slider_images(slider, image_ids)
+        return self.respond(request, slider)
+
+    def patch(self, request, slider_id):
+        slider, error = self.get_slider(request, slider_id)
+        if error is not None:
+            return error
+        data = request.data if isinstance(request.data, dict) else {}
+        try:
+            image_id = int(data.get("image_id"))
+            position = int(data.get("new_order"))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Image ID and new order are required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not move_image(slider, image_id, position):
+            return Response(
+                {"error": "Image not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+        return self.respond(request, slider)
+
+
 @api_view(["PUT"])
 def set_default_slider(request, slider_id):
     slider = get_object_or_404(Slider, id=slider_id)
-    Slider.objects.update(is_default=False)
-    slider.is_default = True
-    slider.save()
+    set_default(slider)
     return Response({"status": "Slider set as default"})
 
 
@@ -669,71 +1197,99 @@ class CreateOrderView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        user = request.user
-        shipping_address = request.data.get("shipping_address")
-        city = request.data.get("city")
-        postal_code = request.data.get("postal_code")
-        phone_number = request.data.get("phone_number")
-        items_data = request.data.get("items", [])
-
-        if (
-            not shipping_address
-            or not city
-            or not postal_code
-            or not phone_number
-            or not items_data
-        ):
-            return Response(
-                {
-                    "detail": "Adres wysyłki, miasto, kod pocztowy, numer telefonu i produkty są wymagane."
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        try:
+            order = place_order(request.user, request.data)
+        except OrderError as e:
+            return Response({"detail": e.detail}, status=status.HTTP_400_BAD_REQUEST)
 
-        order = Order.objects.create(
-            user=user,
-            shipping_address=shipping_address,
-            city=city,
-            postal_code=postal_code,
-            phone_number=phone_number,
-        )
+        prefetch_order_items([order])
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
-        total_price = Decimal("0.00")
 
-        for item_data in items_data:
-            book_id = item_data.get("book")
-            quantity = item_data.get("quantity", 1)
-            book = Book.objects.get(id=book_id)
-            item_total_price = book.price * quantity
-            total_price += item_total_price
+class BatchCreateOrderView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_orders = 500
 
-            OrderItem.objects.create(
-                order=order, book=book, quantity=quantity, total_price=item_total_price
-            )
+    def post(self, request):
+        if not permissions_for(request).is_admin:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-        order.total_price = total_price
-        order.save()
+        payloads = request.data
+        if isinstance(payloads, dict):
+            payloads = payloads.get("orders")
+        if not isinstance(payloads, list) or not payloads:
+            return Response(
+                {"detail": "Lista zamówień jest wymagana."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(payloads) > self.max_orders:
+            return Response(
+                {"detail": f"Maksymalnie {self.max_orders} zamówień na żądanie."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        results = place_orders(request.user, payloads, allow_user_override=True)
+        created = [order for order, _ in results if order is not None]
+        prefetch_order_items(created)
+        return Response(
+            {
+                "created": len(created),
+                "failed": len(results) - len(created),
+                "results": [
+                    (
+                        {
+                            "index": index,
+                            "result": "created",
+                            "order": OrderSerializer(order).data,
+                        }
+                        if order is not None
+                        else {"index": index, "result": "error", "detail": error}
+                    )
+                    for index, (order, error) in enumerate(results)
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
 
 
 class OrderListView(APIView):
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
+    @conditional_view("orders", "books")
     def get(self, request):
-        if request.user.userprofile.is_admin or request.user.userprofile.is_moderator:
+        if permissions_for(request).is_staff:
             orders = Order.objects.all()
         else:
             orders = Order.objects.filter(user=request.user)
 
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        orders = filter_orders(orders, request.query_params).select_related("user")
+        if request.query_params.get("fields") == "summary":
+            serializer = OrderSummarySerializer()
+        else:
+            serializer = OrderSerializer(context={"request": request})
+            orders = narrow_queryset(
+                orders.prefetch_related(order_items_prefetch()),
+                serializer,
+                keep=paginator.cursor_fields,
+            )
+
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(orders, request, view=self)
+            return paginator.get_paginated_response(dump(serializer, page))
+
+        return Response(dump(serializer, orders), status=status.HTTP_200_OK)
 
 
 class OrderDetailView(APIView):
     def get(self, request, order_id):
         try:
-            order = Order.objects.get(id=order_id)
+            order = (
+                Order.objects.select_related("user")
+                .prefetch_related(order_items_prefetch())
+                .get(id=order_id)
+            )
             serializer = OrderSerializer(order)
             return Response(serializer.data)
         except Order.DoesNotExist:
@@ -746,10 +1302,9 @@ class UpdateOrderStatusView(APIView):
             order = Order.objects.get(pk=pk)
             new_status = request.data.get("status")
             if new_status in dict(Order.STATUS_CHOICES).keys():
-                order.status = new_status
-                order.save()
+                set_order_status(order, new_status)
 
-                Event.objects.create(
+                event_bus.publish(
                     user=order.user,
                     action="ORDER_STATUS_UPDATED",
                     description=f"Your order {order.id} status has been updated to {new_status}.",
@@ -767,3 +1322,112 @@ class UpdateOrderStatusView(APIView):
             return Response(
                 {"error": "Zamówienie nie istnieje"}, status=status.HTTP_404_NOT_FOUND
             )
+
+
+class SalesReportView(APIView):
+    permission_classes = [IsAuthenticated]
+    default_days = 30
+
+    def get(self, request):
+        if not permissions_for(request).is_admin:
+            return Response({"error": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+
+        params = request.query_params
+        bucket = params.get("bucket", "day")
+        group = params.get("group", "none")
+        if bucket not in BUCKETS or group not in GROUPS:
+            return Response(
+                {
+                    "error": f"bucket must be one of: {', '.join(BUCKETS)}; "
+                    f"group must be one of: {', '.join(GROUPS)}."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            date_to = parse_date(params.get("date_to") or str(timezone.localdate()))
+            date_from = parse_date(
+                params.get("date_from")
+                or str(date_to - timedelta(days=self.default_days - 1))
+            )
+        except (TypeError, ValueError):
+            date_from = date_to = None
+        if date_from is None or date_to is None:
+            return Response(
+                {"error": "Nieprawidłowa data."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        statuses = [s for s in params.get("status", "").split(",") if s]
+
+        rows = sales_report(date_from, date_to, bucket, group, statuses)
+        if params.get("output") == "csv":
+            response = StreamingHttpResponse(
+                iter_rows(rows, "csv", REPORT_FIELDS[group]), content_type="text/csv"
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="sales-{date_from}-{date_to}.csv"'
+            )
+            return response
+        return Response(
+            {
+                "date_from": date_from,
+                "date_to": date_to,
+                "bucket": bucket,
+                "group": group,
+                "results": list(rows),
+            }
+        )
+
+
+def _export_options(request):
+    """Returns ``(format, gzip)`` or an error Response."""
+    fmt = request.query_params.get("output", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return Response(
+            {"error": f"output must be one of: {', '.join(EXPORT_FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return fmt, request.query_params.get("gzip") in ("1", "true")
+
+
+class OrderExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        options = _export_options(request)
+        if isinstance(options, Response):
+            return options
+        fmt, compress = options
+
+        if permissions_for(request).is_staff:
+            orders = Order.objects.all()
+        else:
+            orders = Order.objects.filter(user=request.user)
+        orders = filter_orders(orders, request.query_params)
+
+        if request.query_params.get("rows") == "items":
+            rows = iter_values(
+                OrderItem.objects.filter(order__in=orders), ORDER_ITEM_EXPORT_FIELDS
+            )
+            return export_response(
+                rows, ORDER_ITEM_EXPORT_FIELDS, fmt, "order-items", compress
+            )
+        rows = iter_values(orders, ORDER_EXPORT_FIELDS)
+        return export_response(rows, ORDER_EXPORT_FIELDS, fmt, "orders", compress)
+
+
+class EventExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        options = _export_options(request)
+        if isinstance(options, Response):
+            return options
+        fmt, compress = options
+
+        if permissions_for(request).is_admin:
+            events = Event.objects.all()
+        else:
+            events = Event.objects.filter(user=request.user)
+        events = filter_events(events, request.query_params)
+        rows = iter_values(events, EVENT_EXPORT_FIELDS)
+        return export_response(rows, EVENT_EXPORT_FIELDS, fmt, "events", compress)